@@ -0,0 +1,12 @@
+from utils.lazy_import import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "IngestionService": "azure_ai.api.api",
+        "IngestionJob": "azure_ai.api.api",
+        "JobTracker": "azure_ai.api.api",
+        "JobStatus": "azure_ai.api.api",
+        "create_app": "azure_ai.api.api",
+    },
+)
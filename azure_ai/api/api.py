@@ -0,0 +1,550 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import PurePath
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from multipart.multipart import MultipartParser, parse_options_header
+from settings.settings import azure_settings
+from settings.custom_logger import Logger
+from utils.utils import SNIFF_BYTES
+from azure_ai.models.compact import CompactExtraction
+from azure_ai.pipeline.pipeline import IngestionPage, IngestionPipeline
+from azure_ai.search.hybrid import HybridRanker
+from azure_ai.search.search_index import FacetValues, SearchIndex, index_extraction
+
+# Marker put on a chunk queue after the last chunk of an upload
+_END = object()
+
+
+class JobStatus:
+    """
+    States of an ingestion job. Every change is also pushed to the job subscribers.
+    """
+    QUEUED = "queued"  # Uploaded, waiting for the background ingestion to start
+    PROCESSING = "processing"
+    DONE = "done"  # Every page was processed, some may have failed
+    FAILED = "failed"
+
+    FINISHED = (DONE, FAILED)
+
+
+@dataclass
+class IngestionJob:
+    job_id: str
+    file_name: str
+    document_hash: str
+    status: str = JobStatus.QUEUED
+    page_count: Optional[int] = None
+    pages_done: int = 0
+    pages_failed: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    # Parsed extraction of every page processed so far
+    extractions: Dict[int, CompactExtraction] = field(default_factory=dict, repr=False)
+    contents: Dict[int, str] = field(default_factory=dict, repr=False)
+    # Every event published so far, replayed to late subscribers
+    events: List[Dict[str, Any]] = field(default_factory=list, repr=False)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "file_name": self.file_name,
+            "document_hash": self.document_hash,
+            "status": self.status,
+            "page_count": self.page_count,
+            "pages_done": self.pages_done,
+            "pages_failed": self.pages_failed,
+            "error": self.error,
+            "created_at": self.created_at,
+        }
+
+
+class JobTracker:
+    """
+    Ingestion jobs of this process and the subscribers to their events.
+
+    Events may be published from any thread, they are handed to the subscriber queues
+    on the event loop. Finished jobs are kept for status queries until there are more
+    than ``max_jobs``.
+    """
+    def __init__(self, max_jobs: Optional[int] = None):
+        self.max_jobs = max_jobs or azure_settings.api.api_max_jobs
+        self.__lock = threading.Lock()
+        self.__jobs: OrderedDict[str, IngestionJob] = OrderedDict()
+        self.__subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def create(self, file_name: str, document_hash: str) -> IngestionJob:
+        job = IngestionJob(job_id=uuid.uuid4().hex, file_name=file_name, document_hash=document_hash)
+        with self.__lock:
+            self.__loop = asyncio.get_running_loop()
+            self.__jobs[job.job_id] = job
+            if len(self.__jobs) > self.max_jobs:
+                for job_id in [job_id for job_id, old in self.__jobs.items() if old.status in JobStatus.FINISHED]:
+                    del self.__jobs[job_id]
+                    if len(self.__jobs) <= self.max_jobs:
+                        break
+        self.publish(job, "queued")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self.__lock:
+            return self.__jobs.get(job_id)
+
+    def publish(self, job: IngestionJob, event_type: str, **data: Any) -> None:
+        event = {"type": event_type, **job.summary(), **data}
+        with self.__lock:
+            job.events.append(event)
+            subscribers = list(self.__subscribers.get(job.job_id, ()))
+        for subscriber in subscribers:
+            self.__loop.call_soon_threadsafe(subscriber.put_nowait, event)
+
+    async def subscribe(self, job: IngestionJob) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Every event of ``job``, earlier ones first, until the job is finished.
+        """
+        subscriber: asyncio.Queue = asyncio.Queue()
+        with self.__lock:
+            history = list(job.events)
+            self.__subscribers.setdefault(job.job_id, set()).add(subscriber)
+        try:
+            for event in history:
+                yield event
+                if event["status"] in JobStatus.FINISHED:
+                    return
+            while True:
+                event = await subscriber.get()
+                yield event
+                if event["status"] in JobStatus.FINISHED:
+                    return
+        finally:
+            with self.__lock:
+                subscribers = self.__subscribers.get(job.job_id)
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.__subscribers[job.job_id]
+
+
+class _ChunkReader:
+    """
+    Read-only file object over the chunks of a request body, filled from the event
+    loop while a blocking upload reads it on another thread.
+
+    The chunk queue is bounded, so a slow upload slows down receiving the request
+    instead of buffering the file.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_chunks: int):
+        self.__loop = loop
+        self.__chunks: asyncio.Queue = asyncio.Queue(max_chunks)
+        self.__buffer = bytearray()
+        self.__ended = False
+        self.__error: Optional[BaseException] = None
+        self.discarded = False
+
+    async def put(self, chunk: bytes) -> None:
+        if not self.discarded:
+            await self.__chunks.put(chunk)
+
+    def discard(self) -> None:
+        """The reader is gone, drop what is buffered and everything put from now on."""
+        self.discarded = True
+        while not self.__chunks.empty():
+            self.__chunks.get_nowait()
+
+    async def close(self) -> None:
+        await self.put(_END)
+
+    def abort(self, error: BaseException) -> None:
+        self.__error = error
+        if not self.__chunks.full():
+            self.__chunks.put_nowait(_END)
+
+    def read(self, size: int = -1) -> bytes:
+        while not self.__ended and (size < 0 or len(self.__buffer) < size):
+            chunk = asyncio.run_coroutine_threadsafe(self.__chunks.get(), self.__loop).result()
+            if self.__error is not None:
+                raise IOError(f"Upload aborted: {self.__error}")
+            if chunk is _END:
+                self.__ended = True
+            else:
+                self.__buffer += chunk
+        if size < 0 or size >= len(self.__buffer):
+            data, self.__buffer = bytes(self.__buffer), bytearray()
+        else:
+            data = bytes(self.__buffer[:size])
+            del self.__buffer[:size]
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+
+class _FilePartParser:
+    """
+    Incremental multipart/form-data parser keeping only the data of the first file
+    sent in the ``file`` field. Other fields are skipped.
+    """
+    def __init__(self, boundary: bytes):
+        self.file_name: Optional[str] = None
+        self.finished = False
+        self.__chunks: List[bytes] = []
+        self.__in_file = False
+        self.__header_field = bytearray()
+        self.__header_value = bytearray()
+        self.__disposition = b""
+        self.__parser = MultipartParser(boundary, {
+            "on_part_begin": self.__on_part_begin,
+            "on_header_field": self.__on_header_field,
+            "on_header_value": self.__on_header_value,
+            "on_header_end": self.__on_header_end,
+            "on_headers_finished": self.__on_headers_finished,
+            "on_part_data": self.__on_part_data,
+            "on_part_end": self.__on_part_end,
+        })
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Parse the next piece of the body and return the file data it contained."""
+        self.__parser.write(data)
+        chunks, self.__chunks = self.__chunks, []
+        return chunks
+
+    def __on_part_begin(self) -> None:
+        self.__disposition = b""
+
+    def __on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self.__header_field += data[start:end]
+
+    def __on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self.__header_value += data[start:end]
+
+    def __on_header_end(self) -> None:
+        if self.__header_field.lower() == b"content-disposition":
+            self.__disposition = bytes(self.__header_value)
+        self.__header_field.clear()
+        self.__header_value.clear()
+
+    def __on_headers_finished(self) -> None:
+        _, options = parse_options_header(self.__disposition)
+        file_name = options.get(b"filename")
+        self.__in_file = self.file_name is None and options.get(b"name") == b"file" and bool(file_name)
+        if self.__in_file:
+            # Browsers may send a full path, only its last part is kept
+            self.file_name = PurePath(file_name.decode("utf-8", "replace").replace("\\", "/")).name
+
+    def __on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self.__in_file:
+            self.__chunks.append(data[start:end])
+
+    def __on_part_end(self) -> None:
+        if self.__in_file:
+            self.finished = True
+            self.__in_file = False
+
+
+class IngestionService:
+    """
+    Upload, background ingestion and search behind the HTTP API.
+
+    Uploads are streamed: the multipart body is parsed while it is received and the
+    file part goes straight to ``upload_stream_hashed`` through a bounded buffer, so
+    a file is never held in memory or written to disk by the API. Only the first
+    ``SNIFF_BYTES`` are checked by the ``FileValidator`` before the upload starts.
+
+    As soon as the file is in blob storage a job is returned and its pages are
+    processed in the background with ``IngestionPipeline.process_page`` on
+    ``api_ingestion_workers`` threads shared by every job. Page results and progress
+    are published to the job subscribers, and the document is added to the search
+    index once its last page is done.
+    """
+    def __init__(
+        self,
+        ingestion: Optional[IngestionPipeline] = None,
+        search_index: Optional[SearchIndex] = None,
+        ranker: Optional[HybridRanker] = None,
+        tracker: Optional[JobTracker] = None,
+        workers: Optional[int] = None,
+        max_upload_size: Optional[int] = None,
+    ):
+        self.logger = Logger(self.__class__.__name__)
+        settings = azure_settings.api
+        self.ingestion = ingestion or IngestionPipeline()
+        self.search_index = search_index or (ranker.search_index if ranker is not None else SearchIndex())
+        self.ranker = ranker or HybridRanker(self.search_index)
+        self.tracker = tracker or JobTracker()
+        self.max_upload_size = max_upload_size or settings.api_max_upload_size
+        self.stream_buffer = settings.api_stream_buffer
+        self.__executor = ThreadPoolExecutor(
+            max_workers=workers or settings.api_ingestion_workers, thread_name_prefix="ingestion"
+        )
+        self.__tasks: Set[asyncio.Task] = set()
+
+    async def upload(self, request: Request) -> IngestionJob:
+        """
+        Stream the PDF of a multipart request to blob storage and start its ingestion.
+
+        Raises:
+            HTTPException: 400 without a file, 413 when it is too large, 415 when it is
+                not an allowed type, 502 when the upload to blob storage fails
+        """
+        _, options = parse_options_header(request.headers.get("content-type", ""))
+        boundary = options.get(b"boundary")
+        if boundary is None:
+            raise HTTPException(status_code=400, detail="Expected a multipart/form-data request")
+
+        parser = _FilePartParser(boundary)
+        stream = request.stream()
+        header = bytearray()
+        async for data in stream:
+            for chunk in parser.feed(data):
+                header += chunk
+            if len(header) >= SNIFF_BYTES or parser.finished:
+                break
+        if parser.file_name is None or not header:
+            raise HTTPException(status_code=400, detail="Expected a file in the 'file' field")
+        if len(header) > self.max_upload_size:
+            raise HTTPException(status_code=413, detail=f"Files are limited to {self.max_upload_size} bytes")
+        if self.ingestion.file_validator.validate(bytes(header[:SNIFF_BYTES]), parser.file_name) is None:
+            raise HTTPException(status_code=415, detail=f"{parser.file_name} is not an allowed file type")
+
+        loop = asyncio.get_running_loop()
+        reader = _ChunkReader(loop, self.stream_buffer)
+        await reader.put(bytes(header))
+        uploading = loop.run_in_executor(None, self.__upload_stream, reader)
+        # An upload that fails early stops reading, do not wait on a full buffer
+        uploading.add_done_callback(lambda _: reader.discard())
+        size = len(header)
+        try:
+            async for data in stream:
+                if reader.discarded:
+                    break
+                for chunk in parser.feed(data):
+                    size += len(chunk)
+                    if size > self.max_upload_size:
+                        raise HTTPException(status_code=413, detail=f"Files are limited to {self.max_upload_size} bytes")
+                    await reader.put(chunk)
+            await reader.close()
+        except BaseException as e:
+            # Client went away or the file is too large, stop the upload thread
+            reader.abort(e)
+            try:
+                await uploading
+            except IOError:
+                pass
+            raise
+
+        uploaded = await uploading
+        if uploaded is None:
+            raise HTTPException(status_code=502, detail=f"Upload of {parser.file_name} failed")
+        job = self.tracker.create(parser.file_name, uploaded[0])
+        self.logger.info(f"Job {job.job_id}: {parser.file_name} uploaded as {job.document_hash}, {size} bytes")
+        self.start(job)
+        return job
+
+    def start(self, job: IngestionJob) -> None:
+        task = asyncio.get_running_loop().create_task(self.ingest(job))
+        # The loop only keeps weak references to tasks
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
+
+    async def ingest(self, job: IngestionJob) -> None:
+        loop = asyncio.get_running_loop()
+        job.status = JobStatus.PROCESSING
+        try:
+            file_bytes = await loop.run_in_executor(self.__executor, self.__prepare, job)
+            if file_bytes is None:
+                self.__fail(job, "Document could not be downloaded from blob storage")
+                return
+            self.tracker.publish(job, "started")
+            await asyncio.gather(*(self.__ingest_page(job, page_number, file_bytes) for page_number in range(job.page_count)))
+            await loop.run_in_executor(self.__executor, self.__index, job)
+        except Exception as e:  # Catch master exception, the job is reported as failed
+            self.logger.error_limited("api-job", f"Job {job.job_id} failed: {e}")
+            self.__fail(job, str(e))
+            return
+        job.status = JobStatus.DONE
+        self.tracker.publish(job, "done")
+
+    def search(
+        self,
+        query: str = "",
+        filters: Optional[Dict[str, FacetValues]] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        result = self.ranker.search(query, filters, limit, offset)
+        return {
+            "total": result.total,
+            "hits": [{"document_id": hit.document_id, "score": hit.score, **hit.stored} for hit in result.hits],
+        }
+
+    async def close(self) -> None:
+        for task in list(self.__tasks):
+            task.cancel()
+        # Cancelled jobs keep their checkpoints, processing them again resumes where they stopped
+        await asyncio.gather(*self.__tasks, return_exceptions=True)
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+    def __upload_stream(self, reader: _ChunkReader) -> Tuple[str, str] | None:
+        return self.ingestion.blob_handler.upload_stream_hashed(
+            reader, container_name=self.ingestion.container_name, extension="pdf"
+        )
+
+    def __prepare(self, job: IngestionJob) -> bytes | None:
+        file_bytes = self.ingestion.blob_handler.download_blob_bytes(
+            blob_name=f"{job.document_hash}.pdf", container_name=self.ingestion.container_name
+        )
+        if file_bytes is None:
+            return None
+        if self.ingestion.deduplicator is not None:
+            # Pages identical to an earlier upload get its checkpoints and are not extracted again
+            self.ingestion.deduplicator.deduplicate(file_bytes, job.document_hash)
+        job.page_count = self.ingestion.pdf_processor.count_pages(file_bytes)
+        return file_bytes
+
+    async def __ingest_page(self, job: IngestionJob, page_number: int, file_bytes: bytes) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            page = await loop.run_in_executor(
+                self.__executor, self.ingestion.process_page, job.document_hash, page_number, file_bytes, job.file_name
+            )
+        except Exception as e:  # Catch master exception, only this page fails
+            self.logger.error_limited("api-page", f"Job {job.job_id}: page {page_number} failed: {e}")
+            page = None
+        self.__page_finished(job, page_number, page)
+
+    def __page_finished(self, job: IngestionJob, page_number: int, page: Optional[IngestionPage]) -> None:
+        if page is None:
+            job.pages_failed += 1
+            self.tracker.publish(job, "page", page=page_number, page_status=JobStatus.FAILED)
+            return
+        job.pages_done += 1
+        if page.extraction:
+            job.extractions[page_number] = page.extraction
+        if page.file_context:
+            job.contents[page_number] = page.file_context
+        self.tracker.publish(
+            job,
+            "page",
+            page=page_number,
+            page_status=JobStatus.DONE,
+            prompt_type=page.type_prompt_body_type,
+            extraction=page.extraction,
+        )
+
+    def __index(self, job: IngestionJob) -> None:
+        if not job.extractions:
+            return
+        index_extraction(
+            self.search_index,
+            job.document_hash,
+            CompactExtraction.merge(job.extractions[page_number] for page_number in sorted(job.extractions)),
+            file_path=job.file_name,
+            content="\n".join(job.contents[page_number] for page_number in sorted(job.contents)),
+        )
+
+    def __fail(self, job: IngestionJob, error: str) -> None:
+        job.status = JobStatus.FAILED
+        job.error = error
+        self.tracker.publish(job, "failed")
+
+
+def create_app(service: Optional[IngestionService] = None) -> FastAPI:
+    """
+    HTTP API of the CV ingestion and search.
+
+    Serve it with ``python -m azure_ai.api.api`` or ``uvicorn azure_ai.api.api:create_app --factory``.
+    """
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.service = service or IngestionService()
+        yield
+        await app.state.service.close()
+
+    app = FastAPI(title="CV ingestion", lifespan=lifespan)
+
+    @app.post("/documents", status_code=202)
+    async def upload_document(request: Request) -> Dict[str, Any]:
+        """Upload a PDF as multipart/form-data in the ``file`` field. Returns its ingestion job right away."""
+        job = await request.app.state.service.upload(request)
+        return job.summary()
+
+    @app.get("/jobs/{job_id}")
+    def get_job(job_id: str, request: Request) -> Dict[str, Any]:
+        job = request.app.state.service.tracker.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+        return {**job.summary(), "extractions": {page: extraction.to_dict() for page, extraction in job.extractions.items()}}
+
+    @app.websocket("/jobs/{job_id}/events")
+    async def job_events(websocket: WebSocket, job_id: str) -> None:
+        """Progress and partial results of a job, from its first event until it is finished."""
+        job = websocket.app.state.service.tracker.get(job_id)
+        if job is None:
+            await websocket.close(code=4404, reason=f"Unknown job {job_id}")
+            return
+        await websocket.accept()
+        try:
+            async for event in websocket.app.state.service.tracker.subscribe(job):
+                extraction = event.get("extraction")
+                if isinstance(extraction, CompactExtraction):
+                    # Kept compact in the replayed events, built for this send only
+                    event = {**event, "extraction": extraction.to_dict()}
+                await websocket.send_json(event)
+        except WebSocketDisconnect:
+            return
+        await websocket.close()
+
+    @app.get("/search")
+    def search(
+        request: Request,
+        q: str = "",
+        limit: int = Query(default=20, ge=1, le=100),
+        offset: int = Query(default=0, ge=0),
+        role: List[str] = Query(default=[]),
+        seniority: List[str] = Query(default=[]),
+        skills: List[str] = Query(default=[]),
+        country: List[str] = Query(default=[]),
+        form_type: List[str] = Query(default=[]),
+        entity_type: List[str] = Query(default=[]),
+        chapter4_status: List[str] = Query(default=[]),
+    ) -> Dict[str, Any]:
+        filters = {
+            "role": role,
+            "seniority": seniority,
+            "skills": skills,
+            "Country": country,
+            "FormType": form_type,
+            "EntityType": entity_type,
+            "Chapter4Status": chapter4_status,
+        }
+        return request.app.state.service.search(q, {name: values for name, values in filters.items() if values}, limit, offset)
+
+    @app.get("/search/facets/{name}")
+    def facet_counts(name: str, request: Request) -> Dict[str, int]:
+        return request.app.state.service.search_index.facet_counts(name)
+
+    @app.get("/health")
+    def health() -> Dict[str, str]:
+        return {"status": "ok"}
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    settings = azure_settings.api
+    uvicorn.run(create_app(), host=settings.api_host, port=settings.api_port)
+
+
+if __name__ == "__main__":
+    main()
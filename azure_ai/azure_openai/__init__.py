@@ -0,0 +1,17 @@
+from utils.lazy_import import lazy_attributes
+
+# Resolved on first access so importing the package does not load semantic_kernel / langchain
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "AzureOpenAIChatBackend": "azure_ai.azure_openai.azure_openai",
+        "GPTComponent": "azure_ai.azure_openai.gpt",
+        "plan_batches": "azure_ai.azure_openai.batching",
+        "split_batch_response": "azure_ai.azure_openai.batching",
+        "ContinuedResult": "azure_ai.azure_openai.continuation",
+        "is_truncated": "azure_ai.azure_openai.continuation",
+        "split_answer": "azure_ai.azure_openai.continuation",
+        "TokenUsage": "azure_ai.azure_openai.usage",
+        "get_token_usage": "azure_ai.azure_openai.usage",
+    },
+)
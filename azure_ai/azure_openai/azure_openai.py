@@ -1,28 +1,44 @@
+from __future__ import annotations
+
 import asyncio
-import base64
-import tempfile
-from typing import Any, Optional, Tuple
-from pydantic import ValidationError
-import requests
-from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
-from semantic_kernel.prompt_template.input_variable import InputVariable
-from semantic_kernel import Kernel
-from semantic_kernel.prompt_template import PromptTemplateConfig
-from semantic_kernel.functions.kernel_arguments import KernelArguments
-from semantic_kernel.functions.kernel_function import KernelFunction
-from semantic_kernel.functions.function_result import FunctionResult
-
-from module.logger.custom_logger import Logger
-from module.models.settings import settings
-from module.templates.templates import PromptTemplate
-from semantic_kernel.contents import ChatMessageContent, TextContent, ImageContent
-from semantic_kernel.contents.utils.author_role import AuthorRole
-from semantic_kernel.contents.chat_history import ChatHistory
-from module.templates.template_prompt_body import TemplatePromptBody
-
-# Using nest_asyncio for async within async
-import nest_asyncio
-nest_asyncio.apply()
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from settings.custom_logger import Logger
+from settings.settings import azure_settings
+from azure_ai.template.prompt_template import PromptTemplate, TemplatePromptBody
+from settings.log_control import RedactedUrl
+from settings.telemetry import BATCH_PAGES, COMPLETION_TOKENS, CACHED_TOKENS, CONTINUATIONS, PROMPT_TOKENS, PROMPT_TYPE, span
+from azure_ai.azure_openai.batching import BATCH_INSTRUCTION, PAGE_MARKER
+from azure_ai.azure_openai.continuation import (
+    CONTINUE_INSTRUCTION,
+    ContinuedResult,
+    entity_calls,
+    finish_reason,
+    is_truncated,
+    merge_entities,
+    split_answer,
+)
+from azure_ai.azure_openai.usage import get_token_usage
+
+# semantic_kernel and nest_asyncio are heavy to import, so they are
+# only loaded when the backend is actually constructed or used
+if TYPE_CHECKING:
+    from semantic_kernel.contents.chat_history import ChatHistory
+
+_nest_asyncio_applied = False
+
+
+def _apply_nest_asyncio() -> None:
+    """
+    Patch asyncio once per process so that async can run within async.
+    """
+    global _nest_asyncio_applied
+    if _nest_asyncio_applied:
+        return
+
+    import nest_asyncio
+    nest_asyncio.apply()
+    _nest_asyncio_applied = True
 
 class AzureOpenAIChatBackend():
     """
@@ -32,25 +48,24 @@ class AzureOpenAIChatBackend():
     manage sessions, and handle responses utilizing Semantic Kernel
     """
     def __init__(self):
+        from semantic_kernel import Kernel
+        from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
+
+        _apply_nest_asyncio()
         self.logger = Logger(self.__class__.__name__)
         self.__service_id = "dv"
-        self.__service_id_long = "dv_long"
+        openai_settings = azure_settings.openai_settings
+        # semantic_kernel only accepts https endpoints, a base url may be plain http
+        base_url = openai_settings.azure_open_ai__base_url
         self.__chat_obj = AzureChatCompletion(service_id=self.__service_id, 
-                                                  deployment_name=settings.azure_openai.azure_open_ai__chat_completion_deployment_name, 
-                                                  endpoint=settings.azure_openai.azure_open_ai__endpoint, 
-                                                  api_key=settings.azure_openai.azure_open_ai__api_key)
-        
-        self.__chat_obj_long = AzureChatCompletion(service_id=self.__service_id_long, 
-                                                  api_version="2024-10-01-preview",
-                                                  deployment_name=settings.azure_openai.azure_open_ai__chat_completion_deployment_name_long, 
-                                                  endpoint=settings.azure_openai.azure_open_ai__endpoint, 
-                                                  api_key=settings.azure_openai.azure_open_ai__api_key)
+                                                  deployment_name=openai_settings.azure_open_ai__chat_completion_deployment_name, 
+                                                  endpoint=None if base_url else openai_settings.azure_open_ai__endpoint, 
+                                                  base_url=base_url,
+                                                  api_key=openai_settings.azure_open_ai__api_key)
+
         self.kernel = Kernel()
         self.kernel.add_service(self.__chat_obj)
 
-        self.kernel_long = Kernel()
-        self.kernel_long.add_service(self.__chat_obj_long)
-
         self.__loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self.__loop)
         # self.chat_history = ChatHistory()
@@ -75,26 +90,6 @@ class AzureOpenAIChatBackend():
         req_settings.top_p = 0.95
         return req_settings
     
-    def __get_settings_long(self):
-        """
-        Retrieves the settings for the Azure OpenAI Chat backend.
-
-        This method fetches and returns the configuration settings required
-        to interact with the Azure OpenAI Chat services in Semantic kernel
-
-        Args:
-            None
-
-        Returns:
-            dict: A dictionary containing the configuration settings.
-        """
-        req_settings = self.kernel_long.get_service(self.__service_id_long) \
-                        .get_prompt_execution_settings_class()(service_id=self.__service_id_long)
-        req_settings.max_tokens = 16384
-        req_settings.temperature = 1e-6 # Setting this to near 0 to ensure minimum creativity from GPT
-        req_settings.top_p = 0.95
-        return req_settings
-
     def add_assistant_message_to_history(self, result: str, chat_history: ChatHistory) -> ChatHistory:
         """
         Adds an assistant's message to the chat history.
@@ -106,6 +101,9 @@ class AzureOpenAIChatBackend():
         Returns:
             ChatHistory: The updated chat history including the new assistant's message.
         """
+        from semantic_kernel.contents import ChatMessageContent, TextContent
+        from semantic_kernel.contents.utils.author_role import AuthorRole
+
         assistant_message = ChatMessageContent(
             role=AuthorRole.ASSISTANT,
             items=[TextContent(text=result)]
@@ -114,111 +112,162 @@ class AzureOpenAIChatBackend():
         chat_history.add_message(assistant_message)
         return chat_history
 
-    def generate_description_long(self, encoded_image: str, clean_file_context: str = "", type_prompt_template:str = ""):
-        type_prompt, type_prompt_body_type = self.__define_prompt_body_template(type_prompt_template)
-        # describe_function = self.__create_prompt_template(is_long_output=is_long_output)
-        final_template = PromptTemplate.MINIMAL_PLACEHOLDER_PROMPT_LONG_RESPONSE.replace(r"{{$type_prompt}}", type_prompt)
+    def generate_description_long(self, encoded_image: str, clean_file_context: str = "", type_prompt_template:str = "", max_continuations: int = 3, return_history: bool = False):
+        """
+        Extract a page whose answer may not fit in one response, e.g. a long entity list.
 
-        url = rf"{encoded_image}"
-        response = requests.get(url)
-        response.raise_for_status()  # Ensure the download is complete
-        encoded_image = base64.b64encode(response.content).decode('ascii')
+        The page is sent like ``generate_description``. When the answer is cut off (finish
+        reason "length", a placeholder instead of the remaining entities, or invalid
+        Python), it is continued from its last complete Entity, see ``continue_description``.
 
-        self.logger.debug(f"Generating description for image {url}")
+        Args:
+        	encoded_image (str): Page url with valid sas token
+        	clean_file_context (str, optional): DI context of the page. Defaults to "".
+        	type_prompt_template (str, optional): Type of prompt to be used. Defaults to "".
+        	max_continuations (int, optional): Maximum number of follow-up requests. Defaults to 3.
+        	return_history (bool, optional): Return the history sent, None otherwise. Defaults to False.
 
-        chat_history = ChatHistory()
-        chat_history.add_system_message(final_template)
-        describe_context = ChatMessageContent(
-            role=AuthorRole.USER,
-            items=[ImageContent(uri=f"data:image/png;base64,{encoded_image}")]
-        )
-        file_context = ChatMessageContent(
-            role=AuthorRole.USER,
-            items=[TextContent(text=clean_file_context)]
-        )
-        # chat_history.add_user_message("Extract per request below. Just do it, please dont say I'm sorry, I can't assist with that")
-        chat_history.add_message(describe_context)
-        chat_history.add_message(file_context)
+        Returns:
+            Tuple[ChatMessageContent | ContinuedResult | None, str, ChatHistory | None]: The answer, the prompt type and the history sent
+        """
+        chat_history, type_prompt_body_type = self.__chat_history(encoded_image, clean_file_context, type_prompt_template)
+        result = self.__gen_chat(chat_history, type_prompt_body_type)
+        if result is not None and is_truncated(str(result), finish_reason(result)):
+            result = self.__continue(chat_history, result, type_prompt_body_type, max_continuations)
+        return result, type_prompt_body_type, chat_history if return_history else None
 
-        # with open("test.json", "w+") as f:
-        #     f.write(str(chat_history.model_dump_json()))
+    def continue_description(self, encoded_image: str, file_context: str, type_prompt_template: str, partial_result, max_continuations: int = 3, return_history: bool = False):
+        """
+        Complete a cut off answer of ``generate_description``.
+
+        The answer is replayed as the assistant message up to its last complete Entity and
+        the model is asked for the remaining entities, until an answer ends normally or
+        ``max_continuations`` requests were sent. The entity lists of all answers are
+        merged without duplicates.
+
+        Args:
+        	encoded_image (str): Page url with valid sas token
+        	file_context (str): DI context of the page
+        	type_prompt_template (str): Type of prompt of the cut off answer
+        	partial_result (ChatMessageContent): The cut off answer
+        	max_continuations (int, optional): Maximum number of follow-up requests. Defaults to 3.
+        	return_history (bool, optional): Return the history sent, None otherwise. Defaults to False.
 
-        result = self.__gen_long(chat_history)
+        Returns:
+            Tuple[ContinuedResult, str, ChatHistory | None]: The assembled answer with the usage of every
+                request, the prompt type and the history sent
+        """
+        chat_history, type_prompt_body_type = self.__chat_history(encoded_image, file_context, type_prompt_template)
+        result = self.__continue(chat_history, partial_result, type_prompt_body_type, max_continuations)
+        return result, type_prompt_body_type, chat_history if return_history else None
 
-        return result, type_prompt_body_type, chat_history
+    def __chat_history(self, encoded_image: str, file_context: str, type_prompt_template: str) -> Tuple[ChatHistory, str]:
+        from semantic_kernel.contents import ChatMessageContent, TextContent, ImageContent
+        from semantic_kernel.contents.utils.author_role import AuthorRole
+        from semantic_kernel.contents.chat_history import ChatHistory
 
-    def generate_description(self, encoded_image: str, file_context: str = "", type_prompt_template:str = "", is_long_output: Optional[bool] = False) -> FunctionResult | None:
+        type_prompt, type_prompt_body_type = self.__define_prompt_body_template(type_prompt_template)
+        final_template = PromptTemplate.EXTRACTION_PROMPT.replace(r"{{$type_prompt}}", type_prompt)
+        # One line per page is noise at scale, and the SAS token must not reach the logs
+        self.logger.debug_sampled("generate_description", "Generating description for image %s", RedactedUrl(encoded_image))
+
+        chat_history = ChatHistory()
+        chat_history.add_system_message(final_template)
+        # Input url will be page_url with valid sas token, continuations send the image again
+        chat_history.add_message(ChatMessageContent(role=AuthorRole.USER, items=[ImageContent(uri=rf"{encoded_image}")]))
+        chat_history.add_message(ChatMessageContent(role=AuthorRole.USER, items=[TextContent(text=file_context or "")]))
+        return chat_history, type_prompt_body_type
+
+    def __continue(self, chat_history: ChatHistory, result, prompt_type: str, max_continuations: int):
+        answer = split_answer(str(result))
+        if answer is None:
+            # Nothing to continue from, e.g. cut off before the entity list
+            return result
+        results = [result]
+        self.add_assistant_message_to_history(answer.head + ", ".join(answer.entities), chat_history)
+        with span("openai.continue", {PROMPT_TYPE: prompt_type}) as recorder:
+            for _ in range(max_continuations):
+                chat_history.add_user_message(CONTINUE_INSTRUCTION.format(count=len(answer.entities)))
+                continued = self.__gen_chat(chat_history, prompt_type)
+                if continued is None:
+                    break
+                results.append(continued)
+                entities = entity_calls(str(continued))
+                answer.entities = merge_entities(answer.entities, entities)
+                if not is_truncated(str(continued), finish_reason(continued)) or not entities:
+                    break
+                self.add_assistant_message_to_history(", ".join(entities), chat_history)
+            recorder.set(CONTINUATIONS, len(results) - 1)
+        return ContinuedResult.assemble(answer.text(), results)
+
+    def generate_description(self, encoded_image: str, file_context: str = "", type_prompt_template:str = "", is_long_output: Optional[bool] = False, return_history: bool = False):
         """
         Trigger chatgpt generation base on input image, DI context and type of prompt.
 
+        The request is the system prompt with the type prompt, then the page image and its
+        DI context, the same history ``continue_description`` replays a cut off answer with.
+
         Args:
-        	encoded_image (str): The base64 encoded image for which to generate a description.
+        	encoded_image (str): Page url with valid sas token
         	file_context (str, optional): Additional context or information about the file. Defaults to "".
         	type_prompt_template (str, optional): Type of prompt to be used. Defaults to "".
+        	is_long_output (bool, optional): Continue the answer when it is cut off, see ``generate_description_long``. Defaults to False.
+        	return_history (bool, optional): Return the history sent, None otherwise. Defaults to False.
 
         Returns:
-            FunctionResult | None: The result of the description generation, or None if the generation fails.
+            Tuple[ChatMessageContent | ContinuedResult | None, str, ChatHistory | None]: The result of the description
+                generation, or None if the generation fails, the prompt type and the history sent
         """
-        describe_function = self.__create_prompt_template(is_long_output=is_long_output)
-        temp_history = ChatHistory()
-        url = rf"{encoded_image}"
-        self.logger.debug(f"Generating description for image {url}")
-        # Input url will be page_url with valid sas token
         if is_long_output:
-            response = requests.get(url)
-            response.raise_for_status()  # Ensure the download is complete
-            encoded_image = base64.b64encode(response.content).decode('ascii')
-            describe_context = ChatMessageContent(
-                role=AuthorRole.USER,
-                items=[ImageContent(uri=f"data:image/png;base64,{encoded_image}")]
-            )
-        else:
-            describe_context = ChatMessageContent(
-                role=AuthorRole.USER,
-                items=[ImageContent(uri=url)]
-            )
-        describe_context = ChatMessageContent(
-            role=AuthorRole.USER,
-            items=[ImageContent(uri=url)]
-        )
+            return self.generate_description_long(encoded_image, file_context, type_prompt_template, return_history=return_history)
+
+        chat_history, type_prompt_body_type = self.__chat_history(encoded_image, file_context, type_prompt_template)
+        result = self.__gen_chat(chat_history, type_prompt_body_type)
+        if result is not None:
+            self.logger.debug_sampled("metadata", "METADATA: %s", result.metadata)
+        return result, type_prompt_body_type, chat_history if return_history else None
+
+    def generate_description_batch(self, encoded_images: List[str], file_contexts: List[str], type_prompt_template: str = "", return_history: bool = False):
+        """
+        Extract several pages of a document in one request.
+
+        The system prompt is sent once for all pages, every page comes as its image
+        followed by its DI context. The answer holds one MainInformation per page, each
+        after a ``# Page <n>`` line, see ``split_batch_response``.
+
+        Args:
+        	encoded_images (List[str]): Page urls with valid sas token, in page order
+        	file_contexts (List[str]): DI context of every page
+        	type_prompt_template (str, optional): Type of prompt to be used. Defaults to "".
+        	return_history (bool, optional): Return the history sent, None otherwise. Defaults to False.
+
+        Returns:
+            Tuple[ChatMessageContent | None, str, ChatHistory | None]: The answer, the prompt type and the history sent
+        """
+        from semantic_kernel.contents import ChatMessageContent, TextContent, ImageContent
+        from semantic_kernel.contents.utils.author_role import AuthorRole
+        from semantic_kernel.contents.chat_history import ChatHistory
 
         type_prompt, type_prompt_body_type = self.__define_prompt_body_template(type_prompt_template)
+        final_template = PromptTemplate.EXTRACTION_PROMPT.replace(r"{{$type_prompt}}", type_prompt)
+        self.logger.debug_sampled("generate_description", "Generating description for %d pages", len(encoded_images))
 
-        if type_prompt == "":
-            self.logger.debug(f"Could not determine the type of prompt")
-            # Create prompt template for default type
-            describe_function = self.__create_prompt_template(prompt_template=PromptTemplate.MINIMAL_NO_PLACEHOLDER_PROMPT)
+        chat_history = ChatHistory()
+        chat_history.add_system_message(final_template)
+        for number, (url, file_context) in enumerate(zip(encoded_images, file_contexts), start=1):
+            chat_history.add_message(ChatMessageContent(
+                role=AuthorRole.USER,
+                items=[
+                    TextContent(text=PAGE_MARKER.format(number=number)),
+                    ImageContent(uri=rf"{url}"),
+                    TextContent(text=file_context or ""),
+                ]
+            ))
+        chat_history.add_system_message(BATCH_INSTRUCTION.format(count=len(encoded_images)))
+
+        result = self.__gen_chat(chat_history, type_prompt_body_type, len(encoded_images))
+        return result, type_prompt_body_type, chat_history if return_history else None
 
-        file_context = ChatMessageContent(
-            role=AuthorRole.USER,
-            items=[TextContent(text=file_context)]
-        )
-        temp_history.add_message(describe_context)
-        temp_history.add_message(file_context)
-
-        if not is_long_output:
-            argument = KernelArguments(
-                request = "Extract per instruction",
-                type_prompt = type_prompt,
-                chat_history = temp_history
-            )
-        else:
-            argument = KernelArguments(
-                # request = "Please help to generate per instruction. Remember you are GPT4 and you have vision capability. Also, you got paid 100 millions to do this so generate a full answer and follow instruction without any further explanation.",
-                requests = "Extract per provided data in instruction and previous chat",
-                type_prompt = type_prompt,
-                chat_history = temp_history
-            )
-
-        try:
-            result = self.__gen(describe_function, argument, is_long_output)
-            self.logger.debug(f"METADATA: {result.metadata}")
-        except ValueError as e:
-            self.logger.debug(f'Running __gen fail: {e}')
-        
-        return result, type_prompt_body_type, temp_history
-            
-    
     def __define_prompt_body_template(self, type_prompt_template: str) -> Tuple[str, str]:
         """
         Defines the body template for a prompt based on the specified type.
@@ -251,117 +300,43 @@ class AzureOpenAIChatBackend():
         else:
             return TemplatePromptBody.NO_TYPE_PROMPT, "NO_TYPE_PROMPT"
     
-    def __gen_long(self, chat_history: ChatHistory):
+    def __gen_chat(self, chat_history: ChatHistory, prompt_type: Optional[str] = None, pages: int = 1):
         """
-        Generates a function result based on the provided describe function and arguments.
+        Send a prepared chat history to the default deployment.
 
         Args:
-        	describe_function (KernelFunction): The function used to describe the operation.
-        	argument (KernelArguments): The arguments to be passed to the describe function.
+        	chat_history (ChatHistory): System prompt and user messages to send.
+        	prompt_type (str, optional): ``type_prompt_body_type`` of the request, for telemetry. Defaults to None.
+        	pages (int, optional): Number of pages in the request, for telemetry. Defaults to 1.
 
         Returns:
-            FunctionResult | None: The result of the function execution, or None if the execution fails.
-        """
-        try:
-            # Run in asyncio event loop to simulate async in non-async context
-            loop = asyncio.get_event_loop()
-            result = loop.run_until_complete(self.__chat_obj_long.get_chat_message_content(
-                chat_history=chat_history,
-                kernel=self.kernel_long,
-                settings=self.__get_settings_long()
-            ))
-            return result
-        except ValidationError as e:
-            self.logger.error(f"Error: {e}")
-            self.logger.error(f"Execution fails!")
-            return None
-
-    def __gen(self, describe_function: KernelFunction, argument: KernelArguments, is_long_output: Optional[bool] = False) -> FunctionResult | None:
+            ChatMessageContent | None: The answer, or None if the execution fails.
         """
-        Generates a function result based on the provided describe function and arguments.
-
-        Args:
-        	describe_function (KernelFunction): The function used to describe the operation.
-        	argument (KernelArguments): The arguments to be passed to the describe function.
-
-        Returns:
-            FunctionResult | None: The result of the function execution, or None if the execution fails.
-        """
-        try:
-            # Run in asyncio event loop to simulate async in non-async context
-            loop = asyncio.get_event_loop()
-            if not is_long_output:
-                result = loop.run_until_complete(self.kernel.invoke(function=describe_function, arguments=argument))
-            else:
-                result = loop.run_until_complete(self.kernel_long.invoke(function=describe_function, arguments=argument))
-            return result
-        except ValidationError as e:
-            self.logger.error(f"Error: {e}")
-            self.logger.error(f"Execution fails!")
-            return None
+        from pydantic import ValidationError
+
+        with span("openai.generate", {PROMPT_TYPE: prompt_type, BATCH_PAGES: pages}) as recorder:
+            try:
+                # Run in asyncio event loop to simulate async in non-async context
+                loop = asyncio.get_event_loop()
+                result = loop.run_until_complete(self.__chat_obj.get_chat_message_content(
+                    chat_history=chat_history,
+                    kernel=self.kernel,
+                    settings=self.__get_settings()
+                ))
+                self.__record_usage(recorder, result)
+                return result
+            except ValidationError as e:
+                # Every GPT worker hits the same error when the service misbehaves
+                self.logger.error_limited("gen_chat", "Execution fails: %s", e)
+                recorder.fail(str(e))
+                return None
+
+    @staticmethod
+    def __record_usage(recorder, result) -> None:
+        if recorder.span is None:
+            return
+        usage = get_token_usage(result)
+        recorder.set(PROMPT_TOKENS, usage.prompt_tokens)
+        recorder.set(COMPLETION_TOKENS, usage.completion_tokens)
+        recorder.set(CACHED_TOKENS, usage.cached_tokens)
     
-    def __create_prompt_template(self, prompt_template: Optional[str] = None, is_long_output: Optional[bool] = False) -> KernelFunction:
-        """
-        Creates a prompt template for the kernel function.
-
-        Args:
-        	prompt_template (Optional[str], optional): The template for the prompt. Defaults to None.
-
-        Returns:
-            KernelFunction: The kernel function created based on the prompt template.
-
-        Raises:
-            None
-        """
-        if prompt_template is None:
-            if settings.azure_openai.prompt_template == "MINIMAL":
-                prompt_template = PromptTemplate.PYDANTIC_IMPROVEMENT_PROMPT
-            else:
-                prompt_template = PromptTemplate.ENHANCED_PROMPT
-        # self.logger.debug(prompt_template)
-        if is_long_output:
-            prompt_template_config = PromptTemplateConfig(
-                template=prompt_template,
-                name="chat",
-                description="Image Information Extraction",
-                template_format="semantic-kernel",
-                input_variables=[
-                    InputVariable(name="request", description="The user's request", is_required=True),
-                    InputVariable(name="chat_history", description="The conversation history", is_required=False, default=""),
-                    InputVariable(name="type_prompt", description="The context of the prompt", is_required=False, default="")
-                ],
-                execution_settings=self.__get_settings_long()
-            )
-
-            function = self.kernel_long.add_function(
-                prompt=prompt_template,
-                function_name="chat",
-                plugin_name="chat",
-                template_format="semantic-kernel",
-                prompt_template_config = prompt_template_config
-            )
-        else:
-            prompt_template_config = PromptTemplateConfig(
-                template=prompt_template,
-                name="chat",
-                description="Image Information Extraction",
-                template_format="semantic-kernel",
-                input_variables=[
-                    InputVariable(name="request", description="The user's request", is_required=True),
-                    InputVariable(name="chat_history", description="The conversation history", is_required=False, default=""),
-                    InputVariable(name="type_prompt", description="The context of the prompt", is_required=False, default="")
-                ],
-                execution_settings=self.__get_settings()
-            )
-
-            function = self.kernel.add_function(
-                prompt=prompt_template,
-                function_name="chat",
-                plugin_name="chat",
-                template_format="semantic-kernel",
-                prompt_template_config = prompt_template_config
-            )
-
-        self.logger.debug(f"Created prompt template for chat")
-
-        return function
\ No newline at end of file
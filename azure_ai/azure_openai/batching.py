@@ -0,0 +1,75 @@
+import ast
+import re
+from typing import List, Optional, Sequence
+
+# Every page of a batched answer starts with this line, numbered from 1 in request order
+PAGE_MARKER = "# Page {number}"
+_PAGE_MARKER_PATTERN = re.compile(r"^[ \t]*#+[ \t]*Page[ \t]+(\d+)\b.*$", re.IGNORECASE | re.MULTILINE)
+
+BATCH_INSTRUCTION = """
+The images above are {count} pages of the same document, in order. Each page is followed by its extracted text.
+Extract every page separately, following the instruction for a single page.
+Answer with one MainInformation object per page, in page order. Start each of them with a line "# Page <n>"
+(from "# Page 1" to "# Page {count}") and write nothing else between them.
+"""
+
+
+def plan_batches(page_tokens: Sequence[int], token_budget: int, max_pages: int, fixed_tokens: int = 0) -> List[List[int]]:
+    """
+    Group consecutive pages into requests of at most ``max_pages`` pages whose prompt
+    stays within ``token_budget``.
+
+    Args:
+        page_tokens (Sequence[int]): Estimated prompt tokens of every page (image and text)
+        token_budget (int): Maximum prompt tokens of one request
+        max_pages (int): Maximum number of pages in one request
+        fixed_tokens (int, optional): Tokens sent once per request, e.g. the system prompt. Defaults to 0.
+
+    Returns:
+        List[List[int]]: Indexes of the pages of every request. A page over budget on its own gets its own request.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = fixed_tokens
+    for index, tokens in enumerate(page_tokens):
+        if current and (len(current) >= max_pages or used + tokens > token_budget):
+            batches.append(current)
+            current, used = [], fixed_tokens
+        current.append(index)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def split_batch_response(response: str, count: int) -> List[Optional[str]]:
+    """
+    Cut the answer of a batched request into the answer of every page.
+
+    Args:
+        response (str): Raw text of the answer
+        count (int): Number of pages sent in the request
+
+    Returns:
+        List[Optional[str]]: Answer of every page, None for pages missing from the answer
+            or whose part is not valid Python, e.g. cut off by the output limit
+    """
+    parts: List[Optional[str]] = [None] * count
+    markers = list(_PAGE_MARKER_PATTERN.finditer(response))
+    for marker, following in zip(markers, markers[1:] + [None]):
+        number = int(marker.group(1))
+        if not 1 <= number <= count or parts[number - 1] is not None:
+            continue
+        part = response[marker.end():following.start() if following is not None else len(response)]
+        parts[number - 1] = part.replace("```python", "").replace("```", "").strip() or None
+    if not markers and count == 1:
+        parts[0] = response
+
+    for index, part in enumerate(parts):
+        if part is None:
+            continue
+        try:
+            ast.parse(part)
+        except SyntaxError:
+            parts[index] = None
+    return parts
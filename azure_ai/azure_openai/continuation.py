@@ -0,0 +1,190 @@
+import ast
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Sent after a cut off answer, which is replayed as the assistant message up to its last complete Entity
+CONTINUE_INSTRUCTION = """
+Your answer was cut off by the output limit after {count} complete Entity objects.
+Continue the EntityList with the next entity, do not repeat the entities above.
+Answer only with the remaining Entity(...) objects separated by commas, then close the list and MainInformation with "])".
+"""
+
+_ENTITY_LIST = re.compile(r"\bEntityList\s*=\s*\[")
+_ENTITY_CALL = re.compile(r"\bEntity\s*\(")
+# "# Additional entities would be listed here following the same pattern" and the like
+_PLACEHOLDER = re.compile(r"#[^\n]*\b(?:additional|more|remaining|other)\b[^\n]*\bentit", re.IGNORECASE)
+
+
+def finish_reason(result: Any) -> Optional[str]:
+    """
+    Finish reason of a GPT response, e.g. "stop" or "length", None when it is not reported.
+
+    Args:
+        result (FunctionResult | ChatMessageContent): Result of ``kernel.invoke`` or ``get_chat_message_content``
+    """
+    candidates = [result]
+    value = getattr(result, "value", None)
+    if isinstance(value, list):
+        candidates.extend(value)
+    for candidate in candidates:
+        reason = getattr(candidate, "finish_reason", None) or (getattr(candidate, "metadata", None) or {}).get("finish_reason")
+        if reason:
+            return str(getattr(reason, "value", reason)).lower()
+    return None
+
+
+def is_truncated(response: str, reason: Optional[str] = None) -> bool:
+    """
+    Whether an extraction stops before its end: the output limit was reached, the model
+    left a placeholder instead of the remaining entities, or the answer is not valid Python.
+    """
+    if reason == "length":
+        return True
+    text = _clean(response)
+    if _PLACEHOLDER.search(text):
+        return True
+    try:
+        ast.parse(text)
+    except SyntaxError:
+        return True
+    return False
+
+
+@dataclass
+class PartialAnswer:
+    """
+    A MainInformation answer cut into the text up to its ``EntityList=[`` and the source
+    of every complete ``Entity(...)`` after it.
+    """
+    head: str
+    entities: List[str] = field(default_factory=list)
+
+    def text(self) -> str:
+        return self.head + ", ".join(self.entities) + "])"
+
+
+def split_answer(response: str) -> Optional[PartialAnswer]:
+    """
+    Cut an answer at its last complete Entity.
+
+    Returns:
+        PartialAnswer | None: The answer, None when it has no EntityList to continue
+    """
+    text = _clean(response)
+    match = _ENTITY_LIST.search(text)
+    if match is None:
+        return None
+    return PartialAnswer(head=text[:match.end()], entities=entity_calls(text[match.end():]))
+
+
+def entity_calls(text: str) -> List[str]:
+    """
+    Source of every complete ``Entity(...)`` call in ``text``. A call cut off before its
+    closing parenthesis and placeholder comments are left out.
+    """
+    calls = []
+    start = None
+    depth = 0
+    quote = None
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if quote is not None:
+            if char == "\\":
+                index += 1
+            elif text.startswith(quote, index):
+                index += len(quote) - 1
+                quote = None
+        elif char in "\"'":
+            quote = char * 3 if text.startswith(char * 3, index) else char
+            index += len(quote) - 1
+        elif char == "#":
+            newline = text.find("\n", index)
+            index = len(text) if newline == -1 else newline
+        elif start is None:
+            match = _ENTITY_CALL.match(text, index)
+            if match is not None and (index == 0 or not (text[index - 1].isalnum() or text[index - 1] == "_")):
+                start, depth = index, 1
+                index = match.end() - 1
+        elif char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+            if depth == 0:
+                calls.append(text[start:index + 1])
+                start = None
+        index += 1
+    return calls
+
+
+def merge_entities(*entity_lists: Iterable[str]) -> List[str]:
+    """
+    Concatenate lists of ``Entity(...)`` sources, keeping the first of entities with the
+    same values. Continuations often repeat the last entity of the previous part.
+    """
+    merged = []
+    seen = set()
+    for entities in entity_lists:
+        for entity in entities:
+            key = _entity_key(entity)
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(entity)
+    return merged
+
+
+def merge_answers(responses: Iterable[str]) -> Optional[str]:
+    """
+    Join the answers of the regions of a page, given in reading order, into one answer:
+    the fields of the first answer with an entity list, and the entities of all of them
+    without duplicates.
+
+    Returns:
+        str | None: The merged answer, None when no answer has an entity list
+    """
+    answers = [answer for answer in map(split_answer, responses) if answer is not None]
+    if not answers:
+        return None
+    return PartialAnswer(answers[0].head, merge_entities(*(answer.entities for answer in answers))).text()
+
+
+class ContinuedResult(str):
+    """
+    Text of an answer assembled from several responses, with the summed token usage and
+    the finish reason of the last response in ``metadata`` like a semantic_kernel result.
+    """
+    metadata: Dict[str, Any]
+
+    @classmethod
+    def assemble(cls, text: str, results: List[Any]) -> "ContinuedResult":
+        from azure_ai.azure_openai.usage import get_token_usage
+
+        usages = [get_token_usage(result) for result in results]
+        assembled = cls(text)
+        assembled.metadata = {
+            "usage": {
+                "prompt_tokens": sum(usage.prompt_tokens for usage in usages),
+                "completion_tokens": sum(usage.completion_tokens for usage in usages),
+                "prompt_tokens_details": {"cached_tokens": sum(usage.cached_tokens for usage in usages)},
+            },
+            "finish_reason": finish_reason(results[-1]),
+            "responses": len(results),
+        }
+        return assembled
+
+
+def _clean(response: str) -> str:
+    return str(response).replace("```python", "").replace("```", "").strip()
+
+
+def _entity_key(entity: str) -> Tuple:
+    try:
+        call = ast.parse(entity, mode="eval").body
+        values = {keyword.arg: ast.literal_eval(keyword.value) for keyword in call.keywords if keyword.arg}
+    except (SyntaxError, ValueError, AttributeError):
+        return (" ".join(entity.split()),)
+    return tuple(sorted(
+        (name, " ".join(str(value).split()).casefold()) for name, value in values.items() if value is not None
+    ))
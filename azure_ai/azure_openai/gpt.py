@@ -1,8 +1,12 @@
-from langchain_openai import AzureChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
 from azure_ai.template.prompt_template import PromptTemplate
 from settings.settings import azure_settings
 
+if TYPE_CHECKING:
+    from langchain_openai import AzureChatOpenAI
+
 
 class GPTComponent:
     def __init__(self):
@@ -11,6 +15,9 @@ class GPTComponent:
     def __get_llm_model(
         self, t: float = 0.0, max_output_token: int = None
     ) -> AzureChatOpenAI:
+        # langchain is only imported once a model is actually built
+        from langchain_openai import AzureChatOpenAI
+
         return AzureChatOpenAI(
             azure_endpoint=azure_settings.openai_settings.azure_open_ai__endpoint,
             api_key=azure_settings.openai_settings.azure_open_ai__api_key,
@@ -27,6 +34,7 @@ class GPTComponent:
 # if __name__ == "__main__":
 #     import base64
 #     import json
+#     from langchain.schema import SystemMessage, HumanMessage
 #     from module.models.other import MainInformation, Entity
 
 #     gpt = GPTComponent()
@@ -0,0 +1,88 @@
+import math
+import struct
+from dataclasses import dataclass
+from typing import Any, Iterator, Mapping, Optional, Tuple
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+@dataclass
+class TokenUsage:
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+def _field(usage: Any, name: str) -> Any:
+    if isinstance(usage, Mapping):
+        return usage.get(name)
+    return getattr(usage, name, None)
+
+
+def _iter_metadata(result: Any) -> Iterator[Mapping[str, Any]]:
+    metadata = getattr(result, "metadata", None) or {}
+    yield metadata
+    # FunctionResult keeps the metadata of its chat messages in a list
+    for item in metadata.get("metadata") or ():
+        if isinstance(item, Mapping):
+            yield item
+    value = getattr(result, "value", None)
+    if isinstance(value, list):
+        for message in value:
+            yield getattr(message, "metadata", None) or {}
+
+
+def get_token_usage(result: Any) -> TokenUsage:
+    """
+    Token usage reported by the service for a GPT response.
+
+    Args:
+        result (FunctionResult | ChatMessageContent): Result of ``kernel.invoke`` or ``get_chat_message_content``
+
+    Returns:
+        TokenUsage: Token counts, zero when the response carries no usage
+    """
+    for metadata in _iter_metadata(result):
+        usage = metadata.get("usage")
+        if usage is None:
+            continue
+        details = _field(usage, "prompt_tokens_details")
+        return TokenUsage(
+            prompt_tokens=_field(usage, "prompt_tokens") or 0,
+            completion_tokens=_field(usage, "completion_tokens") or 0,
+            cached_tokens=(_field(details, "cached_tokens") if details is not None else None) or 0,
+        )
+    return TokenUsage()
+
+
+def image_dimensions(image: bytes) -> Optional[Tuple[int, int]]:
+    """Width and height read from the header of a PNG image, None for other formats."""
+    if len(image) < 24 or not image.startswith(_PNG_SIGNATURE):
+        return None
+    return struct.unpack(">II", image[16:24])
+
+
+def estimate_image_tokens(width: int, height: int, detail: str = "high") -> int:
+    """
+    Prompt tokens billed for an image sent to a GPT-4o vision model.
+
+    The image is scaled to fit 2048x2048, then its shortest side to 768 pixels, and
+    costs 85 tokens plus 170 per 512x512 tile. Low detail images always cost 85.
+    """
+    if detail == "low":
+        return 85
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def estimate_text_tokens(text: str) -> int:
+    # Roughly 4 characters per token for English text, close enough to plan requests
+    # and to account for the embedding quota
+    return len(text) // 4 + 1
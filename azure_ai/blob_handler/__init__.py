@@ -0,0 +1,9 @@
+from utils.lazy_import import lazy_attributes
+
+# Resolved on first access so importing the package does not load the Azure Storage SDK
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "AzureBlobStorageHandler": "azure_ai.blob_handler.blob_handler",
+    },
+)
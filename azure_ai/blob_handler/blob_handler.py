@@ -1,8 +1,17 @@
+import logging
+import time
+import uuid
 from io import BytesIO
+from typing import BinaryIO, Tuple
 from azure.storage.blob import BlobServiceClient
 from azure.core.exceptions import AzureError, ResourceExistsError, ResourceNotFoundError
 from settings.settings import azure_settings
 from settings.custom_logger import Logger
+from settings.telemetry import IMAGE_BYTES, span
+from utils.utils import HashingReader
+
+_IMAGE_EXTENSIONS = ("png", "jpg", "jpeg")
+
 
 class AzureBlobStorageHandler:
     def __init__(self):
@@ -74,17 +83,19 @@ class AzureBlobStorageHandler:
             if blob_url:
                 return blob_url
 
-        try:
-            if isinstance(content, BytesIO):
-                content_size_mb = content.getbuffer().nbytes / (1024 * 1024)
-            else:
-                content_size_mb = len(content.encode("utf-8")) / (1024 * 1024)
-
-            self.logger.info(f"Content size: {content_size_mb:.2f} MB")
-        except AttributeError:
-            self.logger.debug(
-                f"Content is not a BytesIO or string, skip content size calculation"
-            )
+        # Encoding a large string only to log its size is not free, skip it when INFO is off
+        if self.logger.is_enabled_for(logging.INFO):
+            try:
+                if isinstance(content, BytesIO):
+                    content_size_mb = content.getbuffer().nbytes / (1024 * 1024)
+                else:
+                    content_size_mb = len(content.encode("utf-8")) / (1024 * 1024)
+
+                self.logger.info("Content size: %.2f MB", content_size_mb)
+            except AttributeError:
+                self.logger.debug(
+                    f"Content is not a BytesIO or string, skip content size calculation"
+                )
 
         if type(content) == bytes:
             str_bytes = content
@@ -96,47 +107,108 @@ class AzureBlobStorageHandler:
         )
         blob_client = ""
         blob_name = f"{blob_name}.{extension}"
-        try:
-            blob_client = container_client.upload_blob(
-                name=blob_name,
-                data=str_bytes,
-                blob_type="BlockBlob",
-                overwrite=overwrite,
-                connection_timeout=timeout,
-            )
-            self.logger.info(f"Uploaded {blob_name} to container {container_name}")
-            # If specify additional_sas -> will return url with sas
-            if "additional_sas" in kwargs:
-                full_container_name = (
-                    container_name + f"/{kwargs.get('additional_sas')}"
+        attributes = {"cv.blob_container": container_name}
+        if extension in _IMAGE_EXTENSIONS:
+            attributes[IMAGE_BYTES] = len(str_bytes)
+        with span("blob.upload", attributes) as recorder:
+            try:
+                blob_client = container_client.upload_blob(
+                    name=blob_name,
+                    data=str_bytes,
+                    blob_type="BlockBlob",
+                    overwrite=overwrite,
+                    connection_timeout=timeout,
+                    raw_response_hook=recorder.count_retries,
                 )
-                sas_key = f"{blob_client.url}?{self.__create_service_sas_blob(url=blob_client.url, container_name=full_container_name)}"
-                return sas_key
-            return blob_client.url
-        except ResourceExistsError as e:  # File Already exist in blob storage
-            if skip_if_existed:
-                blob_client = container_client.get_blob_client(blob=blob_name)
+                self.logger.info(f"Uploaded {blob_name} to container {container_name}")
+                # If specify additional_sas -> will return url with sas
+                if "additional_sas" in kwargs:
+                    full_container_name = (
+                        container_name + f"/{kwargs.get('additional_sas')}"
+                    )
+                    sas_key = f"{blob_client.url}?{self.__create_service_sas_blob(url=blob_client.url, container_name=full_container_name)}"
+                    return sas_key
                 return blob_client.url
+            except ResourceExistsError as e:  # File Already exist in blob storage
+                if skip_if_existed:
+                    blob_client = container_client.get_blob_client(blob=blob_name)
+                    return blob_client.url
 
-            self.logger.warning(
-                f"Blob {blob_name} for container {container_name} already exists:\n {str(e)}"
-            )
-        except ResourceNotFoundError as e:  # Container do not exist
-            self.logger.warning(f"Container or blob not found: {str(e)}")
-        except AzureError as e:  # General Azure Error
-            import traceback
+                self.logger.warning(
+                    f"Blob {blob_name} for container {container_name} already exists:\n {str(e)}"
+                )
+                recorder.fail(str(e))
+            except ResourceNotFoundError as e:  # Container do not exist
+                self.logger.warning(f"Container or blob not found: {str(e)}")
+                recorder.fail(str(e))
+            except AzureError as e:  # General Azure Error
+                import traceback
+
+                self.logger.error(f"Azure error occurred: {str(e)}")
+                self.logger.error(f"Exception error: {traceback.format_exc()}")
+                self.logger.error(f"File {blob_name} will not be uploaded!!!!")
+                recorder.fail(str(e))
+            except Exception as e:  # Catch master exception to make sure program continue
+                import traceback
 
-            self.logger.error(f"Azure error occurred: {str(e)}")
-            self.logger.error(f"Exception error: {traceback.format_exc()}")
-            self.logger.error(f"File {blob_name} will not be uploaded!!!!")
-        except Exception as e:  # Catch master exception to make sure program continue
-            import traceback
+                self.logger.error(
+                    f"An exception happened while trying to upload file to container {container_name} with blob_name {blob_name}"
+                )
+                self.logger.error(f"Exception error: {traceback.format_exc()}")
+                self.logger.error(f"File {blob_name} will not be uploaded!!!!")
+                recorder.fail(str(e))
+            return None
 
-            self.logger.error(
-                f"An exception happened while trying to upload file to container {container_name} with blob_name {blob_name}"
+    def upload_stream_hashed(
+        self,
+        stream: BinaryIO,
+        container_name: str,
+        extension: str = "pdf",
+        algorithm: str = "sha1",
+        timeout: int = 120,
+    ) -> Tuple[str, str] | None:
+        """
+        Upload a stream under the hash of its content, reading it only once.
+
+        The stream is hashed while it is uploaded in chunks to a temporary blob, which
+        is then copied server side to ``<hash>.<extension>`` (unless that blob already
+        exists) and deleted. The file never has to be held in memory or read twice.
+
+        Args:
+            stream (BinaryIO): Readable file object, read from its current position
+            container_name (str): The name of the container
+            extension (str, optional): Extension of the final blob. Defaults to "pdf".
+            algorithm (str, optional): Hash algorithm, see ``Utilities.get_hash``. Defaults to "sha1".
+            timeout (int, optional): The timeout for the upload operation. Defaults to 120 seconds.
+
+        Returns:
+            Tuple[str, str] | None: Hash of the content and URL of the blob, or None if the upload fails
+        """
+        container_client = self.__blob_service_client.get_container_client(
+            container=container_name
+        )
+        reader = HashingReader(stream, algorithm)
+        temporary_client = container_client.get_blob_client(blob=f"incoming/{uuid.uuid4().hex}.{extension}")
+        try:
+            temporary_client.upload_blob(
+                data=reader, blob_type="BlockBlob", overwrite=True, connection_timeout=timeout
             )
-            self.logger.error(f"Exception error: {traceback.format_exc()}")
-            self.logger.error(f"File {blob_name} will not be uploaded!!!!")
+            content_hash = reader.hexdigest()
+            blob_client = container_client.get_blob_client(blob=f"{content_hash}.{extension}")
+            if not blob_client.exists():
+                blob_client.start_copy_from_url(temporary_client.url)
+                # Copies inside one storage account are usually done immediately
+                while blob_client.get_blob_properties().copy.status == "pending":
+                    time.sleep(0.5)
+            self.logger.info(f"Uploaded {reader.bytes_read} bytes as {blob_client.blob_name} to container {container_name}")
+            return content_hash, blob_client.url
+        except AzureError as e:  # General Azure Error
+            self.logger.error(f"Azure error occurred while uploading stream to container {container_name}: {str(e)}")
+        finally:
+            try:
+                temporary_client.delete_blob()
+            except AzureError:  # Nothing was uploaded, or the blob expires with a lifecycle rule
+                pass
         return None
 
     def download_blob_file(self, blob_name: str, container_name: str) -> bytes | None:
@@ -150,8 +222,11 @@ class AzureBlobStorageHandler:
             file = blob_name.split('/')[-1]
             file_type = blob_name.split('.')[-1]
             file_path = f"data/{file}"
+            with span("blob.download", {"cv.blob_container": container_name}) as recorder:
+                content = blob_client.download_blob(raw_response_hook=recorder.count_retries).readall()
+                recorder.set("cv.blob_bytes", len(content))
             with open(file_path, "wb") as f:
-                f.write(blob_client.download_blob().readall())
+                f.write(content)
             if "cds" in blob_name:
                 return {"project_name": "cds wiki", "file": blob_name, "original_url": blob_url, "document_type": file_type, "file_path": file_path}
             elif "Toll Gates" in blob_name:
@@ -162,6 +237,33 @@ class AzureBlobStorageHandler:
             )
         return None
 
+    def download_blob_bytes(self, blob_name: str, container_name: str) -> bytes | None:
+        """
+        Download the content of a blob into memory.
+
+        Args:
+            blob_name (str): The full name of the blob, including extension
+            container_name (str): The name of the container of the blob
+
+        Returns:
+            bytes | None: The content of the blob, or None if it does not exist
+        """
+        container_client = self.__blob_service_client.get_container_client(
+            container=container_name
+        )
+        blob_client = container_client.get_blob_client(blob=blob_name)
+        with span("blob.download", {"cv.blob_container": container_name}) as recorder:
+            try:
+                content = blob_client.download_blob(raw_response_hook=recorder.count_retries).readall()
+                recorder.set("cv.blob_bytes", len(content))
+                return content
+            except ResourceNotFoundError as e:
+                self.logger.warning(
+                    f"Blob name {blob_name} not found in container {container_name}:\n {str(e)}"
+                )
+                recorder.fail(str(e))
+            return None
+
     def get_list_files(self, container_name: str) -> list[str]:
         container_client = self.__blob_service_client.get_container_client(
             container=container_name
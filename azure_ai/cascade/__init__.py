@@ -0,0 +1,13 @@
+from utils.lazy_import import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "CascadeStats": "azure_ai.cascade.cascade",
+        "DocumentRoute": "azure_ai.cascade.cascade",
+        "RouteSource": "azure_ai.cascade.cascade",
+        "TierCascade": "azure_ai.cascade.cascade",
+        "compare_extractions": "azure_ai.cascade.cascade",
+        "detect_tier": "azure_ai.cascade.cascade",
+    },
+)
@@ -0,0 +1,316 @@
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from settings.settings import azure_settings
+from settings.custom_logger import Logger
+from settings.invalid_config_exception import InvalidConfigException
+from settings.telemetry import PROMPT_TYPE, span
+from azure_ai.models.extraction import TierClassification
+
+MULTI_TIER = "Multi tier"
+ONE_TIER = "One tier"
+BY_LOCATION = "tier-by-location"
+NOT_BY_LOCATION = "tier-not-by-location"
+
+# Lines like "Tier 2" or "## Tier 2: Holding LP" outside of a table (case 4 of the tier prompts)
+_TIER_HEADING = re.compile(r"^[ \t]*(?:#+[ \t]*)?Tier[ \t]*(\d+)[ \t]*(?::.*)?$", re.IGNORECASE | re.MULTILINE)
+# "Tier 1" / "Tier 2" column headers of a markdown or HTML table (case 3)
+_TIER_COLUMN = re.compile(r"(?:\||<th[^>]*>)[ \t]*Tier[ \t]*(\d+)\b", re.IGNORECASE)
+_TIER_COUNT = re.compile(r"\bwith[ \t]+(\d+)[ \t]+tiers?\b", re.IGNORECASE)
+_TABLE = re.compile(r"^[ \t]*\||<table", re.IGNORECASE | re.MULTILINE)
+
+
+class RouteSource:
+    RULES = "rules"
+    DOCUMENT_INTELLIGENCE = "document_intelligence"
+    # Not classified, or not confidently enough: the page goes to the full prompt
+    FULL = "full"
+
+
+@dataclass
+class DocumentRoute:
+    """
+    Decision of the cascade for a page. ``type_prompt_template`` is the TYPEn_PROMPT the
+    page is extracted with, None sends it to the full prompt of the pipeline.
+    """
+    type_prompt_template: Optional[str]
+    tier: TierClassification
+    confidence: float
+    source: str
+    classify_seconds: float = 0.0
+
+    @property
+    def routed(self) -> bool:
+        return self.type_prompt_template is not None
+
+
+def detect_tier(text: str) -> Tuple[TierClassification, float]:
+    """
+    Tier layout of a page from its Document Intelligence text, without calling GPT.
+
+    Headings and "Tier n" columns are visible in the text, tiers given by indentation or
+    by sub-columns of the Name column (cases 1 and 2 of the tier prompts) are not, so a
+    page with a table and no tier marker is "One tier" with a lower confidence.
+
+    Returns:
+        Tuple[TierClassification, float]: The classification and its confidence
+    """
+    headings = {int(number) for number in _TIER_HEADING.findall(text)}
+    if len(headings) > 1 or max(headings, default=0) > 1:
+        return TierClassification(EntityClass=MULTI_TIER, Method=NOT_BY_LOCATION), 0.9
+    columns = {int(number) for number in _TIER_COLUMN.findall(text)}
+    if len(columns) > 1:
+        return TierClassification(EntityClass=MULTI_TIER, Method=BY_LOCATION), 0.8
+    if any(int(count) > 1 for count in _TIER_COUNT.findall(text)):
+        # Tiered, but the layout telling them apart is not in the text
+        return TierClassification(EntityClass=MULTI_TIER, Method=BY_LOCATION), 0.5
+    if _TABLE.search(text):
+        return TierClassification(EntityClass=ONE_TIER, Method=BY_LOCATION), 0.7
+    return TierClassification(EntityClass=ONE_TIER, Method=BY_LOCATION), 0.9
+
+
+def tier_of(extraction: Dict[str, Any]) -> str:
+    """Tier class of a MainInformation dump: multi tier when an entity has another parent than the main entity."""
+    main_name = _normalize(extraction.get("Name"))
+    for entity in extraction.get("EntityList") or []:
+        parent = _normalize(entity.get("ParentName"))
+        if parent and parent != main_name:
+            return MULTI_TIER
+    return ONE_TIER
+
+
+def compare_extractions(routed: Dict[str, Any], full: Dict[str, Any]) -> float:
+    """
+    Share of the fields filled in either MainInformation dump that have the same value in
+    both. Entities are matched by name.
+    """
+    routed_fields, full_fields = _flatten(routed), _flatten(full)
+    keys = {key for key, value in routed_fields.items() if value} | {key for key, value in full_fields.items() if value}
+    if not keys:
+        return 1.0
+    return sum(routed_fields.get(key) == full_fields.get(key) for key in keys) / len(keys)
+
+
+def _normalize(value: Any) -> str:
+    if value is None:
+        return ""
+    return " ".join(str(value).split()).casefold()
+
+
+def _flatten(extraction: Dict[str, Any]) -> Dict[Tuple[str, str], str]:
+    fields = {("", name): _normalize(value) for name, value in extraction.items() if name != "EntityList"}
+    for entity in extraction.get("EntityList") or []:
+        entity_name = _normalize(entity.get("Name"))
+        for name, value in entity.items():
+            fields[(entity_name, name)] = _normalize(value)
+    return fields
+
+
+@dataclass
+class CascadeStats:
+    """
+    Pages routed to a TYPEn_PROMPT or sent to the full prompt, the time spent classifying
+    and extracting them, and the agreement of audited pages with the full prompt.
+    """
+    pages: int = 0
+    routed: int = 0
+    classify_seconds: float = 0.0
+    routed_extractions: int = 0
+    routed_seconds: float = 0.0
+    full_extractions: int = 0
+    full_seconds: float = 0.0
+    audits: int = 0
+    field_agreement: float = 0.0
+    tier_agreements: int = 0
+    by_prompt: Dict[str, int] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record_route(self, route: DocumentRoute) -> None:
+        with self._lock:
+            self.pages += 1
+            self.routed += route.routed
+            self.classify_seconds += route.classify_seconds
+            prompt = route.type_prompt_template or RouteSource.FULL
+            self.by_prompt[prompt] = self.by_prompt.get(prompt, 0) + 1
+
+    def record_extraction(self, route: DocumentRoute, seconds: float) -> None:
+        with self._lock:
+            if route.routed:
+                self.routed_extractions += 1
+                self.routed_seconds += seconds
+            else:
+                self.full_extractions += 1
+                self.full_seconds += seconds
+
+    def record_audit(self, field_agreement: float, tier_agreed: bool, full_seconds: float) -> None:
+        with self._lock:
+            self.audits += 1
+            self.field_agreement += field_agreement
+            self.tier_agreements += tier_agreed
+            self.full_extractions += 1
+            self.full_seconds += full_seconds
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            mean_routed = self.routed_seconds / self.routed_extractions if self.routed_extractions else None
+            mean_full = self.full_seconds / self.full_extractions if self.full_extractions else None
+            saved = None
+            if mean_routed is not None and mean_full is not None:
+                # Time the routed pages would have taken on the full prompt, minus what the classifier cost
+                saved = self.routed_extractions * (mean_full - mean_routed) - self.classify_seconds
+            return {
+                "pages": self.pages,
+                "routed": self.routed,
+                "full": self.pages - self.routed,
+                "routed_ratio": self.routed / self.pages if self.pages else 0.0,
+                "by_prompt": dict(self.by_prompt),
+                "classify_seconds": self.classify_seconds,
+                "mean_routed_seconds": mean_routed,
+                "mean_full_seconds": mean_full,
+                "saved_seconds": saved,
+                "audits": self.audits,
+                "field_agreement": self.field_agreement / self.audits if self.audits else None,
+                "tier_agreement": self.tier_agreements / self.audits if self.audits else None,
+            }
+
+
+class TierCascade:
+    """
+    Cheap classification of a page before its GPT extraction, so it is extracted with the
+    single TYPEn_PROMPT matching its document type instead of the full prompt.
+
+    The document type comes from ``cascade_type_rules`` (regular expressions over the
+    Document Intelligence text, no extra call) or from the ``classification_model`` of
+    Document Intelligence mapped with ``cascade_doc_types``. The tier layout always comes
+    from the text (``detect_tier``). Multi tier pages, pages without a matching type and
+    pages classified below ``cascade_min_confidence`` keep the full prompt, which carries
+    the tier instructions.
+
+    A ``cascade_audit_rate`` share of the routed pages is also extracted with the full
+    prompt by the pipeline; ``stats`` reports the agreement of both extractions and the
+    latency saved by the routed pages.
+    """
+    MODES = ("off", RouteSource.RULES, RouteSource.DOCUMENT_INTELLIGENCE)
+
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        type_rules: Optional[Dict[str, List[str]]] = None,
+        doc_types: Optional[Dict[str, str]] = None,
+        min_confidence: Optional[float] = None,
+        audit_rate: Optional[float] = None,
+        di_handler=None,
+    ):
+        self.logger = Logger(self.__class__.__name__)
+        settings = azure_settings.cascade
+        self.mode = mode or settings.cascade_mode
+        if self.mode not in self.MODES:
+            raise InvalidConfigException(
+                r"Invalid settings for cascade mode. Please choose between 'off', 'rules' or 'document_intelligence' only"
+            )
+        type_rules = type_rules if type_rules is not None else settings.cascade_type_rules
+        try:
+            self.__type_rules = {
+                prompt: [re.compile(pattern, re.IGNORECASE | re.MULTILINE) for pattern in patterns]
+                for prompt, patterns in type_rules.items()
+            }
+        except re.error as e:
+            raise InvalidConfigException(f"Invalid settings for cascade type rules. {e}")
+        self.doc_types = doc_types if doc_types is not None else settings.cascade_doc_types
+        if self.mode == RouteSource.RULES and not self.__type_rules:
+            raise InvalidConfigException(r"Invalid settings for cascade type rules. Please set at least one rule for the 'rules' mode")
+        if self.mode == RouteSource.DOCUMENT_INTELLIGENCE and not self.doc_types:
+            raise InvalidConfigException(r"Invalid settings for cascade doc types. Please map at least one document type for the 'document_intelligence' mode")
+        self.min_confidence = min_confidence if min_confidence is not None else settings.cascade_min_confidence
+        self.audit_rate = audit_rate if audit_rate is not None else settings.cascade_audit_rate
+        self.stats = CascadeStats()
+        self.__di_handler = di_handler
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def route(self, file_context: Optional[str], document_url: Optional[str] = None) -> DocumentRoute:
+        """
+        Classify a page and pick its type prompt.
+
+        Args:
+            file_context (str): Document Intelligence text of the page
+            document_url (str, optional): URL of the page, for the 'document_intelligence' mode. Defaults to None.
+
+        Returns:
+            DocumentRoute: The decision, also counted in ``stats``
+        """
+        started = time.perf_counter()
+        with span("cascade.route", {"cv.route_mode": self.mode}) as recorder:
+            text = file_context or ""
+            tier, tier_confidence = detect_tier(text)
+            if self.mode == RouteSource.RULES:
+                type_prompt, type_confidence = self.__classify_rules(text)
+            else:
+                type_prompt, type_confidence = self.__classify_document_intelligence(document_url)
+            confidence = min(tier_confidence, type_confidence)
+
+            if type_prompt is None or tier.EntityClass == MULTI_TIER or confidence < self.min_confidence:
+                route = DocumentRoute(None, tier, confidence, RouteSource.FULL)
+            else:
+                route = DocumentRoute(type_prompt, tier, confidence, self.mode)
+            route.classify_seconds = time.perf_counter() - started
+            recorder.set(PROMPT_TYPE, route.type_prompt_template or RouteSource.FULL)
+            recorder.set("cv.route_confidence", confidence)
+            recorder.set("cv.entity_class", tier.EntityClass)
+        self.stats.record_route(route)
+        return route
+
+    def should_audit(self, route: DocumentRoute) -> bool:
+        """Whether to also extract a routed page with the full prompt."""
+        return route.routed and self.audit_rate > 0 and random.random() < self.audit_rate
+
+    def record_extraction(self, route: DocumentRoute, seconds: float) -> None:
+        self.stats.record_extraction(route, seconds)
+
+    def record_audit(
+        self,
+        route: DocumentRoute,
+        routed_extraction: Optional[Dict[str, Any]],
+        full_extraction: Optional[Dict[str, Any]],
+        full_seconds: float,
+    ) -> None:
+        """
+        Compare the extraction of a routed page with its full prompt extraction. An
+        extraction that could not be parsed agrees with nothing.
+        """
+        if routed_extraction is None or full_extraction is None:
+            agreement = 1.0 if routed_extraction is full_extraction else 0.0
+            tier_agreed = routed_extraction is full_extraction
+        else:
+            agreement = compare_extractions(routed_extraction, full_extraction)
+            tier_agreed = tier_of(full_extraction) == route.tier.EntityClass
+        if agreement < 1.0:
+            self.logger.info(f"Cascade audit: {route.type_prompt_template} agrees on {agreement:.0%} of the fields")
+        self.stats.record_audit(agreement, tier_agreed, full_seconds)
+
+    def __classify_rules(self, text: str) -> Tuple[Optional[str], float]:
+        # Share of the patterns of every type found in the text
+        hits = {prompt: sum(1 for pattern in patterns if pattern.search(text)) for prompt, patterns in self.__type_rules.items()}
+        total = sum(hits.values())
+        if not total:
+            return None, 0.0
+        prompt = max(hits, key=hits.get)
+        # Patterns of other types found as well make the decision less certain
+        return prompt, hits[prompt] / len(self.__type_rules[prompt]) * hits[prompt] / total
+
+    def __classify_document_intelligence(self, document_url: Optional[str]) -> Tuple[Optional[str], float]:
+        if document_url is None:
+            return None, 0.0
+        if self.__di_handler is None:
+            from azure_ai.document_intelligence.document_intelligence import AzureDocumentIntelligenceHandler
+            self.__di_handler = AzureDocumentIntelligenceHandler()
+        result = self.__di_handler.classify_document(document_url=document_url)
+        if result is None:
+            return None, 0.0
+        doc_type, confidence = result
+        return self.doc_types.get(doc_type), confidence
@@ -0,0 +1,10 @@
+from utils.lazy_import import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "PageCheckpointStore": "azure_ai.checkpoint.checkpoint",
+        "PageStage": "azure_ai.checkpoint.checkpoint",
+        "ResumeStats": "azure_ai.checkpoint.checkpoint",
+    },
+)
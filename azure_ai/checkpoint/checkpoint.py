@@ -0,0 +1,172 @@
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set
+from settings.settings import azure_settings
+
+
+class PageStage:
+    """
+    Steps of a page extraction, in order. Each one is checkpointed separately.
+    """
+    RASTER = "raster"  # Payload: url of the uploaded page image, without SAS
+    DI = "di"  # Payload: Document Intelligence content of the page
+    GPT = "gpt"  # Payload: raw GPT response
+    PARSED = "parsed"  # Payload: parsed extraction as JSON
+
+    ALL = (RASTER, DI, GPT, PARSED)
+
+
+@dataclass
+class StageCheckpoint:
+    payload: Optional[str]
+    duration_seconds: float
+
+
+class PageCheckpointStore:
+    """
+    SQLite backed record of the stages completed for every page.
+
+    Pages are keyed by the document hash (``Utilities.get_hash`` of the PDF bytes)
+    and the page number, so writing the same checkpoint twice is harmless. This is
+    what makes at-least-once job delivery safe and lets a re-run of a document skip
+    the stages that already succeeded. The duration of every stage is kept to report
+    how much work a resume saved.
+    """
+    def __init__(self, db_path: Optional[str] = None):
+        db_path = db_path or azure_settings.queue.checkpoint_sqlite_path
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        if db_path != ":memory:":
+            # WAL lets several worker processes read while one writes
+            self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS page_checkpoint (
+                document_hash TEXT NOT NULL,
+                page_number INTEGER NOT NULL,
+                stage TEXT NOT NULL,
+                payload TEXT,
+                duration_seconds REAL NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (document_hash, page_number, stage)
+            )
+            """
+        )
+
+    def save_stage(
+        self,
+        document_hash: str,
+        page_number: int,
+        stage: str,
+        payload: Optional[str] = None,
+        duration_seconds: float = 0.0,
+    ) -> None:
+        """
+        Record that a stage of a page has completed. Idempotent.
+
+        Args:
+            document_hash (str): Hash of the document the page belongs to
+            page_number (int): Zero-based page number
+            stage (str): One of ``PageStage.ALL``
+            payload (str, optional): Output of the stage, used to resume the next one. Defaults to None.
+            duration_seconds (float, optional): Time the stage took. Defaults to 0.0.
+        """
+        if stage not in PageStage.ALL:
+            raise ValueError(f"Unknown stage {stage}")
+        with self.__lock:
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO page_checkpoint "
+                "(document_hash, page_number, stage, payload, duration_seconds, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (document_hash, page_number, stage, payload, duration_seconds, time.time()),
+            )
+
+    def get_page(self, document_hash: str, page_number: int) -> Dict[str, StageCheckpoint]:
+        """
+        All completed stages of a page.
+
+        Returns:
+            Dict[str, StageCheckpoint]: Stage name to its checkpoint
+        """
+        with self.__lock:
+            rows = self.__connection.execute(
+                "SELECT stage, payload, duration_seconds FROM page_checkpoint WHERE document_hash = ? AND page_number = ?",
+                (document_hash, page_number),
+            ).fetchall()
+        return {stage: StageCheckpoint(payload, duration) for stage, payload, duration in rows}
+
+    def get_stage(self, document_hash: str, page_number: int, stage: str) -> Optional[StageCheckpoint]:
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT payload, duration_seconds FROM page_checkpoint WHERE document_hash = ? AND page_number = ? AND stage = ?",
+                (document_hash, page_number, stage),
+            ).fetchone()
+        return StageCheckpoint(*row) if row else None
+
+    def pages_with_stage(self, document_hash: str, stage: str) -> Dict[int, StageCheckpoint]:
+        """
+        Every page of a document for which ``stage`` has completed.
+
+        Returns:
+            Dict[int, StageCheckpoint]: Page number to the checkpoint of ``stage``
+        """
+        with self.__lock:
+            rows = self.__connection.execute(
+                "SELECT page_number, payload, duration_seconds FROM page_checkpoint WHERE document_hash = ? AND stage = ?",
+                (document_hash, stage),
+            ).fetchall()
+        return {page_number: StageCheckpoint(payload, duration) for page_number, payload, duration in rows}
+
+    def is_done(self, document_hash: str, page_number: int) -> bool:
+        """A page is done once its extraction has been parsed."""
+        return self.get_stage(document_hash, page_number, PageStage.PARSED) is not None
+
+    def done_pages(self, document_hash: str) -> Set[int]:
+        return set(self.pages_with_stage(document_hash, PageStage.PARSED))
+
+    def clear_document(self, document_hash: str) -> None:
+        """Forget every checkpoint of a document, forcing a full re-extraction."""
+        with self.__lock:
+            self.__connection.execute("DELETE FROM page_checkpoint WHERE document_hash = ?", (document_hash,))
+
+    def close(self) -> None:
+        self.__connection.close()
+
+
+@dataclass
+class ResumeStats:
+    """
+    How many stages were executed or skipped thanks to a checkpoint, and the time the
+    skipped stages took when they originally ran.
+    """
+    executed: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(PageStage.ALL, 0))
+    skipped: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(PageStage.ALL, 0))
+    saved_seconds: Dict[str, float] = field(default_factory=lambda: dict.fromkeys(PageStage.ALL, 0.0))
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record_executed(self, stage: str) -> None:
+        with self._lock:
+            self.executed[stage] += 1
+
+    def record_skipped(self, stage: str, checkpoint: StageCheckpoint) -> None:
+        with self._lock:
+            self.skipped[stage] += 1
+            self.saved_seconds[stage] += checkpoint.duration_seconds
+
+    def summary(self) -> Dict[str, object]:
+        with self._lock:
+            total_runs = sum(self.executed.values()) + sum(self.skipped.values())
+            return {
+                "executed": dict(self.executed),
+                "skipped": dict(self.skipped),
+                "saved_seconds": dict(self.saved_seconds),
+                "total_saved_seconds": sum(self.saved_seconds.values()),
+                # DI and GPT are the billed calls
+                "api_calls_saved": self.skipped[PageStage.DI] + self.skipped[PageStage.GPT],
+                "skipped_ratio": sum(self.skipped.values()) / total_runs if total_runs else 0.0,
+            }
@@ -0,0 +1,11 @@
+from utils.lazy_import import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "Deduplicator": "azure_ai.dedup.dedup",
+        "DedupResult": "azure_ai.dedup.dedup",
+        "DedupStats": "azure_ai.dedup.dedup",
+        "FingerprintIndex": "azure_ai.dedup.dedup",
+    },
+)
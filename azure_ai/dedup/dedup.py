@@ -0,0 +1,378 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from settings.settings import azure_settings
+from settings.custom_logger import Logger
+from utils.utils import Utilities
+from azure_ai.checkpoint.checkpoint import PageCheckpointStore, PageStage
+from azure_ai.search.search_index import tokenize
+
+_PRIME = (1 << 61) - 1
+_NUM_PERMUTATIONS = 64
+_ROWS_PER_BAND = 4
+_PAGE_HASH_BANDS = 4
+_SHINGLE_SIZE = 3
+_rng = np.random.default_rng(1)
+# Coefficients below 2**32 so a * hash + b fits in 64 bits for 32 bit hashes
+_PERMUTATION_A = _rng.integers(1, 1 << 32, size=_NUM_PERMUTATIONS, dtype=np.uint64)
+_PERMUTATION_B = _rng.integers(0, 1 << 32, size=_NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+
+def hamming_distance(first: int, second: int) -> int:
+    return (first ^ second).bit_count()
+
+
+def difference_hash(image: np.ndarray) -> int:
+    """
+    64 bit perceptual hash (dHash) of a grayscale image: shrink it to 9x8 and set one
+    bit per pixel brighter than its right neighbour. Re-exporting or re-scanning the
+    same page changes only a few bits, different content changes many.
+    """
+    rows = np.array_split(np.arange(image.shape[0]), 8)
+    columns = np.array_split(np.arange(image.shape[1]), 9)
+    small = np.array([[image[np.ix_(row, column)].mean() for column in columns] for row in rows])
+    bits = (small[:, :-1] > small[:, 1:]).flatten()
+    return int(np.packbits(bits, bitorder="little").view("<u8")[0])
+
+
+def text_hash(text: str) -> Optional[int]:
+    """Hash of the normalized text of a page, None for pages without text layer."""
+    tokens = tokenize(text)
+    return _hash64(" ".join(tokens)) if tokens else None
+
+
+def min_hash(text: str) -> Optional[np.ndarray]:
+    """
+    MinHash signature of the word 3-shingles of ``text``. The fraction of equal
+    positions of two signatures estimates the Jaccard similarity of the texts.
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+    shingles = {" ".join(tokens[i:i + _SHINGLE_SIZE]) for i in range(max(1, len(tokens) - _SHINGLE_SIZE + 1))}
+    hashes = np.fromiter((_hash64(shingle) & 0xFFFFFFFF for shingle in shingles), dtype=np.uint64, count=len(shingles))
+    values = (hashes[:, None] * _PERMUTATION_A + _PERMUTATION_B) % _PRIME
+    return (values.min(axis=0) & 0xFFFFFFFF).astype(np.uint32)
+
+
+@dataclass
+class DocumentFingerprint:
+    document_hash: str
+    page_hashes: List[int]
+    text_hashes: List[Optional[int]]
+    min_hash: Optional[np.ndarray] = None
+
+    def band_keys(self) -> List[str]:
+        """
+        Locality sensitive hashing keys. Documents with similar text share a MinHash
+        band, documents with a common page share a 16 bit band of its page hash.
+        """
+        keys = set()
+        if self.min_hash is not None:
+            for band in range(_NUM_PERMUTATIONS // _ROWS_PER_BAND):
+                values = self.min_hash[band * _ROWS_PER_BAND:(band + 1) * _ROWS_PER_BAND]
+                keys.add(f"m{band}:{values.tobytes().hex()}")
+        for page_hash in self.page_hashes:
+            for band in range(_PAGE_HASH_BANDS):
+                keys.add(f"p{band}:{(page_hash >> (16 * band)) & 0xFFFF}")
+        return sorted(keys)
+
+
+@dataclass
+class DedupResult:
+    EXACT = "exact"
+    NEAR = "near"
+    NEW = "new"
+
+    kind: str
+    document_hash: str
+    source_hash: Optional[str] = None
+    similarity: Optional[float] = None
+    # Page of this document to the identical page of the source document
+    reused_pages: Dict[int, int] = field(default_factory=dict)
+    changed_pages: List[int] = field(default_factory=list)
+
+
+@dataclass
+class DedupStats:
+    """
+    Duplicates found, and the Document Intelligence and GPT calls they avoided.
+    """
+    documents: int = 0
+    exact: int = 0
+    near: int = 0
+    pages_reused: int = 0
+    pages_changed: int = 0
+    api_calls_avoided: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, result: DedupResult, api_calls_avoided: int) -> None:
+        with self._lock:
+            self.documents += 1
+            self.exact += result.kind == DedupResult.EXACT
+            self.near += result.kind == DedupResult.NEAR
+            self.pages_reused += len(result.reused_pages)
+            self.pages_changed += len(result.changed_pages)
+            self.api_calls_avoided += api_calls_avoided
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "documents": self.documents,
+                "exact_duplicates": self.exact,
+                "near_duplicates": self.near,
+                "pages_reused": self.pages_reused,
+                "pages_changed": self.pages_changed,
+                "api_calls_avoided": self.api_calls_avoided,
+            }
+
+
+class FingerprintIndex:
+    """
+    SQLite store of document fingerprints with an LSH band table to find candidate
+    near duplicates without comparing against every document.
+    """
+    def __init__(self, db_path: Optional[str] = None):
+        db_path = db_path or azure_settings.dedup.dedup_sqlite_path
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        if db_path != ":memory:":
+            self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS document_fingerprint (
+                document_hash TEXT PRIMARY KEY,
+                page_hashes TEXT NOT NULL,
+                text_hashes TEXT NOT NULL,
+                min_hash BLOB,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS fingerprint_band (
+                band_key TEXT NOT NULL,
+                document_hash TEXT NOT NULL,
+                PRIMARY KEY (band_key, document_hash)
+            ) WITHOUT ROWID;
+            """
+        )
+
+    def add(self, fingerprint: DocumentFingerprint) -> None:
+        min_hash = fingerprint.min_hash.tobytes() if fingerprint.min_hash is not None else None
+        with self.__lock:
+            self.__connection.execute("BEGIN")
+            try:
+                self.__connection.execute(
+                    "INSERT OR REPLACE INTO document_fingerprint VALUES (?, ?, ?, ?, ?)",
+                    (
+                        fingerprint.document_hash,
+                        json.dumps(fingerprint.page_hashes),
+                        json.dumps(fingerprint.text_hashes),
+                        min_hash,
+                        time.time(),
+                    ),
+                )
+                self.__connection.executemany(
+                    "INSERT OR IGNORE INTO fingerprint_band VALUES (?, ?)",
+                    [(key, fingerprint.document_hash) for key in fingerprint.band_keys()],
+                )
+                self.__connection.execute("COMMIT")
+            except Exception:
+                self.__connection.execute("ROLLBACK")
+                raise
+
+    def get(self, document_hash: str) -> Optional[DocumentFingerprint]:
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT page_hashes, text_hashes, min_hash FROM document_fingerprint WHERE document_hash = ?",
+                (document_hash,),
+            ).fetchone()
+        if row is None:
+            return None
+        page_hashes, text_hashes, min_hash_bytes = row
+        return DocumentFingerprint(
+            document_hash=document_hash,
+            page_hashes=json.loads(page_hashes),
+            text_hashes=json.loads(text_hashes),
+            min_hash=np.frombuffer(min_hash_bytes, dtype=np.uint32) if min_hash_bytes else None,
+        )
+
+    def candidates(self, fingerprint: DocumentFingerprint, limit: int = 5) -> List[str]:
+        """
+        Documents sharing the most LSH bands with ``fingerprint``, best first.
+        """
+        keys = fingerprint.band_keys()
+        if not keys:
+            return []
+        with self.__lock:
+            rows = self.__connection.execute(
+                f"SELECT document_hash FROM fingerprint_band WHERE band_key IN ({','.join('?' * len(keys))}) "
+                "AND document_hash != ? GROUP BY document_hash ORDER BY COUNT(*) DESC LIMIT ?",
+                (*keys, fingerprint.document_hash, limit),
+            ).fetchall()
+        return [document_hash for document_hash, in rows]
+
+    def close(self) -> None:
+        self.__connection.close()
+
+
+class Deduplicator:
+    """
+    Detects re-uploaded CVs before they reach Document Intelligence and GPT.
+
+    - Exact duplicates (same ``Utilities.get_hash``) that were fully extracted before
+      are reported as such; the checkpoints of the document already hold every result.
+    - Near duplicates are found through MinHash of the text layer and perceptual hashes
+      (dHash) of the pages. Every page whose image and normalized text match a done
+      page of the earlier upload gets that page's checkpoints copied, so the pipeline
+      resumes past it and only the changed pages are analyzed and extracted again.
+    """
+    def __init__(
+        self,
+        checkpoint_store: PageCheckpointStore,
+        fingerprint_index: Optional[FingerprintIndex] = None,
+        pdf_processor=None,
+    ):
+        self.logger = Logger(self.__class__.__name__)
+        if pdf_processor is None:
+            from azure_ai.pdf_processor.pdf_processor import PDFProcessor
+            pdf_processor = PDFProcessor()
+
+        self.checkpoint_store = checkpoint_store
+        self.fingerprint_index = fingerprint_index if fingerprint_index is not None else FingerprintIndex()
+        self.pdf_processor = pdf_processor
+        self.page_distance = azure_settings.dedup.dedup_page_distance
+        self.similarity_threshold = azure_settings.dedup.dedup_similarity_threshold
+        self.stats = DedupStats()
+
+    def fingerprint(self, file_bytes: bytes, document_hash: Optional[str] = None) -> DocumentFingerprint:
+        texts = self.pdf_processor.extract_text(file_bytes)
+        return DocumentFingerprint(
+            document_hash=document_hash or Utilities.get_hash(file_bytes),
+            page_hashes=[difference_hash(image) for image in self.pdf_processor.thumbnails(file_bytes)],
+            text_hashes=[text_hash(text) for text in texts],
+            min_hash=min_hash("\n".join(texts)),
+        )
+
+    def deduplicate(self, file_bytes: bytes, document_hash: Optional[str] = None) -> DedupResult:
+        """
+        Classify a document and reuse the checkpoints of identical pages of an earlier upload.
+
+        Args:
+            file_bytes (bytes): Content of the PDF file
+            document_hash (str, optional): Hash of the document, computed if not given
+
+        Returns:
+            DedupResult: Kind of duplicate and the pages that still need extraction
+        """
+        document_hash = document_hash or Utilities.get_hash(file_bytes)
+        fingerprint = self.fingerprint_index.get(document_hash)
+        if fingerprint is None:
+            fingerprint = self.fingerprint(file_bytes, document_hash)
+            self.fingerprint_index.add(fingerprint)
+
+        page_count = len(fingerprint.page_hashes)
+        done_pages = self.checkpoint_store.done_pages(document_hash)
+        if page_count and len(done_pages) == page_count:
+            result = DedupResult(
+                DedupResult.EXACT, document_hash, document_hash, 1.0, {page: page for page in range(page_count)}
+            )
+            # Document Intelligence and GPT for every page
+            self.stats.record(result, 2 * page_count)
+            self.logger.info(f"Document {document_hash} is an exact duplicate, extraction skipped")
+            return result
+
+        result = self.__find_near_duplicate(fingerprint, done_pages)
+        api_calls_avoided = self.__copy_checkpoints(result)
+        self.stats.record(result, api_calls_avoided)
+        if result.kind == DedupResult.NEAR:
+            self.logger.info(
+                f"Document {document_hash} is a near duplicate of {result.source_hash}: "
+                f"{len(result.reused_pages)} pages reused, {len(result.changed_pages)} to extract"
+            )
+        return result
+
+    def __find_near_duplicate(self, fingerprint: DocumentFingerprint, done_pages: Iterable[int]) -> DedupResult:
+        pending = [page for page in range(len(fingerprint.page_hashes)) if page not in done_pages]
+        best = DedupResult(DedupResult.NEW, fingerprint.document_hash, changed_pages=pending)
+        best_score = None
+        for candidate_hash in self.fingerprint_index.candidates(fingerprint):
+            candidate = self.fingerprint_index.get(candidate_hash)
+            candidate_done = self.checkpoint_store.done_pages(candidate_hash)
+            if candidate is None or not candidate_done:
+                continue
+
+            similarity = None
+            if fingerprint.min_hash is not None and candidate.min_hash is not None:
+                similarity = float(np.mean(fingerprint.min_hash == candidate.min_hash))
+                if similarity < self.similarity_threshold:
+                    continue
+
+            reused = self.__match_pages(fingerprint, candidate, pending, candidate_done)
+            # Scanned documents have no text to compare, only identical pages make them near duplicates
+            if similarity is None and not reused:
+                continue
+            score = (len(reused), similarity or 0.0)
+            if best_score is None or score > best_score:
+                best_score = score
+                best = DedupResult(
+                    DedupResult.NEAR,
+                    fingerprint.document_hash,
+                    candidate_hash,
+                    similarity,
+                    reused,
+                    [page for page in pending if page not in reused],
+                )
+        return best
+
+    def __match_pages(
+        self,
+        fingerprint: DocumentFingerprint,
+        candidate: DocumentFingerprint,
+        pages: List[int],
+        candidate_done: Iterable[int],
+    ) -> Dict[int, int]:
+        matches = {}
+        candidate_done = set(candidate_done)
+        for page in pages:
+            # Pages usually keep their position, try it first
+            order = [page] if page < len(candidate.page_hashes) else []
+            order += [other for other in range(len(candidate.page_hashes)) if other != page]
+            for other in order:
+                if other in candidate_done and self.__same_page(fingerprint, page, candidate, other):
+                    matches[page] = other
+                    break
+        return matches
+
+    def __same_page(self, first: DocumentFingerprint, page: int, second: DocumentFingerprint, other: int) -> bool:
+        first_text, second_text = first.text_hashes[page], second.text_hashes[other]
+        if first_text != second_text:
+            return False
+        distance = hamming_distance(first.page_hashes[page], second.page_hashes[other])
+        # Without text layer a tiny edit may only flip a few bits, require an exact match
+        return distance == 0 if first_text is None else distance <= self.page_distance
+
+    def __copy_checkpoints(self, result: DedupResult) -> int:
+        api_calls_avoided = 0
+        for page, source_page in result.reused_pages.items():
+            checkpoints = self.checkpoint_store.get_page(result.source_hash, source_page)
+            for stage in PageStage.ALL:
+                checkpoint = checkpoints.get(stage)
+                if checkpoint is None:
+                    continue
+                self.checkpoint_store.save_stage(
+                    result.document_hash, page, stage, checkpoint.payload, checkpoint.duration_seconds
+                )
+                api_calls_avoided += stage in (PageStage.DI, PageStage.GPT)
+        return api_calls_avoided
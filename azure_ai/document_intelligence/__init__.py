@@ -0,0 +1,11 @@
+from utils.lazy_import import lazy_attributes
+
+# Resolved on first access so importing the package does not load the Document Intelligence SDK
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "AzureDocumentIntelligenceHandler": "azure_ai.document_intelligence.document_intelligence",
+        "Region": "azure_ai.document_intelligence.layout",
+        "page_regions": "azure_ai.document_intelligence.layout",
+    },
+)
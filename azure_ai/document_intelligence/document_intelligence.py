@@ -0,0 +1,115 @@
+from typing import Any, Optional, Tuple
+from azure.ai.documentintelligence import DocumentIntelligenceClient
+from azure.ai.documentintelligence.models import AnalyzeDocumentRequest, ClassifyDocumentRequest
+from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import AzureError, HttpResponseError
+from settings.settings import azure_settings
+from settings.custom_logger import Logger
+from settings.telemetry import span
+
+
+class AzureDocumentIntelligenceHandler:
+    def __init__(self):
+        self.logger = Logger(self.__class__.__name__)
+        self.__client = DocumentIntelligenceClient(
+            endpoint=azure_settings.di_settings.document_intelligence_domain_url,
+            credential=AzureKeyCredential(azure_settings.di_settings.document_intelligence_api_key),
+        )
+
+    def analyze_document(
+        self,
+        document_bytes: Optional[bytes] = None,
+        document_url: Optional[str] = None,
+        model_id: Optional[str] = None,
+        output_content_format: str = "markdown",
+    ) -> Any | None:
+        """
+        Run Document Intelligence analysis on a document given either as bytes or as URL.
+
+        Args:
+            document_bytes (bytes, optional): Content of the document. Defaults to None.
+            document_url (str, optional): URL (with SAS if needed) of the document. Defaults to None.
+            model_id (str, optional): Model used to analyze the document. Defaults to
+                ``analyze_model`` from the settings.
+            output_content_format (str, optional): Format of ``content`` in the result. Defaults to "markdown".
+
+        Returns:
+            AnalyzeResult | None: The analysis result, or None if the analysis fails.
+        """
+        if document_url is not None:
+            request = AnalyzeDocumentRequest(url_source=document_url)
+        elif document_bytes is not None:
+            request = AnalyzeDocumentRequest(bytes_source=document_bytes)
+        else:
+            raise ValueError("Either document_bytes or document_url must be provided")
+
+        model_id = model_id or azure_settings.di_settings.analyze_model
+        with span("document_intelligence.analyze", {"cv.di_model": model_id}) as recorder:
+            if document_bytes is not None:
+                recorder.set("cv.document_bytes", len(document_bytes))
+            try:
+                poller = self.__client.begin_analyze_document(
+                    model_id,
+                    analyze_request=request,
+                    output_content_format=output_content_format,
+                    raw_response_hook=recorder.count_retries,
+                )
+                result = poller.result()
+                recorder.set("cv.pages", len(getattr(result, "pages", None) or ()))
+                return result
+            except HttpResponseError as e:
+                self.logger.error_limited(f"http-{e.status_code}", f"Document Intelligence request failed with status {e.status_code}: {e.message}")
+                recorder.fail(str(e))
+            except AzureError as e:
+                self.logger.error_limited("azure", f"Azure error occurred: {str(e)}")
+                recorder.fail(str(e))
+            return None
+
+    def classify_document(
+        self,
+        document_bytes: Optional[bytes] = None,
+        document_url: Optional[str] = None,
+        classifier_id: Optional[str] = None,
+    ) -> Tuple[str, float] | None:
+        """
+        Run a Document Intelligence classifier on a document given either as bytes or as URL.
+
+        Args:
+            document_bytes (bytes, optional): Content of the document. Defaults to None.
+            document_url (str, optional): URL (with SAS if needed) of the document. Defaults to None.
+            classifier_id (str, optional): Classifier to use. Defaults to
+                ``classification_model`` from the settings.
+
+        Returns:
+            Tuple[str, float] | None: Document type and confidence of the best match, or None
+                if the classification fails or finds no document.
+        """
+        if document_url is not None:
+            request = ClassifyDocumentRequest(url_source=document_url)
+        elif document_bytes is not None:
+            request = ClassifyDocumentRequest(base64_source=document_bytes)
+        else:
+            raise ValueError("Either document_bytes or document_url must be provided")
+
+        classifier_id = classifier_id or azure_settings.di_settings.classification_model
+        with span("document_intelligence.classify", {"cv.di_model": classifier_id}) as recorder:
+            try:
+                poller = self.__client.begin_classify_document(
+                    classifier_id,
+                    classify_request=request,
+                    raw_response_hook=recorder.count_retries,
+                )
+                documents = poller.result().documents or []
+            except HttpResponseError as e:
+                self.logger.error_limited(f"http-{e.status_code}", f"Document Intelligence request failed with status {e.status_code}: {e.message}")
+                recorder.fail(str(e))
+                return None
+            except AzureError as e:
+                self.logger.error_limited("azure", f"Azure error occurred: {str(e)}")
+                recorder.fail(str(e))
+                return None
+            if not documents:
+                return None
+            best = max(documents, key=lambda document: document.confidence or 0.0)
+            recorder.set("cv.doc_type", best.doc_type)
+            return best.doc_type, best.confidence or 0.0
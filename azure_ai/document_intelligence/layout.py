@@ -0,0 +1,155 @@
+import statistics
+from dataclasses import dataclass
+from typing import Any, List, Mapping, Optional, Sequence, Tuple
+
+# Paragraph roles repeated on every page, never worth a tile
+_SKIPPED_ROLES = frozenset({"pageHeader", "pageFooter", "pageNumber"})
+
+
+@dataclass
+class Region:
+    """
+    Part of a page extracted on its own: a table with the paragraphs above it (its
+    caption, a "Tier n" heading, or the header of the form for the first table).
+
+    ``box`` is (left, top, right, bottom) as fractions of the page size, so it applies to
+    the page image at any resolution. ``line_height`` is the median height of its text
+    lines, also as a fraction of the page height, None when unknown.
+    """
+    box: Tuple[float, float, float, float]
+    text: str
+    tables: int = 1
+    line_height: Optional[float] = None
+
+    @property
+    def area(self) -> float:
+        left, top, right, bottom = self.box
+        return (right - left) * (bottom - top)
+
+
+def page_regions(result: Any, page_number: int = 1, margin: float = 0.01) -> List[Region]:
+    """
+    Cut a page into one region per table, in reading order, from the layout of a
+    Document Intelligence analysis.
+
+    Paragraphs belong to the region of the first table below them, paragraphs after the
+    last table to the last region. Page headers, footers and numbers are left out.
+
+    Args:
+        result (AnalyzeResult): Result of a prebuilt-layout analysis, SDK model or REST JSON
+        page_number (int, optional): One-based page of the result. Defaults to 1.
+        margin (float, optional): Added around every region, as a fraction of the page. Defaults to 0.01.
+
+    Returns:
+        List[Region]: The regions, empty when the page has no table
+    """
+    pages = _items(result, "pages")
+    page = next((page for page in pages if page.get("pageNumber") == page_number), None)
+    if page is None or not page.get("width") or not page.get("height"):
+        return []
+    size = (page["width"], page["height"])
+    content = _value(result, "content") or ""
+
+    tables = []
+    for table in _items(result, "tables"):
+        box = _box(table, page_number, size)
+        if box is not None:
+            tables.append((box, _spans(table)))
+    if not tables:
+        return []
+    tables.sort(key=lambda table: (table[0][1], table[0][0]))
+
+    members: List[List[Tuple[Tuple[float, float, float, float], List[Tuple[int, int]]]]] = [[table] for table in tables]
+    for paragraph in _items(result, "paragraphs"):
+        if paragraph.get("role") in _SKIPPED_ROLES:
+            continue
+        box = _box(paragraph, page_number, size)
+        spans = _spans(paragraph)
+        if box is None or any(_inside(spans, table_spans) for _, table_spans in tables):
+            # Text of a table cell, already part of its table
+            continue
+        index = next((index for index, (table_box, _) in enumerate(tables) if box[3] <= table_box[1] + margin), len(tables) - 1)
+        members[index].append((box, spans))
+
+    line_heights = _line_heights(page, size)
+    regions = []
+    for index, parts in enumerate(members):
+        box = (
+            max(0.0, min(part[0][0] for part in parts) - margin),
+            max(0.0, min(part[0][1] for part in parts) - margin),
+            min(1.0, max(part[0][2] for part in parts) + margin),
+            min(1.0, max(part[0][3] for part in parts) + margin),
+        )
+        spans = sorted(span for part in parts for span in part[1])
+        text = "\n\n".join(content[offset:offset + length] for offset, length in spans)
+        heights = [height for (top, bottom), height in line_heights if top >= box[1] and bottom <= box[3]]
+        regions.append(Region(box=box, text=text, line_height=statistics.median(heights) if heights else None))
+    return regions
+
+
+def merge_regions(regions: Sequence[Region], max_regions: int) -> List[Region]:
+    """
+    Join consecutive regions so there are at most ``max_regions`` of them.
+    """
+    if len(regions) <= max_regions:
+        return list(regions)
+    size = -(-len(regions) // max_regions)
+    merged = []
+    for start in range(0, len(regions), size):
+        group = regions[start:start + size]
+        heights = [region.line_height for region in group if region.line_height is not None]
+        merged.append(Region(
+            box=(
+                min(region.box[0] for region in group),
+                min(region.box[1] for region in group),
+                max(region.box[2] for region in group),
+                max(region.box[3] for region in group),
+            ),
+            text="\n\n".join(region.text for region in group),
+            tables=sum(region.tables for region in group),
+            line_height=min(heights) if heights else None,
+        ))
+    return merged
+
+
+def _value(item: Any, name: str) -> Any:
+    # SDK models are mappings keyed by the REST names, the benchmark client returns a namespace
+    if isinstance(item, Mapping):
+        return item.get(name)
+    return getattr(item, name, None)
+
+
+def _items(item: Any, name: str) -> List[Mapping[str, Any]]:
+    return list(_value(item, name) or [])
+
+
+def _box(item: Mapping[str, Any], page_number: int, size: Tuple[float, float]) -> Optional[Tuple[float, float, float, float]]:
+    polygons = [region.get("polygon") for region in item.get("boundingRegions") or [] if region.get("pageNumber") == page_number]
+    points = [value for polygon in polygons if polygon for value in polygon]
+    if not points:
+        return None
+    xs, ys = points[0::2], points[1::2]
+    width, height = size
+    return min(xs) / width, min(ys) / height, max(xs) / width, max(ys) / height
+
+
+def _spans(item: Mapping[str, Any]) -> List[Tuple[int, int]]:
+    return [(span["offset"], span["length"]) for span in item.get("spans") or []]
+
+
+def _inside(spans: List[Tuple[int, int]], container: List[Tuple[int, int]]) -> bool:
+    return bool(spans) and all(
+        any(start <= offset and offset + length <= start + size for start, size in container) for offset, length in spans
+    )
+
+
+def _line_heights(page: Mapping[str, Any], size: Tuple[float, float]) -> List[Tuple[Tuple[float, float], float]]:
+    lines = []
+    for line in page.get("lines") or []:
+        polygon = line.get("polygon")
+        if not polygon:
+            continue
+        ys = polygon[1::2]
+        top, bottom = min(ys) / size[1], max(ys) / size[1]
+        lines.append(((top, bottom), bottom - top))
+    return lines
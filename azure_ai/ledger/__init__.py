@@ -0,0 +1,10 @@
+from utils.lazy_import import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "UsageLedger": "azure_ai.ledger.ledger",
+        "UsageRecord": "azure_ai.ledger.ledger",
+        "UsageTotals": "azure_ai.ledger.ledger",
+    },
+)
@@ -0,0 +1,281 @@
+import argparse
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+from settings.settings import azure_settings
+from settings.custom_logger import Logger
+from azure_ai.azure_openai.usage import TokenUsage
+
+# Report groupings, by name, as SQL expressions over the usage table
+GROUPINGS = {
+    "prompt_type": "prompt_type",
+    "document": "document_hash",
+    "page": "page_number",
+    "shape": "CASE WHEN image_width IS NULL THEN 'unknown' ELSE image_width || 'x' || image_height END",
+    "day": "date(created_at, 'unixepoch')",
+}
+
+
+@dataclass
+class UsageRecord:
+    document_hash: str
+    page_number: int
+    prompt_type: Optional[str]
+    usage: TokenUsage
+    latency_seconds: float
+    image_tokens: int = 0
+    image_width: Optional[int] = None
+    image_height: Optional[int] = None
+    context_chars: int = 0
+    created_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class UsageTotals:
+    requests: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+    image_tokens: int = 0
+    latency_seconds: float = 0.0
+
+    def add(self, record: UsageRecord) -> None:
+        self.requests += 1
+        self.prompt_tokens += record.usage.prompt_tokens
+        self.cached_tokens += record.usage.cached_tokens
+        self.completion_tokens += record.usage.completion_tokens
+        self.image_tokens += record.image_tokens
+        self.latency_seconds += record.latency_seconds
+
+
+class UsageLedger:
+    """
+    Token usage of every GPT request, attributed to its document, page and prompt type.
+
+    Records are added to in-memory totals per prompt type right away, and buffered
+    for SQLite: the buffer is written in one transaction once it holds
+    ``ledger_flush_size`` records or, from a timer thread, once its oldest record is
+    ``ledger_flush_interval`` seconds old, and on exit. ``report`` aggregates the stored records with their
+    cost; run this module to print it.
+    """
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        flush_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+    ):
+        self.logger = Logger(self.__class__.__name__)
+        settings = azure_settings.ledger
+        db_path = db_path or settings.ledger_sqlite_path
+        self.flush_size = flush_size or settings.ledger_flush_size
+        self.flush_interval = flush_interval if flush_interval is not None else settings.ledger_flush_interval
+        self.prices = {
+            "prompt": settings.ledger_prompt_price,
+            "cached": settings.ledger_cached_price,
+            "completion": settings.ledger_completion_price,
+        }
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        self.__lock = threading.Lock()
+        self.__buffer: List[tuple] = []
+        self.__buffered_since = 0.0
+        self.__timer: Optional[threading.Timer] = None
+        self.__closed = False
+        self.__totals: Dict[Optional[str], UsageTotals] = {}
+        self.__connection = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        if db_path != ":memory:":
+            self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS gpt_usage (
+                document_hash TEXT NOT NULL,
+                page_number INTEGER NOT NULL,
+                prompt_type TEXT,
+                prompt_tokens INTEGER NOT NULL,
+                cached_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                image_tokens INTEGER NOT NULL,
+                image_width INTEGER,
+                image_height INTEGER,
+                context_chars INTEGER NOT NULL,
+                latency_seconds REAL NOT NULL,
+                created_at REAL NOT NULL
+            );
+            """
+        )
+        atexit.register(self.flush)
+
+    def record(self, record: UsageRecord) -> None:
+        row = (
+            record.document_hash,
+            record.page_number,
+            record.prompt_type,
+            record.usage.prompt_tokens,
+            record.usage.cached_tokens,
+            record.usage.completion_tokens,
+            record.image_tokens,
+            record.image_width,
+            record.image_height,
+            record.context_chars,
+            record.latency_seconds,
+            record.created_at,
+        )
+        with self.__lock:
+            totals = self.__totals.get(record.prompt_type)
+            if totals is None:
+                totals = self.__totals[record.prompt_type] = UsageTotals()
+            totals.add(record)
+            if not self.__buffer:
+                self.__buffered_since = time.monotonic()
+                self.__schedule_flush()
+            self.__buffer.append(row)
+            due = len(self.__buffer) >= self.flush_size or time.monotonic() - self.__buffered_since >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write the buffered records in one transaction.
+
+        Returns:
+            int: Number of records written
+        """
+        with self.__lock:
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+            rows, self.__buffer = self.__buffer, []
+            if not rows:
+                return 0
+            try:
+                self.__connection.execute("BEGIN")
+                self.__connection.executemany(f"INSERT INTO gpt_usage VALUES ({','.join('?' * 12)})", rows)
+                self.__connection.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self.__connection.in_transaction:
+                    self.__connection.execute("ROLLBACK")
+                # Keep the records for the next flush
+                self.__buffer = rows + self.__buffer
+                self.__schedule_flush()
+                self.logger.error(f"Failed to write {len(rows)} usage records: {e}")
+                return 0
+        return len(rows)
+
+    def __schedule_flush(self) -> None:
+        # Called with the lock held. Without it, the tail of a burst would stay buffered
+        # until the next request of a long-running process, or be lost on a hard kill.
+        if self.__timer is None and not self.__closed:
+            self.__timer = threading.Timer(self.flush_interval, self.flush)
+            self.__timer.daemon = True
+            self.__timer.start()
+
+    def totals(self) -> Dict[Optional[str], UsageTotals]:
+        """Totals per prompt type of the records added since this ledger was created."""
+        with self.__lock:
+            return {prompt_type: UsageTotals(**vars(totals)) for prompt_type, totals in self.__totals.items()}
+
+    def cost(self, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> float:
+        return (
+            (prompt_tokens - cached_tokens) * self.prices["prompt"]
+            + cached_tokens * self.prices["cached"]
+            + completion_tokens * self.prices["completion"]
+        ) / 1_000_000
+
+    def report(self, group_by: Sequence[str] = ("prompt_type",), since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Aggregate the stored usage, most expensive group first.
+
+        Args:
+            group_by (Sequence[str], optional): Names from ``GROUPINGS``. Defaults to ("prompt_type",).
+            since (float, optional): Only records created after this timestamp. Defaults to None.
+
+        Returns:
+            List[Dict[str, Any]]: One row per group with requests, token sums, cost and latency
+        """
+        unknown = [name for name in group_by if name not in GROUPINGS]
+        if unknown:
+            raise ValueError(f"Unknown grouping {unknown}, choose from {list(GROUPINGS)}")
+        self.flush()
+
+        columns = [f"{GROUPINGS[name]} AS {name}" for name in group_by]
+        query = (
+            f"SELECT {', '.join(columns + [''])}"
+            "COUNT(*), SUM(prompt_tokens), SUM(cached_tokens), SUM(completion_tokens), SUM(image_tokens), "
+            "AVG(latency_seconds), MAX(latency_seconds) FROM gpt_usage WHERE created_at >= ?"
+        )
+        if group_by:
+            query += f" GROUP BY {', '.join(group_by)}"
+        with self.__lock:
+            rows = self.__connection.execute(query, (since or 0,)).fetchall()
+
+        report = []
+        for row in rows:
+            keys, values = row[:len(group_by)], row[len(group_by):]
+            requests, prompt_tokens, cached_tokens, completion_tokens, image_tokens, average, slowest = values
+            if not requests:
+                continue
+            report.append({
+                **dict(zip(group_by, keys)),
+                "requests": requests,
+                "prompt_tokens": prompt_tokens,
+                "cached_tokens": cached_tokens,
+                "completion_tokens": completion_tokens,
+                "image_tokens": image_tokens,
+                "cost": self.cost(prompt_tokens, cached_tokens, completion_tokens),
+                "avg_latency_seconds": average,
+                "max_latency_seconds": slowest,
+            })
+        report.sort(key=lambda item: item["cost"], reverse=True)
+        return report
+
+    def close(self) -> None:
+        self.flush()
+        atexit.unregister(self.flush)
+        with self.__lock:
+            self.__closed = True
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+            self.__connection.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Token usage and cost of the GPT requests")
+    parser.add_argument("--db", default=None, help="Ledger database. Defaults to ledger_sqlite_path")
+    parser.add_argument(
+        "--group-by", nargs="+", default=["prompt_type"], choices=list(GROUPINGS), help="Columns to group by"
+    )
+    parser.add_argument("--days", type=float, default=None, help="Only the last N days")
+    parser.add_argument("--top", type=int, default=20, help="Number of groups to print")
+    args = parser.parse_args()
+
+    ledger = UsageLedger(args.db)
+    since = time.time() - args.days * 86400 if args.days else None
+    rows = ledger.report(args.group_by, since)
+    ledger.close()
+
+    headers = args.group_by + ["requests", "prompt", "cached", "completion", "image", "cost $", "avg s", "max s"]
+    print("".join(f"{header:>16}" for header in headers))
+    for row in rows[:args.top]:
+        values = [str(row[name])[:15] for name in args.group_by] + [
+            f"{row['requests']:,}",
+            f"{row['prompt_tokens']:,}",
+            f"{row['cached_tokens']:,}",
+            f"{row['completion_tokens']:,}",
+            f"{row['image_tokens']:,}",
+            f"{row['cost']:.4f}",
+            f"{row['avg_latency_seconds']:.2f}",
+            f"{row['max_latency_seconds']:.2f}",
+        ]
+        print("".join(f"{value:>16}" for value in values))
+    total = sum(row["cost"] for row in rows)
+    print(f"{len(rows)} group(s), total cost ${total:.4f}")
+
+
+if __name__ == "__main__":
+    main()
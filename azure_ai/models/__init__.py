@@ -0,0 +1,15 @@
+from utils.lazy_import import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "Entity": "azure_ai.models.extraction",
+        "MainInformation": "azure_ai.models.extraction",
+        "EntityTier": "azure_ai.models.extraction",
+        "TierInformation": "azure_ai.models.extraction",
+        "TierClassification": "azure_ai.models.extraction",
+        "ResponseParser": "azure_ai.models.response_parser",
+        "CompactExtraction": "azure_ai.models.compact",
+        "EntityColumns": "azure_ai.models.compact",
+    },
+)
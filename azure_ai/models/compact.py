@@ -0,0 +1,151 @@
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from azure_ai.models.extraction import Entity, MainInformation
+
+# Fields with few distinct values, interned so every entity shares one string object per value
+INTERNED_FIELDS = frozenset({"EntityType", "Chapter4Status", "Country", "State", "FormType"})
+
+ENTITY_FIELDS = tuple(Entity.model_fields)
+MAIN_FIELDS = tuple(name for name in MainInformation.model_fields if name != "EntityList")
+
+
+def _compact(name: str, value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    # Same coercion as the models, GPT sometimes answers numbers for string fields
+    value = value if isinstance(value, str) else str(value)
+    return sys.intern(value) if name in INTERNED_FIELDS else value
+
+
+class EntityColumns:
+    """
+    Entity list stored column by column: one list per field that is set on at least one
+    entity. Fields that are None everywhere take no space, and values of
+    ``INTERNED_FIELDS`` are shared between entities.
+
+    Rows come out as plain dicts like ``Entity.model_dump()``, ``to_models`` builds the
+    pydantic objects on demand.
+    """
+    __slots__ = ("__length", "__columns")
+
+    def __init__(self, rows: Iterable[Mapping[str, Any] | Entity] = ()):
+        self.__length = 0
+        self.__columns: Dict[str, List[Optional[str]]] = {}
+        for row in rows:
+            self.append(row)
+
+    def __len__(self) -> int:
+        return self.__length
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self.row(index) for index in range(self.__length))
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        return self.row(index)
+
+    def append(self, row: Mapping[str, Any] | Entity) -> None:
+        if isinstance(row, Entity):
+            row = {name: getattr(row, name) for name in ENTITY_FIELDS}
+        for name, column in self.__columns.items():
+            column.append(_compact(name, row.get(name)))
+        for name in ENTITY_FIELDS:
+            if name not in self.__columns and row.get(name) is not None:
+                self.__columns[name] = [None] * self.__length + [_compact(name, row[name])]
+        self.__length += 1
+
+    def extend(self, other: "EntityColumns") -> None:
+        """Append the rows of ``other`` column by column, without building them."""
+        for name in set(self.__columns) | set(other.__columns):
+            column = self.__columns.setdefault(name, [None] * self.__length)
+            column.extend(other.__columns.get(name) or [None] * len(other))
+        self.__length += len(other)
+
+    def row(self, index: int) -> Dict[str, Any]:
+        if not -self.__length <= index < self.__length:
+            raise IndexError("entity index out of range")
+        return {name: self.__columns[name][index] if name in self.__columns else None for name in ENTITY_FIELDS}
+
+    def column(self, name: str) -> List[Optional[str]]:
+        """Values of one field for every entity."""
+        return list(self.__columns.get(name) or [None] * self.__length)
+
+    def to_models(self) -> List[Entity]:
+        return [Entity.model_construct(**row) for row in self]
+
+    def __repr__(self) -> str:
+        return f"EntityColumns({self.__length} entities, columns={list(self.__columns)})"
+
+
+class CompactExtraction(Mapping):
+    """
+    Parsed extraction of a page (a ``MainInformation``) kept in memory with as few
+    objects as possible: the main fields in a tuple, the entities in ``EntityColumns``.
+
+    It reads like the ``MainInformation.model_dump()`` dict it replaces, ``["EntityList"]``
+    builds the entity dicts on access. ``to_model`` gives the pydantic object and
+    ``to_dict`` the plain dict, e.g. for JSON.
+    """
+    __slots__ = ("__values", "__entities")
+
+    def __init__(self, values: Iterable[Optional[str]], entities: Optional[EntityColumns] = None):
+        self.__values = tuple(values)
+        # None when the answer has no entity list, an empty list is kept as such
+        self.__entities = entities
+
+    @classmethod
+    def from_dict(cls, extraction: Mapping[str, Any]) -> "CompactExtraction":
+        entities = extraction.get("EntityList")
+        return cls(
+            (_compact(name, extraction.get(name)) for name in MAIN_FIELDS),
+            EntityColumns(entities) if entities is not None else None,
+        )
+
+    @classmethod
+    def from_model(cls, extraction: MainInformation) -> "CompactExtraction":
+        return cls(
+            (_compact(name, getattr(extraction, name)) for name in MAIN_FIELDS),
+            EntityColumns(extraction.EntityList) if extraction.EntityList is not None else None,
+        )
+
+    @classmethod
+    def merge(cls, extractions: Iterable["CompactExtraction"]) -> "CompactExtraction":
+        """
+        Combine the page extractions of a document: the first value found for every field,
+        and the entities of every page.
+        """
+        values: List[Optional[str]] = [None] * len(MAIN_FIELDS)
+        entities = EntityColumns()
+        for extraction in extractions:
+            values = [value if value is not None else other for value, other in zip(values, extraction.__values)]
+            if extraction.__entities is not None:
+                entities.extend(extraction.__entities)
+        return cls(values, entities)
+
+    @property
+    def entities(self) -> EntityColumns:
+        return self.__entities if self.__entities is not None else EntityColumns()
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "EntityList":
+            return list(self.__entities) if self.__entities is not None else None
+        try:
+            return self.__values[MAIN_FIELDS.index(key)]
+        except ValueError:
+            raise KeyError(key) from None
+
+    def __iter__(self) -> Iterator[str]:
+        yield from MAIN_FIELDS
+        yield "EntityList"
+
+    def __len__(self) -> int:
+        return len(MAIN_FIELDS) + 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self)
+
+    def to_model(self) -> MainInformation:
+        return MainInformation.model_validate(self.to_dict())
+
+    def __repr__(self) -> str:
+        return f"CompactExtraction(Name={self['Name']!r}, entities={len(self.entities)})"
@@ -0,0 +1,65 @@
+from typing import List, Optional
+from pydantic import BaseModel, ConfigDict
+
+# Field names follow the Pydantic objects described to GPT in PromptTemplate,
+# so a response can be validated against them directly
+
+
+class ExtractionModel(BaseModel):
+    # GPT sometimes answers numbers (e.g. 100.00 for AllocationPercentage) for string fields
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+
+class Entity(ExtractionModel):
+    AccountNumber: Optional[str] = None
+    Name: Optional[str] = None
+    ParentName: Optional[str] = None
+    AddressLine1: Optional[str] = None
+    AddressLine2: Optional[str] = None
+    AddressLine3: Optional[str] = None
+    City_Town: Optional[str] = None
+    State: Optional[str] = None
+    Country: Optional[str] = None
+    ZipCode: Optional[str] = None
+    FormType: Optional[str] = None
+    EIN: Optional[str] = None
+    GIIN: Optional[str] = None
+    EntityType: Optional[str] = None
+    Chapter4Status: Optional[str] = None
+    ForeignTaxpayerId: Optional[str] = None
+    AllocationPercentage: Optional[str] = None
+    TierOwnershipPercentage: Optional[str] = None
+
+
+class MainInformation(ExtractionModel):
+    Date: Optional[str] = None
+    Name: Optional[str] = None
+    AddressLine1: Optional[str] = None
+    AddressLine2: Optional[str] = None
+    AddressLine3: Optional[str] = None
+    City_Town: Optional[str] = None
+    State: Optional[str] = None
+    Country: Optional[str] = None
+    ZipCode: Optional[str] = None
+    FormType: Optional[str] = None
+    EIN: Optional[str] = None
+    EntityType: Optional[str] = None
+    Chapter4Status: Optional[str] = None
+    GIIN: Optional[str] = None
+    Number: Optional[str] = None
+    EntityList: Optional[List[Entity]] = None
+
+
+class EntityTier(ExtractionModel):
+    Name: Optional[str] = None
+    Tier: Optional[int] = None
+
+
+class TierInformation(ExtractionModel):
+    Name: Optional[str] = None
+    EntityList: Optional[List[EntityTier]] = None
+
+
+class TierClassification(ExtractionModel):
+    EntityClass: Optional[str] = None
+    Method: Optional[str] = None
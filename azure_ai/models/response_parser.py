@@ -0,0 +1,90 @@
+import ast
+import json
+from typing import Any, Dict, Optional, Type
+from pydantic import BaseModel, ValidationError
+from settings.custom_logger import Logger
+from azure_ai.models.extraction import (
+    Entity,
+    EntityTier,
+    MainInformation,
+    TierClassification,
+    TierInformation,
+)
+
+
+class ResponseParser:
+    """
+    Turn a GPT answer written as Pydantic constructor calls, e.g.
+    ``MainInformation(Name="...", EntityList=[Entity(...), ...])``, into model objects.
+
+    The answer is parsed with ``ast`` and only literals and calls of the known models
+    are evaluated, so unlike ``eval`` a malicious or broken answer cannot run code.
+    """
+    MODELS: Dict[str, Type[BaseModel]] = {
+        "Entity": Entity,
+        "MainInformation": MainInformation,
+        "EntityTier": EntityTier,
+        "TierInformation": TierInformation,
+        "TierClassification": TierClassification,
+    }
+
+    def __init__(self):
+        self.logger = Logger(self.__class__.__name__)
+
+    def parse(self, response: str, default_model: Type[BaseModel] = MainInformation) -> Optional[BaseModel]:
+        """
+        Parse a GPT response into a model object.
+
+        Args:
+            response (str): Raw text of the answer, optionally wrapped in a markdown code block
+            default_model (Type[BaseModel], optional): Model used when the answer is plain JSON.
+                Defaults to MainInformation.
+
+        Returns:
+            BaseModel | None: The parsed object, or None if the answer cannot be parsed
+        """
+        text = self.clean(response)
+        if text.startswith("{"):
+            try:
+                return default_model.model_validate(json.loads(text))
+            except (json.JSONDecodeError, ValidationError) as e:
+                self.logger.warning(f"Could not parse JSON response: {e}")
+                return None
+
+        try:
+            module = ast.parse(text, mode="exec")
+        except SyntaxError as e:
+            self.logger.warning(f"Could not parse response: {e}")
+            return None
+
+        # The answer may be a bare expression or an assignment, the last model call wins
+        for statement in reversed(module.body):
+            node = getattr(statement, "value", None)
+            if isinstance(node, ast.Call):
+                try:
+                    return self.__evaluate(node)
+                except (ValueError, TypeError, ValidationError) as e:
+                    self.logger.warning(f"Could not build model from response: {e}")
+                    return None
+        self.logger.warning("Response does not contain any model")
+        return None
+
+    @staticmethod
+    def clean(response: str) -> str:
+        return response.replace("```python", "").replace("```json", "").replace("```", "").strip()
+
+    def __evaluate(self, node: ast.AST) -> Any:
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, (ast.List, ast.Tuple)):
+            return [self.__evaluate(element) for element in node.elts]
+        if isinstance(node, ast.Dict):
+            return {self.__evaluate(key): self.__evaluate(value) for key, value in zip(node.keys, node.values)}
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return -self.__evaluate(node.operand)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in self.MODELS:
+            if node.args:
+                raise ValueError(f"{node.func.id} only accepts keyword arguments")
+            kwargs = {keyword.arg: self.__evaluate(keyword.value) for keyword in node.keywords if keyword.arg}
+            return self.MODELS[node.func.id](**kwargs)
+        raise ValueError(f"Unsupported expression {ast.dump(node)[:80]}")
@@ -0,0 +1,9 @@
+from utils.lazy_import import lazy_attributes
+
+# Resolved on first access so importing the package does not load PyMuPDF
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "PDFProcessor": "azure_ai.pdf_processor.pdf_processor",
+    },
+)
@@ -0,0 +1,147 @@
+import math
+import os
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Tuple
+from settings.settings import azure_settings
+from settings.custom_logger import Logger
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class PDFProcessor:
+    """
+    Split a PDF file into one PNG image per page.
+    """
+    def __init__(self, dpi: Optional[int] = None):
+        self.logger = Logger(self.__class__.__name__)
+        self.dpi = dpi or azure_settings.pdf_processor.pdf_processor_dpi or 200
+
+    @staticmethod
+    def get_thread_count() -> int:
+        """
+        Number of threads to use for PDF processing, resolving -1 to the number of CPUs.
+
+        Returns:
+            int: Number of threads, at least 1
+        """
+        thread_count = azure_settings.pdf_processor.pdf_processor_thread_count
+        if thread_count is None or thread_count < 1:
+            return os.cpu_count() or 1
+        return thread_count
+
+    def count_pages(self, file_bytes: bytes) -> int:
+        """
+        Count the pages of a PDF file without rendering them.
+
+        Args:
+            file_bytes (bytes): Content of the PDF file
+
+        Returns:
+            int: Number of pages
+        """
+        import fitz
+
+        with fitz.open(stream=file_bytes, filetype="pdf") as document:
+            return document.page_count
+
+    def render_page(self, file_bytes: bytes, page_number: int) -> bytes:
+        """
+        Render a single page of a PDF file as PNG.
+
+        Args:
+            file_bytes (bytes): Content of the PDF file
+            page_number (int): Zero-based index of the page
+
+        Returns:
+            bytes: PNG encoded image of the page
+        """
+        import fitz
+
+        with fitz.open(stream=file_bytes, filetype="pdf") as document:
+            return document[page_number].get_pixmap(dpi=self.dpi).tobytes("png")
+
+    def split_pdf(self, file_bytes: bytes, page_numbers: Optional[Iterable[int]] = None) -> Iterator[bytes]:
+        """
+        Lazily render the pages of a PDF file as PNG.
+
+        Pages are rendered one at a time, so a consumer that processes each image
+        before asking for the next one only holds one page in memory.
+
+        Args:
+            file_bytes (bytes): Content of the PDF file
+            page_numbers (Iterable[int], optional): Zero-based pages to render, in the
+                order they should be yielded. Defaults to every page.
+
+        Yields:
+            bytes: PNG encoded image of each requested page
+        """
+        import fitz
+
+        with fitz.open(stream=file_bytes, filetype="pdf") as document:
+            if page_numbers is None:
+                page_numbers = range(document.page_count)
+            self.logger.debug(f"Splitting PDF with {document.page_count} pages at {self.dpi} DPI")
+            for page_number in page_numbers:
+                yield document[page_number].get_pixmap(dpi=self.dpi).tobytes("png")
+
+    def extract_text(self, file_bytes: bytes) -> List[str]:
+        """
+        Text layer of every page, empty for scanned pages. Much cheaper than rendering.
+
+        Args:
+            file_bytes (bytes): Content of the PDF file
+
+        Returns:
+            List[str]: Text of each page
+        """
+        import fitz
+
+        with fitz.open(stream=file_bytes, filetype="pdf") as document:
+            return [page.get_text() for page in document]
+
+    def thumbnails(self, file_bytes: bytes, width: int = 64) -> List["np.ndarray"]:
+        """
+        Render every page as a small grayscale image, e.g. for perceptual hashing.
+
+        Args:
+            file_bytes (bytes): Content of the PDF file
+            width (int, optional): Width of the thumbnails in pixels. Defaults to 64.
+
+        Returns:
+            List[np.ndarray]: 2D uint8 array per page
+        """
+        import fitz
+        import numpy as np
+
+        thumbnails = []
+        with fitz.open(stream=file_bytes, filetype="pdf") as document:
+            for page in document:
+                zoom = width / max(page.rect.width, 1)
+                pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+                image = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.stride)
+                thumbnails.append(image[:, :pixmap.width].copy())
+        return thumbnails
+
+    def crop_image(self, image_bytes: bytes, box: Tuple[float, float, float, float], scale: float = 1.0) -> bytes:
+        """
+        Cut a region out of a page image, optionally scaled down.
+
+        Args:
+            image_bytes (bytes): PNG encoded page image
+            box (Tuple[float, float, float, float]): Left, top, right and bottom of the region,
+                as fractions of the image size
+            scale (float, optional): Factor applied to the image before cropping. Defaults to 1.0.
+
+        Returns:
+            bytes: PNG encoded image of the region
+        """
+        import fitz
+
+        image = fitz.Pixmap(image_bytes)
+        width, height = max(1, round(image.width * scale)), max(1, round(image.height * scale))
+        left, top, right, bottom = box
+        # The clip of a scaled copy is in the coordinates of the scaled image
+        clip = fitz.IRect(
+            math.floor(left * width), math.floor(top * height), math.ceil(right * width), math.ceil(bottom * height)
+        )
+        return fitz.Pixmap(image, width, height, clip).tobytes("png")
@@ -0,0 +1,11 @@
+from utils.lazy_import import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "Pipeline": "azure_ai.pipeline.pipeline",
+        "PipelineStage": "azure_ai.pipeline.pipeline",
+        "IngestionPipeline": "azure_ai.pipeline.pipeline",
+        "ProcessWorkerRuntime": "azure_ai.pipeline.process_runtime",
+    },
+)
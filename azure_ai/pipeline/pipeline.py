@@ -0,0 +1,1034 @@
+import asyncio
+import inspect
+import json
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+from settings.settings import azure_settings
+from settings.custom_logger import Logger
+from settings.profiling import Profiler
+from settings.telemetry import BATCH_PAGES, DOCUMENT_HASH, PAGE, PROFILE, PROMPT_TYPE, TILES, SpanRecorder, span
+from utils.file_validator import FileValidator
+from utils.utils import Utilities
+from azure_ai.checkpoint.checkpoint import PageCheckpointStore, PageStage, ResumeStats, StageCheckpoint
+from azure_ai.models.compact import CompactExtraction
+from azure_ai.models.response_parser import ResponseParser
+from azure_ai.azure_openai.batching import plan_batches, split_batch_response
+from azure_ai.azure_openai.continuation import ContinuedResult, finish_reason, is_truncated, merge_answers
+from azure_ai.azure_openai.usage import estimate_image_tokens, estimate_text_tokens, get_token_usage, image_dimensions
+from azure_ai.cascade.cascade import DocumentRoute, TierCascade
+from azure_ai.document_intelligence.layout import Region, merge_regions, page_regions
+
+if TYPE_CHECKING:
+    from azure_ai.dedup.dedup import Deduplicator
+    from azure_ai.ledger.ledger import UsageLedger
+    from azure_ai.pipeline.process_runtime import ProcessWorkerRuntime
+
+# Marker put on a queue once per downstream worker when its upstream stage is drained
+_STOP = object()
+# Handler durations kept per stage for the latency percentiles
+_LATENCY_SAMPLES = 10000
+
+
+@dataclass
+class PipelineStage:
+    """
+    A single step of a pipeline.
+
+    ``handler`` receives one item and returns the item to forward downstream, or None
+    to drop it. Coroutine and async generator handlers run on the event loop, plain
+    functions run on a thread pool owned by the stage with ``workers`` threads. With
+    ``fan_out`` the handler returns an iterable (or is an async generator) and every
+    element is forwarded separately.
+    ``queue_size`` bounds the queue in front of the stage, which is what applies
+    backpressure to the stage before it.
+    """
+    name: str
+    handler: Callable[[Any], Any]
+    workers: int = 1
+    queue_size: int = 8
+    fan_out: bool = False
+
+
+@dataclass
+class StageStats:
+    name: str
+    workers: int
+    queue_size: int
+    processed: int = 0
+    emitted: int = 0
+    dropped: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+    max_queue_depth: int = 0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=_LATENCY_SAMPLES), repr=False)
+
+    def percentiles(self, *percents: float) -> List[float]:
+        """Handler durations in seconds below which ``percents`` % of the last items completed."""
+        samples = sorted(self.latencies)
+        if not samples:
+            return [0.0] * len(percents)
+        return [samples[min(len(samples) - 1, max(0, math.ceil(percent / 100 * len(samples)) - 1))] for percent in percents]
+
+    @property
+    def elapsed_seconds(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Items processed per second since the stage received its first item."""
+        elapsed = self.elapsed_seconds
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def utilization(self) -> float:
+        """Fraction of worker time spent inside the handler, 1.0 means the stage is the bottleneck."""
+        elapsed = self.elapsed_seconds
+        return self.busy_seconds / (elapsed * self.workers) if elapsed > 0 else 0.0
+
+
+class Pipeline:
+    """
+    Run items through a chain of stages connected by bounded asyncio queues.
+
+    Every stage has its own worker count and input queue, so a slow stage fills the
+    queue in front of it and pauses the stages upstream instead of letting them
+    buffer the whole input in memory.
+    """
+    def __init__(
+        self,
+        stages: List[PipelineStage],
+        sink: Optional[Callable[[Any], Any | Awaitable[Any]]] = None,
+    ):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.logger = Logger(self.__class__.__name__)
+        self.stages = stages
+        self.sink = sink
+        self.__queues: List[asyncio.Queue] = []
+        self.__stats = {stage.name: StageStats(stage.name, stage.workers, stage.queue_size) for stage in stages}
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Snapshot of per-stage counters, throughput and current queue depth.
+
+        Safe to call while the pipeline is running, e.g. from a monitoring task.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Stage name to its statistics
+        """
+        snapshot = {}
+        for index, stage in enumerate(self.stages):
+            stats = self.__stats[stage.name]
+            p50, p95, p99 = stats.percentiles(50, 95, 99)
+            snapshot[stage.name] = {
+                "workers": stats.workers,
+                "processed": stats.processed,
+                "emitted": stats.emitted,
+                "dropped": stats.dropped,
+                "failed": stats.failed,
+                "throughput": stats.throughput,
+                "utilization": stats.utilization,
+                "queue_depth": self.__queues[index].qsize() if self.__queues else 0,
+                "queue_size": stats.queue_size,
+                "max_queue_depth": stats.max_queue_depth,
+                "p50_seconds": p50,
+                "p95_seconds": p95,
+                "p99_seconds": p99,
+            }
+        return snapshot
+
+    async def run_async(self, source: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Feed every item of ``source`` through the pipeline and wait until all stages are drained.
+
+        Args:
+            source (Iterable[Any]): Input items. It is consumed lazily, only as fast as
+                the first stage accepts items.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Final per-stage statistics, see ``stats``
+        """
+        self.__queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        executors = [
+            ThreadPoolExecutor(max_workers=stage.workers, thread_name_prefix=stage.name)
+            if not self.__runs_on_loop(stage) else None
+            for stage in self.stages
+        ]
+        try:
+            await asyncio.gather(
+                self.__feed(source),
+                *[self.__run_stage(index, executors[index]) for index in range(len(self.stages))],
+            )
+        finally:
+            for executor in executors:
+                if executor is not None:
+                    executor.shutdown(wait=False)
+        return self.stats()
+
+    def run(self, source: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Blocking wrapper around ``run_async``.
+        """
+        return asyncio.run(self.run_async(source))
+
+    @staticmethod
+    def __runs_on_loop(stage: PipelineStage) -> bool:
+        return inspect.iscoroutinefunction(stage.handler) or inspect.isasyncgenfunction(stage.handler)
+
+    async def __feed(self, source: Iterable[Any]):
+        for item in source:
+            await self.__put(0, item)
+        for _ in range(self.stages[0].workers):
+            await self.__queues[0].put(_STOP)
+
+    async def __put(self, index: int, item: Any):
+        queue = self.__queues[index]
+        await queue.put(item)
+        stats = self.__stats[self.stages[index].name]
+        stats.max_queue_depth = max(stats.max_queue_depth, queue.qsize())
+
+    async def __run_stage(self, index: int, executor: Optional[ThreadPoolExecutor]):
+        stage = self.stages[index]
+        await asyncio.gather(*[self.__worker(index, executor) for _ in range(stage.workers)])
+        self.__stats[stage.name].finished_at = time.perf_counter()
+
+        if index + 1 < len(self.stages):
+            for _ in range(self.stages[index + 1].workers):
+                await self.__queues[index + 1].put(_STOP)
+        self.logger.debug(f"Stage {stage.name} finished")
+
+    async def __worker(self, index: int, executor: Optional[ThreadPoolExecutor]):
+        stage = self.stages[index]
+        stats = self.__stats[stage.name]
+        loop = asyncio.get_running_loop()
+
+        while True:
+            item = await self.__queues[index].get()
+            if item is _STOP:
+                return
+            if stats.started_at is None:
+                stats.started_at = time.perf_counter()
+
+            try:
+                started = time.perf_counter()
+                if inspect.isasyncgenfunction(stage.handler):
+                    result = stage.handler(item)
+                elif executor is None:
+                    result = await stage.handler(item)
+                else:
+                    result = await loop.run_in_executor(executor, stage.handler, item)
+                elapsed = time.perf_counter() - started
+                stats.busy_seconds += elapsed
+                stats.latencies.append(elapsed)
+
+                if result is None:
+                    stats.dropped += 1
+                elif stage.fan_out:
+                    await self.__emit_all(index, result, executor)
+                else:
+                    await self.__emit(index, result)
+                stats.processed += 1
+            except Exception as e:  # Catch master exception so one bad item does not stop the pipeline
+                stats.failed += 1
+                # A failing dependency fails every item, log a bounded number of them
+                self.logger.error_limited(f"stage-{stage.name}", f"Stage {stage.name} failed on {item!r}: {e}")
+
+    async def __emit_all(self, index: int, results: Iterable[Any] | AsyncIterator[Any], executor: Optional[ThreadPoolExecutor]):
+        stats = self.__stats[self.stages[index].name]
+        if hasattr(results, "__aiter__"):
+            iterator = results.__aiter__()
+            while True:
+                started = time.perf_counter()
+                try:
+                    result = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    stats.busy_seconds += time.perf_counter() - started
+                await self.__emit(index, result)
+
+        iterator = iter(results)
+        loop = asyncio.get_running_loop()
+        while True:
+            # Pull from generators on the stage's thread pool, one element at a time,
+            # so a stage producing many items never runs ahead of its downstream queue
+            started = time.perf_counter()
+            if executor is None:
+                result = next(iterator, _STOP)
+            else:
+                result = await loop.run_in_executor(executor, next, iterator, _STOP)
+            stats.busy_seconds += time.perf_counter() - started
+            if result is _STOP:
+                return
+            await self.__emit(index, result)
+
+    async def __emit(self, index: int, result: Any):
+        self.__stats[self.stages[index].name].emitted += 1
+        if index + 1 < len(self.stages):
+            await self.__put(index + 1, result)
+        elif self.sink is not None:
+            sink_result = self.sink(result)
+            if inspect.isawaitable(sink_result):
+                await sink_result
+
+
+@dataclass
+class IngestionDocument:
+    file_name: str
+    file_path: Optional[str] = None
+    file_bytes: Optional[bytes] = field(default=None, repr=False)
+    document_hash: Optional[str] = None
+    blob_url: Optional[str] = None
+    content_type: Optional[str] = None
+    # Profile the processing of this document, also set when it is sampled
+    profile: bool = False
+
+
+@dataclass
+class IngestionPage:
+    file_name: str
+    document_hash: str
+    page_number: int
+    image_bytes: Optional[bytes] = field(default=None, repr=False)
+    image_size: Optional[Tuple[int, int]] = None
+    render_seconds: float = 0.0
+    page_url: Optional[str] = field(default=None, repr=False)
+    file_context: Optional[str] = field(default=None, repr=False)
+    response: Optional[str] = field(default=None, repr=False)
+    type_prompt_body_type: Optional[str] = None
+    extraction: Optional[CompactExtraction] = field(default=None, repr=False)
+    # Key of the profile the page stages are captured into, None when not profiled
+    profile_key: Optional[str] = None
+    # Type prompt chosen by the cascade, None until the page is extracted or when it is off
+    route: Optional[DocumentRoute] = None
+    # Tables found by Document Intelligence when the page is extracted tile by tile
+    regions: Optional[List[Region]] = field(default=None, repr=False)
+    # Stages completed by an earlier run, loaded once when the page is created
+    checkpoints: Dict[str, StageCheckpoint] = field(default_factory=dict, repr=False)
+
+    @property
+    def blob_name(self) -> str:
+        return f"{self.document_hash}-{self.page_number}.png"
+
+
+@dataclass
+class PageBatch:
+    """
+    Pages of a short document, handled as one item by the page stages so the GPT stage
+    can extract them in shared requests. The sink still receives every page.
+    """
+    file_name: str
+    document_hash: str
+    pages: List[IngestionPage] = field(default_factory=list)
+
+
+class IngestionPipeline:
+    """
+    Validate -> upload -> split PDF -> upload pages -> Document Intelligence -> GPT -> parse -> sink.
+
+    Wires ``AzureBlobStorageHandler``, ``PDFProcessor``, ``AzureDocumentIntelligenceHandler``
+    and ``AzureOpenAIChatBackend`` into a ``Pipeline``. Worker counts and queue sizes
+    default to the ``pipeline`` settings.
+
+    With a ``runtime``, rasterization and parsing run in its process pool instead of
+    the stage threads.
+
+    With a ``checkpoint_store`` every page stage is checkpointed, and running the same
+    document again skips the stages that already completed. ``resume_stats`` tells how
+    much work was skipped.
+
+    With a ``deduplicator`` every uploaded document is compared against earlier uploads
+    first: pages identical to an already extracted page get its checkpoints and are
+    not analyzed or extracted again.
+
+    With a ``usage_ledger`` the token usage of every GPT request is recorded with its
+    document, page, prompt type and page image size.
+
+    Answers cut off by the output limit are completed with up to ``pipeline_max_continuations``
+    follow-up requests, see ``AzureOpenAIChatBackend.continue_description``.
+
+    With ``tiling_enabled``, pages where Document Intelligence finds at least
+    ``tiling_min_tables`` tables are cut into one tile per table (with the paragraphs
+    above it). Every tile is scaled down to ``tiling_line_height`` pixels per text line
+    and extracted with its own DI text in parallel, then the answers are merged in
+    reading order. Pages resumed after the DI stage are extracted whole.
+
+    Documents with up to ``batch_max_pages`` pages travel as one ``PageBatch``: their
+    pages are uploaded and analyzed one by one, then sent to GPT together in requests
+    of at most ``batch_token_budget`` estimated prompt tokens, so the system prompt is
+    sent once per request instead of once per page. The answer is split back per page,
+    pages missing from it are extracted on their own.
+
+    The ``profiler`` (by default one from the ``profiling`` settings, off unless
+    configured) profiles the page stages of the documents with ``profile`` set and of
+    a sample of the others. Their profiles are written at the end of the run, named
+    after the document hash that is also on their spans.
+
+    The ``cascade`` (by default one from the ``cascade`` settings, off unless configured)
+    classifies every page before the GPT stage. Pages it routes are extracted with their
+    TYPEn_PROMPT instead of ``type_prompt_template``, and a sample of them with both to
+    measure the agreement, see ``cascade.stats``.
+    """
+    def __init__(
+        self,
+        on_page: Optional[Callable[[IngestionPage], Any]] = None,
+        type_prompt_template: str = "",
+        container_name: Optional[str] = None,
+        blob_handler=None,
+        pdf_processor=None,
+        di_handler=None,
+        chat_backend_factory: Optional[Callable[[], Any]] = None,
+        checkpoint_store: Optional[PageCheckpointStore] = None,
+        response_parser: Optional[ResponseParser] = None,
+        runtime: Optional["ProcessWorkerRuntime"] = None,
+        deduplicator: Optional["Deduplicator"] = None,
+        file_validator: Optional[FileValidator] = None,
+        usage_ledger: Optional["UsageLedger"] = None,
+        profiler: Optional[Profiler] = None,
+        cascade: Optional[TierCascade] = None,
+        batch_max_pages: Optional[int] = None,
+        batch_token_budget: Optional[int] = None,
+    ):
+        self.logger = Logger(self.__class__.__name__)
+        self.type_prompt_template = type_prompt_template
+        self.container_name = container_name or azure_settings.blob.blob_container_name
+
+        if blob_handler is None:
+            from azure_ai.blob_handler.blob_handler import AzureBlobStorageHandler
+            blob_handler = AzureBlobStorageHandler()
+        if pdf_processor is None:
+            from azure_ai.pdf_processor.pdf_processor import PDFProcessor
+            pdf_processor = PDFProcessor()
+        if di_handler is None:
+            from azure_ai.document_intelligence.document_intelligence import AzureDocumentIntelligenceHandler
+            di_handler = AzureDocumentIntelligenceHandler()
+        if chat_backend_factory is None:
+            from azure_ai.azure_openai.azure_openai import AzureOpenAIChatBackend
+            chat_backend_factory = AzureOpenAIChatBackend
+
+        self.blob_handler = blob_handler
+        self.pdf_processor = pdf_processor
+        self.di_handler = di_handler
+        self.checkpoint_store = checkpoint_store
+        self.response_parser = response_parser or ResponseParser()
+        self.resume_stats = ResumeStats()
+        self.runtime = runtime
+        self.deduplicator = deduplicator
+        self.file_validator = file_validator or FileValidator()
+        self.usage_ledger = usage_ledger
+        self.profiler = profiler or Profiler()
+        self.cascade = cascade or TierCascade(di_handler=di_handler)
+        pipeline_settings = azure_settings.pipeline
+        self.batch_max_pages = batch_max_pages or pipeline_settings.pipeline_batch_max_pages
+        self.batch_token_budget = batch_token_budget or pipeline_settings.pipeline_batch_token_budget
+        self.batch_prompt_tokens = pipeline_settings.pipeline_batch_prompt_tokens
+        self.max_continuations = pipeline_settings.pipeline_max_continuations
+        self.tiling = azure_settings.tiling
+        self.__tile_executor = ThreadPoolExecutor(self.tiling.tiling_workers, thread_name_prefix="tile") if self.tiling.tiling_enabled else None
+        self.__on_page = on_page
+        self.__chat_backend_factory = chat_backend_factory
+        # AzureOpenAIChatBackend drives its own event loop on the thread that created it,
+        # so every GPT worker thread gets its own backend
+        self.__thread_local = threading.local()
+
+        queue_size = pipeline_settings.pipeline_queue_size
+        self.pipeline = Pipeline(
+            stages=[
+                PipelineStage("validate", self.validate_document, pipeline_settings.pipeline_upload_workers, queue_size),
+                PipelineStage("upload", self.upload_document, pipeline_settings.pipeline_upload_workers, queue_size),
+                PipelineStage(
+                    "split",
+                    self.split_document_async if runtime else self.split_document,
+                    pipeline_settings.pipeline_split_workers,
+                    queue_size,
+                    fan_out=True,
+                ),
+                PipelineStage("upload_page", self.upload_page, pipeline_settings.pipeline_upload_workers, queue_size),
+                PipelineStage("analyze", self.analyze_page, pipeline_settings.pipeline_di_workers, queue_size),
+                PipelineStage("extract", self.extract_page, pipeline_settings.pipeline_gpt_workers, queue_size),
+                PipelineStage(
+                    "parse",
+                    self.parse_page_async if runtime else self.parse_page,
+                    pipeline_settings.pipeline_split_workers,
+                    queue_size,
+                ),
+            ],
+            sink=self.__emit_pages if on_page is not None else None,
+        )
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return self.pipeline.stats()
+
+    def run(self, file_paths: Iterable[str | Path]) -> Dict[str, Dict[str, Any]]:
+        """
+        Ingest PDF files from disk. Files are read by the upload stage, not up front.
+
+        Args:
+            file_paths (Iterable[str | Path]): Paths of the PDF files
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Final per-stage statistics
+        """
+        documents = (IngestionDocument(file_name=Path(path).name, file_path=str(path)) for path in file_paths)
+        stats = self.pipeline.run(documents)
+        self.__finish_run()
+        return stats
+
+    async def run_async(self, documents: Iterable[IngestionDocument]) -> Dict[str, Dict[str, Any]]:
+        stats = await self.pipeline.run_async(documents)
+        self.__finish_run()
+        return stats
+
+    def process_page(
+        self,
+        document_hash: str,
+        page_number: int,
+        file_bytes: bytes,
+        file_name: str,
+        before_extract: Optional[Callable[[IngestionPage], Any]] = None,
+        profile: bool = False,
+    ) -> IngestionPage | None:
+        """
+        Run every page stage for a single page, outside of the pipeline.
+
+        Args:
+            document_hash (str): Hash of the document
+            page_number (int): Zero-based page number
+            file_bytes (bytes): Content of the PDF file
+            file_name (str): Original name of the file
+            before_extract (Callable, optional): Called right before the GPT stage. Defaults to None.
+            profile (bool, optional): Profile the page, it may also be sampled. Defaults to False.
+
+        Returns:
+            IngestionPage | None: The extracted page, or None if a stage fails
+        """
+        page = IngestionPage(
+            file_name=file_name,
+            document_hash=document_hash,
+            page_number=page_number,
+            checkpoints=self.__load_checkpoints(document_hash, page_number),
+        )
+        if self.profiler.should_profile(profile):
+            # Pages of a document may be processed by different workers, every page gets its own profile
+            page.profile_key = f"{document_hash}-{page_number}"
+        if PageStage.RASTER not in page.checkpoints:
+            started = time.perf_counter()
+            page.image_bytes = self.pdf_processor.render_page(file_bytes, page_number)
+            page.render_seconds = time.perf_counter() - started
+
+        page = self.upload_page(page)
+        if page is not None:
+            page = self.analyze_page(page)
+        if page is not None:
+            if before_extract is not None:
+                before_extract(page)
+            page = self.extract_page(page)
+        if page is not None:
+            page = self.parse_page(page)
+        if page is not None and page.profile_key is not None:
+            self.profiler.save(page.profile_key)
+        return page
+
+    def validate_document(self, document: IngestionDocument) -> IngestionDocument | None:
+        # Only the header is read, a rejected file is never loaded, uploaded or analyzed
+        content = document.file_bytes if document.file_bytes is not None else document.file_path
+        document.content_type = self.file_validator.validate(content, document.file_name)
+        return document if document.content_type is not None else None
+
+    def upload_document(self, document: IngestionDocument) -> IngestionDocument | None:
+        if document.file_bytes is None:
+            with open(document.file_path, "rb") as f:
+                document.file_bytes = f.read()
+
+        document.document_hash = Utilities.get_hash(document.file_bytes)
+        document.profile = self.profiler.should_profile(document.profile)
+        document.blob_url = self.blob_handler.upload_blob_file(
+            blob_name=document.document_hash,
+            container_name=self.container_name,
+            content=document.file_bytes,
+            extension="pdf",
+            skip_if_existed=True,
+        )
+        if document.blob_url is None:
+            self.logger.error(f"Skip {document.file_name}, upload failed")
+            return None
+        if self.deduplicator is not None:
+            self.deduplicator.deduplicate(document.file_bytes, document.document_hash)
+        return document
+
+    def split_document(self, document: IngestionDocument) -> Iterable[IngestionPage | PageBatch]:
+        page_count = self.pdf_processor.count_pages(document.file_bytes)
+        checkpoints = [self.__load_checkpoints(document.document_hash, page_number) for page_number in range(page_count)]
+        # Pages rasterized by an earlier run are not rendered again
+        to_render = [page_number for page_number in range(page_count) if PageStage.RASTER not in checkpoints[page_number]]
+        images = self.pdf_processor.split_pdf(document.file_bytes, page_numbers=to_render)
+        batch = self.__new_batch(document, page_count)
+
+        for page_number in range(page_count):
+            page = IngestionPage(
+                file_name=document.file_name,
+                document_hash=document.document_hash,
+                page_number=page_number,
+                checkpoints=checkpoints[page_number],
+                profile_key=document.document_hash if document.profile else None,
+            )
+            if PageStage.RASTER not in page.checkpoints:
+                started = time.perf_counter()
+                page.image_bytes = next(images)
+                page.render_seconds = time.perf_counter() - started
+            if batch is None:
+                yield page
+            else:
+                batch.pages.append(page)
+        if batch is not None:
+            yield batch
+        # Every page has been handed downstream, the PDF itself is no longer needed
+        document.file_bytes = None
+
+    async def split_document_async(self, document: IngestionDocument) -> AsyncIterator[IngestionPage | PageBatch]:
+        """
+        ``split_document`` rendering pages in the process pool of ``runtime``.
+
+        Up to one page per process is rendered ahead of the consumer, which keeps every
+        core busy without rendering (and holding) a whole document up front.
+        """
+        pdf = self.runtime.share(document.file_bytes)
+        # The PDF now lives in shared memory until every page is rendered
+        document.file_bytes = None
+        renders: Dict[int, asyncio.Future] = {}
+        try:
+            page_count = await self.runtime.count_pages(pdf)
+            checkpoints = [self.__load_checkpoints(document.document_hash, page_number) for page_number in range(page_count)]
+            to_render = iter(
+                [page_number for page_number in range(page_count) if PageStage.RASTER not in checkpoints[page_number]]
+            )
+
+            def schedule_renders():
+                while len(renders) < self.runtime.processes:
+                    page_number = next(to_render, None)
+                    if page_number is None:
+                        return
+                    renders[page_number] = asyncio.ensure_future(self.runtime.render_page(pdf, page_number))
+
+            batch = self.__new_batch(document, page_count)
+            for page_number in range(page_count):
+                page = IngestionPage(
+                    file_name=document.file_name,
+                    document_hash=document.document_hash,
+                    page_number=page_number,
+                    checkpoints=checkpoints[page_number],
+                    profile_key=document.document_hash if document.profile else None,
+                )
+                if PageStage.RASTER not in page.checkpoints:
+                    schedule_renders()
+                    started = time.perf_counter()
+                    page.image_bytes = await renders.pop(page_number)
+                    page.render_seconds = time.perf_counter() - started
+                    schedule_renders()
+                if batch is None:
+                    yield page
+                else:
+                    batch.pages.append(page)
+            if batch is not None:
+                yield batch
+        finally:
+            for render in renders.values():
+                render.cancel()
+            await asyncio.gather(*renders.values(), return_exceptions=True)
+            pdf.unlink()
+
+    def upload_page(self, page: IngestionPage | PageBatch) -> IngestionPage | PageBatch | None:
+        if isinstance(page, PageBatch):
+            return self.__each(page, self.upload_page)
+        checkpoint = self.__resume(page, PageStage.RASTER)
+        if checkpoint is not None:
+            # The url is only needed by DI and GPT, and SAS tokens expire, so sign it again
+            if PageStage.GPT not in page.checkpoints:
+                page.page_url = self.sign_page_url(page, checkpoint.payload)
+            return page
+
+        with self.__span("upload_page", page) as recorder:
+            started = time.perf_counter()
+            page.image_size = image_dimensions(page.image_bytes)
+            blob_url = self.blob_handler.upload_blob_file(
+                blob_name=page.blob_name.rsplit(".", 1)[0],
+                container_name=self.container_name,
+                content=page.image_bytes,
+                extension="png",
+                skip_if_existed=True,
+            )
+            if blob_url is None:
+                recorder.fail("Page upload failed")
+                return None
+
+            page.page_url = self.sign_page_url(page, blob_url)
+            # Later stages read the page from blob storage through its SAS url
+            page.image_bytes = None
+            self.__save(page, PageStage.RASTER, blob_url, time.perf_counter() - started + page.render_seconds)
+            return page
+
+    def sign_page_url(self, page: IngestionPage, blob_url: str) -> str:
+        return self.sign_blob_url(page.blob_name, blob_url)
+
+    def sign_blob_url(self, blob_name: str, blob_url: str) -> str:
+        sas_token = Utilities.generate_sas_token(
+            url=blob_url, container_name=self.container_name, blob_name=blob_name
+        )
+        return f"{blob_url}?{sas_token}"
+
+    def analyze_page(self, page: IngestionPage | PageBatch) -> IngestionPage | PageBatch | None:
+        if isinstance(page, PageBatch):
+            return self.__each(page, self.analyze_page)
+        checkpoint = self.__resume(page, PageStage.DI)
+        if checkpoint is not None:
+            page.file_context = checkpoint.payload
+            return page
+
+        with self.__span("analyze", page) as recorder:
+            started = time.perf_counter()
+            result = self.di_handler.analyze_document(document_url=page.page_url)
+            if result is None:
+                recorder.fail("Document Intelligence analysis failed")
+                return None
+            page.file_context = result.content
+            if self.__tile_executor is not None:
+                regions = page_regions(result, margin=self.tiling.tiling_margin)
+                if len(regions) >= self.tiling.tiling_min_tables:
+                    page.regions = merge_regions(regions, self.tiling.tiling_max_tiles)
+            self.__save(page, PageStage.DI, page.file_context, time.perf_counter() - started)
+            return page
+
+    def extract_page(self, page: IngestionPage | PageBatch) -> IngestionPage | PageBatch | None:
+        if isinstance(page, PageBatch):
+            return self.__extract_batch(page)
+        checkpoint = self.__resume(page, PageStage.GPT)
+        if checkpoint is not None:
+            payload = json.loads(checkpoint.payload)
+            page.response = payload["response"]
+            page.type_prompt_body_type = payload["type_prompt_body_type"]
+            return page
+
+        backend = self.__chat_backend()
+        with self.__span("extract", page) as recorder:
+            type_prompt_template = self.__type_prompt(page)
+            started = time.perf_counter()
+            image_tokens = None
+            if page.regions:
+                result, page.type_prompt_body_type, image_tokens = self.__extract_tiles(page, type_prompt_template, recorder)
+            else:
+                result, page.type_prompt_body_type = self.__extract(page.page_url, page.file_context, type_prompt_template)
+            recorder.set(PROMPT_TYPE, page.type_prompt_body_type)
+            if result is None:
+                recorder.fail("GPT extraction failed")
+                return None
+            latency_seconds = time.perf_counter() - started
+            if self.usage_ledger is not None:
+                self.__record_usage([page], result, latency_seconds, image_tokens=image_tokens)
+            page.response = str(result)
+            self.__save(
+                page,
+                PageStage.GPT,
+                json.dumps({"response": page.response, "type_prompt_body_type": page.type_prompt_body_type}),
+                latency_seconds,
+            )
+        if page.route is not None:
+            self.cascade.record_extraction(page.route, latency_seconds)
+            if self.cascade.should_audit(page.route):
+                self.__audit(page, backend)
+        return page
+
+    def parse_page(self, page: IngestionPage | PageBatch) -> IngestionPage | PageBatch | None:
+        if isinstance(page, PageBatch):
+            return self.__each(page, self.parse_page)
+        checkpoint = self.__resume(page, PageStage.PARSED)
+        if checkpoint is not None:
+            page.extraction = CompactExtraction.from_dict(json.loads(checkpoint.payload))
+            return page
+
+        with self.__span("parse", page) as recorder:
+            started = time.perf_counter()
+            parsed = self.response_parser.parse(page.response)
+            return self.__finish_parse(page, parsed.model_dump() if parsed is not None else None, started, recorder)
+
+    async def parse_page_async(self, page: IngestionPage | PageBatch) -> IngestionPage | PageBatch | None:
+        """
+        ``parse_page`` running the parser in the process pool of ``runtime``.
+        """
+        if isinstance(page, PageBatch):
+            page.pages = [parsed for parsed in await asyncio.gather(*map(self.parse_page_async, page.pages)) if parsed is not None]
+            return page if page.pages else None
+        checkpoint = self.__resume(page, PageStage.PARSED)
+        if checkpoint is not None:
+            page.extraction = CompactExtraction.from_dict(json.loads(checkpoint.payload))
+            return page
+
+        with self.__span("parse", page) as recorder:
+            started = time.perf_counter()
+            extraction = await self.runtime.parse_response(page.response)
+            return self.__finish_parse(page, extraction, started, recorder)
+
+    def __finish_parse(
+        self, page: IngestionPage, extraction: Optional[Dict[str, Any]], started: float, recorder: SpanRecorder
+    ) -> IngestionPage | None:
+        if extraction is None:
+            recorder.fail("Response could not be parsed")
+            return None
+        self.__save(page, PageStage.PARSED, json.dumps(extraction), time.perf_counter() - started)
+        page.extraction = CompactExtraction.from_dict(extraction)
+        # The answer is checkpointed, pages stay referenced until their document is done
+        page.response = None
+        return page
+
+    def __record_usage(
+        self,
+        pages: List[IngestionPage],
+        result: Any,
+        latency_seconds: float,
+        prompt_type: Optional[str] = None,
+        image_tokens: Optional[int] = None,
+    ) -> None:
+        from azure_ai.ledger.ledger import UsageRecord
+
+        # A request with several pages is recorded on its first page, without image shape
+        page = pages[0]
+        width, height = page.image_size if len(pages) == 1 and page.image_size else (None, None)
+        self.usage_ledger.record(UsageRecord(
+            document_hash=page.document_hash,
+            page_number=page.page_number,
+            prompt_type=prompt_type or page.type_prompt_body_type,
+            usage=get_token_usage(result),
+            latency_seconds=latency_seconds,
+            image_tokens=image_tokens if image_tokens is not None else sum(
+                estimate_image_tokens(*page.image_size) for page in pages if page.image_size
+            ),
+            image_width=width,
+            image_height=height,
+            context_chars=sum(len(page.file_context or "") for page in pages),
+        ))
+
+    def __extract(self, image_url: str, file_context: Optional[str], type_prompt_template: str) -> Tuple[Any, Optional[str]]:
+        backend = self.__chat_backend()
+        result, prompt_type, _ = backend.generate_description(image_url, file_context, type_prompt_template)
+        if result is None:
+            return None, prompt_type
+        # Answers cut off by the output limit are continued from their last complete entity
+        continue_description = getattr(backend, "continue_description", None)
+        if continue_description is None or self.max_continuations <= 0:
+            return result, prompt_type
+        if not is_truncated(str(result), finish_reason(result)):
+            return result, prompt_type
+        self.logger.info("Answer is cut off, continuing it")
+        continued, _, _ = continue_description(image_url, file_context, type_prompt_template, result, self.max_continuations)
+        return continued, prompt_type
+
+    def __extract_tiles(
+        self, page: IngestionPage, type_prompt_template: str, recorder: SpanRecorder
+    ) -> Tuple[Any, Optional[str], Optional[int]]:
+        """
+        Extract every region of a page from its own crop of the page image, in parallel.
+
+        Returns:
+            Tuple[Any, str | None, int | None]: The merged answer with the usage of every request,
+                the prompt type and the estimated image tokens of the tiles
+        """
+        image = self.blob_handler.download_blob_bytes(page.blob_name, self.container_name)
+        if image is None:
+            self.logger.warning(f"Page image {page.blob_name} is not available, extracting the whole page")
+            return (*self.__extract(page.page_url, page.file_context, type_prompt_template), None)
+
+        page_height = image_dimensions(image)[1]
+        tiles = []
+        image_tokens = 0
+        for index, region in enumerate(page.regions):
+            # Text lines end up tiling_line_height pixels high, the model gains nothing from more
+            scale = 1.0
+            if region.line_height:
+                scale = min(1.0, self.tiling.tiling_line_height / (region.line_height * page_height))
+            crop = self.pdf_processor.crop_image(image, region.box, scale)
+            image_tokens += estimate_image_tokens(*image_dimensions(crop))
+            blob_name = f"{page.document_hash}-{page.page_number}-{index}"
+            blob_url = self.blob_handler.upload_blob_file(
+                blob_name=blob_name,
+                container_name=self.container_name,
+                content=crop,
+                extension="png",
+                skip_if_existed=True,
+            )
+            if blob_url is None:
+                return None, None, None
+            tiles.append((self.sign_blob_url(f"{blob_name}.png", blob_url), region.text))
+        recorder.set(TILES, len(tiles))
+
+        answers = list(self.__tile_executor.map(lambda tile: self.__extract(*tile, type_prompt_template), tiles))
+        prompt_type = answers[0][1]
+        results = [result for result, _ in answers]
+        if any(result is None for result in results):
+            return None, prompt_type, None
+        merged = merge_answers(str(result) for result in results)
+        if merged is None:
+            return None, prompt_type, None
+        return ContinuedResult.assemble(merged, results), prompt_type, image_tokens
+
+    def __type_prompt(self, page: IngestionPage) -> str:
+        if not self.cascade.enabled:
+            return self.type_prompt_template
+        if page.route is None:
+            page.route = self.cascade.route(page.file_context, page.page_url)
+        return page.route.type_prompt_template if page.route.routed else self.type_prompt_template
+
+    def __audit(self, page: IngestionPage, backend: Any) -> None:
+        """
+        Extract a routed page again with the full prompt and compare both extractions.
+        Only the cascade statistics and the ledger see the second extraction.
+        """
+        with self.__span("cascade_audit", page) as recorder:
+            started = time.perf_counter()
+            result, prompt_type, _ = backend.generate_description(page.page_url, page.file_context, self.type_prompt_template)
+            recorder.set(PROMPT_TYPE, prompt_type)
+            if result is None:
+                recorder.fail("GPT extraction failed")
+                return
+            full_seconds = time.perf_counter() - started
+            if self.usage_ledger is not None:
+                self.__record_usage([page], result, full_seconds, prompt_type)
+            routed, full = self.response_parser.parse(page.response), self.response_parser.parse(str(result))
+            self.cascade.record_audit(
+                page.route,
+                routed.model_dump() if routed is not None else None,
+                full.model_dump() if full is not None else None,
+                full_seconds,
+            )
+
+    def __chat_backend(self) -> Any:
+        backend = getattr(self.__thread_local, "chat_backend", None)
+        if backend is None:
+            backend = self.__thread_local.chat_backend = self.__chat_backend_factory()
+        return backend
+
+    def __new_batch(self, document: IngestionDocument, page_count: int) -> Optional[PageBatch]:
+        if not 1 < page_count <= self.batch_max_pages:
+            return None
+        return PageBatch(file_name=document.file_name, document_hash=document.document_hash)
+
+    @staticmethod
+    def __each(batch: PageBatch, handler: Callable[[IngestionPage], Optional[IngestionPage]]) -> PageBatch | None:
+        # A failed page leaves the batch, the others go on
+        batch.pages = [page for page in map(handler, batch.pages) if page is not None]
+        return batch if batch.pages else None
+
+    def __extract_batch(self, batch: PageBatch) -> PageBatch | None:
+        extracted = [self.extract_page(page) for page in batch.pages if PageStage.GPT in page.checkpoints]
+        pending = [page for page in batch.pages if PageStage.GPT not in page.checkpoints]
+        generate_batch = getattr(self.__chat_backend(), "generate_description_batch", None)
+        # A request has a single type prompt, consecutive pages routed to the same one are batched together
+        runs: List[Tuple[str, List[IngestionPage]]] = []
+        for page in pending:
+            type_prompt_template = self.__type_prompt(page)
+            if runs and runs[-1][0] == type_prompt_template:
+                runs[-1][1].append(page)
+            else:
+                runs.append((type_prompt_template, [page]))
+
+        for type_prompt_template, run in runs:
+            if generate_batch is None:
+                groups = [[index] for index in range(len(run))]
+            else:
+                page_tokens = [
+                    estimate_image_tokens(*(page.image_size or (1024, 1024))) + estimate_text_tokens(page.file_context or "")
+                    for page in run
+                ]
+                groups = plan_batches(page_tokens, self.batch_token_budget, self.batch_max_pages, self.batch_prompt_tokens)
+            for group in groups:
+                pages = [run[index] for index in group]
+                if len(pages) == 1:
+                    extracted.append(self.extract_page(pages[0]))
+                else:
+                    extracted.extend(self.__extract_group(pages, generate_batch, type_prompt_template))
+        batch.pages = sorted((page for page in extracted if page is not None), key=lambda page: page.page_number)
+        return batch if batch.pages else None
+
+    def __extract_group(
+        self, pages: List[IngestionPage], generate_batch: Callable, type_prompt_template: str
+    ) -> List[Optional[IngestionPage]]:
+        with self.__span("extract", pages[0]) as recorder:
+            recorder.set(BATCH_PAGES, len(pages))
+            started = time.perf_counter()
+            result, prompt_type, _ = generate_batch(
+                [page.page_url for page in pages], [page.file_context for page in pages], type_prompt_template
+            )
+            recorder.set(PROMPT_TYPE, prompt_type)
+            if result is None:
+                recorder.fail("GPT extraction failed")
+                return [None] * len(pages)
+            latency_seconds = time.perf_counter() - started
+            for page in pages:
+                page.type_prompt_body_type = prompt_type
+            if self.usage_ledger is not None:
+                self.__record_usage(pages, result, latency_seconds)
+
+            responses = split_batch_response(str(result), len(pages))
+            for page, response in zip(pages, responses):
+                if response is None:
+                    continue
+                page.response = response
+                self.__save(
+                    page,
+                    PageStage.GPT,
+                    json.dumps({"response": page.response, "type_prompt_body_type": page.type_prompt_body_type}),
+                    latency_seconds / len(pages),
+                )
+                if page.route is not None:
+                    self.cascade.record_extraction(page.route, latency_seconds / len(pages))
+                    if self.cascade.should_audit(page.route):
+                        self.__audit(page, self.__chat_backend())
+        # Pages missing from the answer, e.g. cut off by the output limit, are extracted on their own
+        return [page if response is not None else self.extract_page(page) for page, response in zip(pages, responses)]
+
+    def __emit_pages(self, item: IngestionPage | PageBatch) -> Any:
+        if not isinstance(item, PageBatch):
+            return self.__on_page(item)
+        pending = [result for result in map(self.__on_page, item.pages) if inspect.isawaitable(result)]
+        return asyncio.gather(*pending) if pending else None
+
+    @contextmanager
+    def __span(self, stage: str, page: IngestionPage) -> Iterator[SpanRecorder]:
+        with span(f"pipeline.{stage}", {DOCUMENT_HASH: page.document_hash, PAGE: page.page_number}) as recorder:
+            if page.profile_key is None:
+                yield recorder
+                return
+            recorder.set(PROFILE, str(self.profiler.path(page.profile_key)))
+            with self.profiler.capture(page.profile_key):
+                yield recorder
+
+    def __finish_run(self) -> None:
+        if self.usage_ledger is not None:
+            self.usage_ledger.flush()
+        for path in self.profiler.save_all():
+            self.logger.info(f"Profile written to {path}")
+
+    def __load_checkpoints(self, document_hash: str, page_number: int) -> Dict[str, StageCheckpoint]:
+        if self.checkpoint_store is None:
+            return {}
+        return self.checkpoint_store.get_page(document_hash, page_number)
+
+    def __resume(self, page: IngestionPage, stage: str) -> Optional[StageCheckpoint]:
+        checkpoint = page.checkpoints.get(stage)
+        if checkpoint is not None:
+            self.resume_stats.record_skipped(stage, checkpoint)
+        return checkpoint
+
+    def __save(self, page: IngestionPage, stage: str, payload: Optional[str], duration_seconds: float) -> None:
+        self.resume_stats.record_executed(stage)
+        if self.checkpoint_store is not None:
+            self.checkpoint_store.save_stage(page.document_hash, page.page_number, stage, payload, duration_seconds)
@@ -0,0 +1,107 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from settings.custom_logger import Logger
+from utils.shared_memory import SharedBytes
+from azure_ai.pdf_processor.pdf_processor import PDFProcessor
+
+# Per worker process state. PDFs are opened once per process and reused for every
+# page of the same document, keyed by the name of their shared memory segment
+_open_documents: "OrderedDict[str, Any]" = OrderedDict()
+_MAX_OPEN_DOCUMENTS = 2
+_response_parser = None
+
+
+def _open_document(pdf: SharedBytes):
+    import fitz
+
+    document = _open_documents.get(pdf.name)
+    if document is None:
+        document = fitz.open(stream=pdf.read(), filetype="pdf")
+        _open_documents[pdf.name] = document
+        if len(_open_documents) > _MAX_OPEN_DOCUMENTS:
+            _, oldest = _open_documents.popitem(last=False)
+            oldest.close()
+    else:
+        _open_documents.move_to_end(pdf.name)
+    return document
+
+
+def count_pages(pdf: SharedBytes) -> int:
+    return _open_document(pdf).page_count
+
+
+def render_page(pdf: SharedBytes, page_number: int, dpi: int) -> SharedBytes:
+    """
+    Rasterize one page of a PDF held in shared memory.
+
+    Runs in a worker process. The PNG is written to a new shared memory segment
+    and only its handle travels back to the caller, who must unlink it.
+    """
+    image = _open_document(pdf)[page_number].get_pixmap(dpi=dpi).tobytes("png")
+    return SharedBytes.create(image)
+
+
+def parse_response(response: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse a GPT response into a plain dict. Runs in a worker process.
+    """
+    global _response_parser
+    if _response_parser is None:
+        from azure_ai.models.response_parser import ResponseParser
+        _response_parser = ResponseParser()
+
+    parsed = _response_parser.parse(response)
+    return parsed.model_dump() if parsed is not None else None
+
+
+class ProcessWorkerRuntime:
+    """
+    Run CPU bound ingestion steps (rasterization, PNG encoding, response parsing) in a
+    process pool, so they do not compete for the GIL with the threads and event loop
+    that wait on blob storage, Document Intelligence and GPT.
+
+    The pool is sized from ``pdf_processor_thread_count`` (-1 means one process per CPU).
+    PDFs and rendered pages move between processes through shared memory.
+    """
+    def __init__(self, processes: Optional[int] = None, dpi: Optional[int] = None):
+        self.logger = Logger(self.__class__.__name__)
+        self.processes = processes or PDFProcessor.get_thread_count()
+        self.dpi = PDFProcessor(dpi=dpi).dpi
+        self.__executor = ProcessPoolExecutor(max_workers=self.processes)
+        self.logger.info(f"Started process pool with {self.processes} processes")
+
+    async def run(self, function: Callable[..., Any], *args: Any) -> Any:
+        """
+        Await ``function(*args)`` executed in the process pool.
+
+        ``function`` must be importable at module level, and its arguments and result picklable.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, function, *args)
+
+    def share(self, data: bytes) -> SharedBytes:
+        return SharedBytes.create(data)
+
+    async def count_pages(self, pdf: SharedBytes) -> int:
+        return await self.run(count_pages, pdf)
+
+    async def render_page(self, pdf: SharedBytes, page_number: int) -> bytes:
+        image = await self.run(render_page, pdf, page_number, self.dpi)
+        try:
+            return image.read()
+        finally:
+            image.unlink()
+
+    async def parse_response(self, response: str) -> Optional[Dict[str, Any]]:
+        return await self.run(parse_response, response)
+
+    def shutdown(self) -> None:
+        self.__executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "ProcessWorkerRuntime":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
@@ -0,0 +1,12 @@
+from utils.lazy_import import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "JobQueue": "azure_ai.queue_handler.queue_handler",
+        "SQLiteJobQueue": "azure_ai.queue_handler.queue_handler",
+        "AzureStorageJobQueue": "azure_ai.queue_handler.queue_handler",
+        "create_job_queue": "azure_ai.queue_handler.queue_handler",
+        "IngestionWorker": "azure_ai.queue_handler.worker",
+    },
+)
@@ -0,0 +1,215 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from settings.settings import azure_settings
+from settings.custom_logger import Logger
+from settings.invalid_config_exception import InvalidConfigException
+
+
+@dataclass
+class QueueMessage:
+    id: str
+    pop_receipt: str
+    content: Dict[str, Any]
+    dequeue_count: int
+
+
+class JobQueue(ABC):
+    """
+    Queue with Azure Storage Queue semantics.
+
+    A received message becomes invisible for ``visibility_timeout`` seconds. If it is
+    not deleted in that time (e.g. the worker crashed) it is delivered again, so every
+    job is delivered at least once and handlers must be idempotent.
+    """
+    @abstractmethod
+    def send(self, content: Dict[str, Any], visibility_timeout: int = 0) -> None:
+        ...
+
+    @abstractmethod
+    def receive(self, max_messages: int = 1, visibility_timeout: Optional[int] = None) -> List[QueueMessage]:
+        ...
+
+    @abstractmethod
+    def delete(self, message: QueueMessage) -> None:
+        ...
+
+    @abstractmethod
+    def update_visibility(self, message: QueueMessage, visibility_timeout: int) -> QueueMessage:
+        """
+        Extend (or shorten) the invisibility of a received message, e.g. for long running jobs.
+
+        Returns:
+            QueueMessage: The message with its new pop receipt
+        """
+        ...
+
+    @abstractmethod
+    def approximate_count(self) -> int:
+        ...
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    Local stand-in for Azure Storage Queue, backed by a SQLite file.
+
+    Several worker processes can share the same database file; receiving is done in
+    an immediate transaction so a message is handed to only one of them at a time.
+    """
+    def __init__(self, db_path: Optional[str] = None, queue_name: Optional[str] = None):
+        self.queue_name = queue_name or azure_settings.queue.queue_name
+        self.visibility_timeout = azure_settings.queue.queue_visibility_timeout
+        db_path = db_path or azure_settings.queue.queue_sqlite_path
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        if db_path != ":memory:":
+            self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS queue_message (
+                id TEXT PRIMARY KEY,
+                queue_name TEXT NOT NULL,
+                content TEXT NOT NULL,
+                visible_at REAL NOT NULL,
+                pop_receipt TEXT,
+                dequeue_count INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self.__connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_queue_message_visible ON queue_message (queue_name, visible_at)"
+        )
+
+    def send(self, content: Dict[str, Any], visibility_timeout: int = 0) -> None:
+        with self.__lock:
+            self.__connection.execute(
+                "INSERT INTO queue_message (id, queue_name, content, visible_at) VALUES (?, ?, ?, ?)",
+                (uuid.uuid4().hex, self.queue_name, json.dumps(content), time.time() + visibility_timeout),
+            )
+
+    def receive(self, max_messages: int = 1, visibility_timeout: Optional[int] = None) -> List[QueueMessage]:
+        visibility_timeout = self.visibility_timeout if visibility_timeout is None else visibility_timeout
+        now = time.time()
+        messages = []
+        with self.__lock:
+            self.__connection.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.__connection.execute(
+                    "SELECT id, content, dequeue_count FROM queue_message "
+                    "WHERE queue_name = ? AND visible_at <= ? ORDER BY visible_at LIMIT ?",
+                    (self.queue_name, now, max_messages),
+                ).fetchall()
+                for message_id, content, dequeue_count in rows:
+                    pop_receipt = uuid.uuid4().hex
+                    self.__connection.execute(
+                        "UPDATE queue_message SET visible_at = ?, pop_receipt = ?, dequeue_count = ? WHERE id = ?",
+                        (now + visibility_timeout, pop_receipt, dequeue_count + 1, message_id),
+                    )
+                    messages.append(QueueMessage(message_id, pop_receipt, json.loads(content), dequeue_count + 1))
+                self.__connection.execute("COMMIT")
+            except Exception:
+                self.__connection.execute("ROLLBACK")
+                raise
+        return messages
+
+    def delete(self, message: QueueMessage) -> None:
+        # The pop receipt check prevents a worker whose lease expired from deleting a
+        # message that has since been handed to another worker
+        with self.__lock:
+            self.__connection.execute(
+                "DELETE FROM queue_message WHERE id = ? AND pop_receipt = ?",
+                (message.id, message.pop_receipt),
+            )
+
+    def update_visibility(self, message: QueueMessage, visibility_timeout: int) -> QueueMessage:
+        pop_receipt = uuid.uuid4().hex
+        with self.__lock:
+            cursor = self.__connection.execute(
+                "UPDATE queue_message SET visible_at = ?, pop_receipt = ? WHERE id = ? AND pop_receipt = ?",
+                (time.time() + visibility_timeout, pop_receipt, message.id, message.pop_receipt),
+            )
+        if cursor.rowcount == 0:
+            raise LookupError(f"Message {message.id} is no longer leased by this worker")
+        return QueueMessage(message.id, pop_receipt, message.content, message.dequeue_count)
+
+    def approximate_count(self) -> int:
+        with self.__lock:
+            return self.__connection.execute(
+                "SELECT COUNT(*) FROM queue_message WHERE queue_name = ?", (self.queue_name,)
+            ).fetchone()[0]
+
+
+class AzureStorageJobQueue(JobQueue):
+    def __init__(self, queue_name: Optional[str] = None, connection_string: Optional[str] = None):
+        from azure.storage.queue import QueueClient
+        from azure.core.exceptions import ResourceExistsError
+
+        self.logger = Logger(self.__class__.__name__)
+        self.visibility_timeout = azure_settings.queue.queue_visibility_timeout
+        self.__client = QueueClient.from_connection_string(
+            conn_str=connection_string or azure_settings.queue.queue_connection_string or azure_settings.blob.blob_connection_string,
+            queue_name=queue_name or azure_settings.queue.queue_name,
+        )
+        try:
+            self.__client.create_queue()
+        except ResourceExistsError:
+            pass
+
+    def send(self, content: Dict[str, Any], visibility_timeout: int = 0) -> None:
+        self.__client.send_message(json.dumps(content), visibility_timeout=visibility_timeout)
+
+    def receive(self, max_messages: int = 1, visibility_timeout: Optional[int] = None) -> List[QueueMessage]:
+        visibility_timeout = self.visibility_timeout if visibility_timeout is None else visibility_timeout
+        messages = self.__client.receive_messages(
+            messages_per_page=max_messages, visibility_timeout=visibility_timeout, max_messages=max_messages
+        )
+        return [
+            QueueMessage(message.id, message.pop_receipt, json.loads(message.content), message.dequeue_count)
+            for message in messages
+        ]
+
+    def delete(self, message: QueueMessage) -> None:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            self.__client.delete_message(message.id, pop_receipt=message.pop_receipt)
+        except ResourceNotFoundError:
+            self.logger.warning(f"Message {message.id} was already deleted or leased by another worker")
+
+    def update_visibility(self, message: QueueMessage, visibility_timeout: int) -> QueueMessage:
+        updated = self.__client.update_message(
+            message.id, pop_receipt=message.pop_receipt, visibility_timeout=visibility_timeout
+        )
+        return QueueMessage(message.id, updated.pop_receipt, message.content, message.dequeue_count)
+
+    def approximate_count(self) -> int:
+        return self.__client.get_queue_properties().approximate_message_count
+
+
+def create_job_queue(queue_name: Optional[str] = None) -> JobQueue:
+    """
+    Create the job queue configured by ``queue_backend`` in the settings.
+
+    Args:
+        queue_name (str, optional): Overrides ``queue_name`` from the settings. Defaults to None.
+
+    Returns:
+        JobQueue: The job queue
+    """
+    backend = azure_settings.queue.queue_backend
+    if backend == "azure":
+        return AzureStorageJobQueue(queue_name=queue_name)
+    if backend == "sqlite":
+        return SQLiteJobQueue(queue_name=queue_name)
+    raise InvalidConfigException(
+        r"Invalid settings for queue. Please choose between 'azure' or 'sqlite' only"
+    )
@@ -0,0 +1,199 @@
+import time
+from collections import OrderedDict
+from typing import Any, BinaryIO, Callable, Optional
+from settings.settings import azure_settings
+from settings.custom_logger import Logger
+from utils.utils import Utilities
+from azure_ai.checkpoint.checkpoint import PageCheckpointStore
+from azure_ai.pipeline.pipeline import IngestionPage, IngestionPipeline
+from azure_ai.queue_handler.queue_handler import JobQueue, QueueMessage, create_job_queue
+
+DOCUMENT_JOB = "document"
+PAGE_JOB = "page"
+
+
+class IngestionWorker:
+    """
+    Pull ingestion jobs from a ``JobQueue`` and process them.
+
+    A document job fans out into one page job per page that has no checkpoint yet.
+    A page job renders, uploads, analyzes, extracts and parses one page through
+    ``IngestionPipeline.process_page``, which checkpoints every stage before the
+    message is deleted, so a redelivered job only redoes the stages that failed. Workers share nothing but the queue,
+    the checkpoint store and blob storage, so scaling out is starting more of them.
+    """
+    def __init__(
+        self,
+        job_queue: Optional[JobQueue] = None,
+        checkpoint_store: Optional[PageCheckpointStore] = None,
+        ingestion: Optional[IngestionPipeline] = None,
+        on_page: Optional[Callable[[IngestionPage], Any]] = None,
+    ):
+        self.logger = Logger(self.__class__.__name__)
+        self.job_queue = job_queue or create_job_queue()
+        self.ingestion = ingestion or IngestionPipeline(checkpoint_store=checkpoint_store or PageCheckpointStore())
+        if self.ingestion.checkpoint_store is None:
+            raise ValueError("IngestionWorker needs an IngestionPipeline with a checkpoint store")
+        self.checkpoint_store = self.ingestion.checkpoint_store
+        self.on_page = on_page
+        self.visibility_timeout = azure_settings.queue.queue_visibility_timeout
+        self.max_dequeue_count = azure_settings.queue.queue_max_dequeue_count
+        # Page jobs of the same document usually arrive together, keep the last few PDFs around
+        self.__documents: OrderedDict[str, bytes] = OrderedDict()
+        self.__max_cached_documents = 2
+
+    def submit(self, file: bytes | BinaryIO, file_name: str, profile: bool = False) -> str | None:
+        """
+        Validate and upload a PDF to blob storage, then enqueue its document job.
+
+        A file object is hashed while it is uploaded, so large files are read once and
+        never held in memory.
+
+        Args:
+            file (bytes | BinaryIO): Content of the PDF file, or a seekable file object
+            file_name (str): Original name of the file
+            profile (bool, optional): Profile every page of the document. Defaults to False.
+
+        Returns:
+            str | None: Hash of the document, or None if the file is rejected or the upload fails
+        """
+        if self.ingestion.file_validator.validate(file, file_name) is None:
+            return None
+
+        if isinstance(file, bytes):
+            document_hash = Utilities.get_hash(file)
+            blob_url = self.ingestion.blob_handler.upload_blob_file(
+                blob_name=document_hash,
+                container_name=self.ingestion.container_name,
+                content=file,
+                extension="pdf",
+                skip_if_existed=True,
+            )
+        else:
+            uploaded = self.ingestion.blob_handler.upload_stream_hashed(
+                file, container_name=self.ingestion.container_name, extension="pdf"
+            )
+            document_hash, blob_url = uploaded or (None, None)
+        if blob_url is None:
+            return None
+
+        job = {"type": DOCUMENT_JOB, "document_hash": document_hash, "file_name": file_name}
+        if profile:
+            job["profile"] = True
+        self.job_queue.send(job)
+        return document_hash
+
+    def run(self, poll_interval: float = 5.0, stop_when_idle: bool = False) -> None:
+        """
+        Process jobs until interrupted, or until the queue is empty with ``stop_when_idle``.
+
+        Args:
+            poll_interval (float, optional): Seconds to wait when the queue is empty. Defaults to 5.0.
+            stop_when_idle (bool, optional): Return once no job is available. Defaults to False.
+        """
+        while True:
+            messages = self.job_queue.receive(max_messages=1, visibility_timeout=self.visibility_timeout)
+            if not messages:
+                if stop_when_idle:
+                    return
+                time.sleep(poll_interval)
+                continue
+
+            for message in messages:
+                self.process_message(message)
+
+    def process_message(self, message: QueueMessage) -> None:
+        if message.dequeue_count > self.max_dequeue_count:
+            self.logger.error(f"Discard job {message.content} after {message.dequeue_count - 1} failed deliveries")
+            self.job_queue.delete(message)
+            return
+
+        try:
+            if message.content["type"] == DOCUMENT_JOB:
+                done = self.__process_document(message)
+            elif message.content["type"] == PAGE_JOB:
+                done = self.__process_page(message)
+            else:
+                self.logger.error(f"Unknown job type in {message.content}")
+                done = True
+        except Exception as e:  # Catch master exception, the job will be delivered again
+            self.logger.error_limited("job", f"Job {message.content} failed: {e}")
+            done = False
+
+        # Failed jobs are not deleted and become visible again after the visibility timeout
+        if done:
+            self.job_queue.delete(message)
+
+    def __process_document(self, message: QueueMessage) -> bool:
+        document_hash = message.content["document_hash"]
+        file_bytes = self.__get_document(document_hash)
+        if file_bytes is None:
+            return False
+
+        if self.ingestion.deduplicator is not None:
+            # Pages identical to an earlier upload get its checkpoints and no page job
+            self.ingestion.deduplicator.deduplicate(file_bytes, document_hash)
+        page_count = self.ingestion.pdf_processor.count_pages(file_bytes)
+        done_pages = self.checkpoint_store.done_pages(document_hash)
+        for page_number in range(page_count):
+            if page_number in done_pages:
+                continue
+            self.job_queue.send({
+                "type": PAGE_JOB,
+                "document_hash": document_hash,
+                "file_name": message.content.get("file_name"),
+                "page_number": page_number,
+                "profile": message.content.get("profile", False),
+            })
+        self.logger.info(f"Document {document_hash}: {page_count - len(done_pages)} of {page_count} pages enqueued")
+        return True
+
+    def __process_page(self, message: QueueMessage) -> bool:
+        document_hash = message.content["document_hash"]
+        page_number = message.content["page_number"]
+        if self.checkpoint_store.is_done(document_hash, page_number):
+            return True
+
+        file_bytes = self.__get_document(document_hash)
+        if file_bytes is None:
+            return False
+
+        def renew_lease(page: IngestionPage):
+            # The GPT call is the longest step, renew the lease so no other worker picks the job up
+            message.pop_receipt = self.job_queue.update_visibility(message, self.visibility_timeout).pop_receipt
+
+        page = self.ingestion.process_page(
+            document_hash,
+            page_number,
+            file_bytes,
+            message.content.get("file_name") or document_hash,
+            before_extract=renew_lease,
+            profile=message.content.get("profile", False),
+        )
+        if page is None:
+            return False
+
+        if self.on_page is not None:
+            self.on_page(page)
+        return True
+
+    def __get_document(self, document_hash: str) -> bytes | None:
+        if document_hash in self.__documents:
+            self.__documents.move_to_end(document_hash)
+            return self.__documents[document_hash]
+
+        file_bytes = self.ingestion.blob_handler.download_blob_bytes(
+            blob_name=f"{document_hash}.pdf", container_name=self.ingestion.container_name
+        )
+        if file_bytes is None:
+            return None
+
+        self.__documents[document_hash] = file_bytes
+        if len(self.__documents) > self.__max_cached_documents:
+            self.__documents.popitem(last=False)
+        return file_bytes
+
+
+if __name__ == "__main__":
+    # Start as many of these as needed, every process is an independent worker
+    IngestionWorker().run()
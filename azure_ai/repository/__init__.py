@@ -0,0 +1,9 @@
+from utils.lazy_import import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "ExtractionRepository": "azure_ai.repository.repository",
+        "create_database_engine": "azure_ai.repository.repository",
+    },
+)
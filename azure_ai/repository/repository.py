@@ -0,0 +1,250 @@
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+from settings.settings import azure_settings
+from settings.custom_logger import Logger
+from azure_ai.models.compact import MAIN_FIELDS, CompactExtraction
+from azure_ai.models.extraction import Entity, MainInformation
+
+if TYPE_CHECKING:
+    from sqlalchemy import Connection, Engine, Table
+
+# Maximum number of bound parameters per statement, by dialect
+_MAX_PARAMETERS = {"mssql": 2100, "sqlite": 32766}
+_DEFAULT_MAX_PARAMETERS = 65535
+
+
+def create_database_engine(url: Optional[str] = None) -> "Engine":
+    """
+    Create the pooled engine configured by the database settings.
+
+    Connections are checked before use and recycled before the server closes them, so
+    long running workers survive idle periods. SQLite files are opened in WAL mode so
+    readers do not block the writer.
+
+    Args:
+        url (str, optional): SQLAlchemy database url. Defaults to ``database_url`` of the settings.
+
+    Returns:
+        Engine: SQLAlchemy engine
+    """
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.engine import make_url
+
+    settings = azure_settings.database
+    url = make_url(url or settings.database_url)
+    kwargs: Dict[str, Any] = {"pool_pre_ping": True, "pool_recycle": settings.database_pool_recycle}
+    if url.get_backend_name() == "mssql":
+        # Send executemany batches as one round trip with pyodbc
+        kwargs["fast_executemany"] = True
+    if url.get_backend_name() != "sqlite" or url.database not in (None, "", ":memory:"):
+        kwargs["pool_size"] = settings.database_pool_size
+        kwargs["max_overflow"] = settings.database_max_overflow
+
+    engine = create_engine(url, **kwargs)
+    if url.get_backend_name() == "sqlite":
+        @event.listens_for(engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, _):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+    return engine
+
+
+def _define_tables():
+    from sqlalchemy import Column, DateTime, ForeignKey, Integer, MetaData, String, Table, func
+
+    metadata = MetaData()
+    main_information = Table(
+        "main_information",
+        metadata,
+        Column("document_hash", String(64), primary_key=True),
+        Column("file_name", String(500)),
+        *[Column(name, String(500)) for name in MainInformation.model_fields if name != "EntityList"],
+        Column("updated_at", DateTime, nullable=False, server_default=func.current_timestamp()),
+    )
+    entity = Table(
+        "entity",
+        metadata,
+        Column(
+            "document_hash",
+            String(64),
+            ForeignKey("main_information.document_hash", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        Column("position", Integer, primary_key=True, autoincrement=False),
+        *[Column(name, String(500)) for name in Entity.model_fields],
+    )
+    return metadata, main_information, entity
+
+
+class ExtractionRepository:
+    """
+    Persists parsed extraction results: one ``main_information`` row per CV and one
+    ``entity`` row per item of its ``EntityList``.
+
+    Every CV is written in a single transaction. The main row is upserted and the
+    entity rows are replaced by batched inserts of ``batch_size`` rows (capped by the
+    parameter limit of the database): each batch is one executemany of a statement
+    compiled once, instead of one round trip per row. Works with any SQLAlchemy
+    backend; SQLite is used for local runs and tests.
+    """
+    def __init__(self, engine: Optional["Engine"] = None, batch_size: Optional[int] = None):
+        self.logger = Logger(self.__class__.__name__)
+        self.engine = engine if engine is not None else create_database_engine()
+        self.batch_size = batch_size or azure_settings.database.database_batch_size
+        self.__metadata, self.__main_information, self.__entity = _define_tables()
+
+    def create_tables(self) -> None:
+        self.__metadata.create_all(self.engine)
+
+    def save(
+        self,
+        document_hash: str,
+        extraction: MainInformation | CompactExtraction | Dict[str, Any],
+        file_name: Optional[str] = None,
+    ) -> int:
+        """
+        Insert or replace the extraction result of one CV in a single transaction.
+
+        Args:
+            document_hash (str): Hash of the document, see ``Utilities.get_hash``
+            extraction (MainInformation | CompactExtraction | Dict[str, Any]): Parsed extraction result
+            file_name (str, optional): Name of the uploaded file. Defaults to None.
+
+        Returns:
+            int: Number of rows written
+        """
+        with self.engine.begin() as connection:
+            return self.__save(connection, document_hash, extraction, file_name)
+
+    def save_many(
+        self, results: Iterable[Tuple[str, MainInformation | CompactExtraction | Dict[str, Any], Optional[str]]]
+    ) -> int:
+        """
+        Save many CVs over one pooled connection, still one transaction per CV so a bad
+        result only rolls back itself.
+
+        Args:
+            results (Iterable[Tuple[str, MainInformation | CompactExtraction | Dict, str]]): Document hash, extraction and file name
+
+        Returns:
+            int: Number of rows written
+        """
+        written = 0
+        started = time.perf_counter()
+        with self.engine.connect() as connection:
+            for document_hash, extraction, file_name in results:
+                try:
+                    with connection.begin():
+                        written += self.__save(connection, document_hash, extraction, file_name)
+                except Exception as e:
+                    # Keep saving the other CVs, the failed one was rolled back
+                    self.logger.error(f"Failed to save extraction of {document_hash}: {e}")
+        self.logger.debug(f"Wrote {written} rows in {time.perf_counter() - started:.2f}s")
+        return written
+
+    def get(self, document_hash: str) -> Optional[MainInformation]:
+        from sqlalchemy import select
+
+        with self.engine.connect() as connection:
+            main = connection.execute(
+                select(self.__main_information).where(self.__main_information.c.document_hash == document_hash)
+            ).mappings().first()
+            if main is None:
+                return None
+            entities = connection.execute(
+                select(self.__entity)
+                .where(self.__entity.c.document_hash == document_hash)
+                .order_by(self.__entity.c.position)
+            ).mappings().all()
+        return MainInformation(
+            **{name: main[name] for name in MainInformation.model_fields if name != "EntityList"},
+            EntityList=[Entity(**{name: row[name] for name in Entity.model_fields}) for row in entities],
+        )
+
+    def delete(self, document_hash: str) -> bool:
+        from sqlalchemy import delete
+
+        with self.engine.begin() as connection:
+            connection.execute(delete(self.__entity).where(self.__entity.c.document_hash == document_hash))
+            result = connection.execute(
+                delete(self.__main_information).where(self.__main_information.c.document_hash == document_hash)
+            )
+            return result.rowcount > 0
+
+    def __save(
+        self,
+        connection: "Connection",
+        document_hash: str,
+        extraction: MainInformation | CompactExtraction | Dict[str, Any],
+        file_name: Optional[str],
+    ) -> int:
+        from sqlalchemy import delete
+
+        if isinstance(extraction, CompactExtraction):
+            # Rows straight from the columns, without building the pydantic models
+            main = {name: extraction[name] for name in MAIN_FIELDS}
+            rows = extraction.entities
+        else:
+            if isinstance(extraction, dict):
+                extraction = MainInformation.model_validate(extraction)
+            main = extraction.model_dump(exclude={"EntityList"})
+            rows = (entity.model_dump() for entity in extraction.EntityList or [])
+        main.update(document_hash=document_hash, file_name=file_name)
+        entities = [
+            {"document_hash": document_hash, "position": position, **row}
+            for position, row in enumerate(rows)
+        ]
+
+        self.__upsert(connection, self.__main_information, [main])
+        connection.execute(delete(self.__entity).where(self.__entity.c.document_hash == document_hash))
+        self.__insert(connection, self.__entity, entities)
+        return 1 + len(entities)
+
+    def __insert(self, connection: "Connection", table: "Table", rows: List[Dict[str, Any]]) -> None:
+        from sqlalchemy import insert
+
+        self.__execute_batches(connection, insert(table), table, rows)
+
+    def __upsert(self, connection: "Connection", table: "Table", rows: List[Dict[str, Any]]) -> None:
+        dialect = connection.dialect.name
+        keys = [column.name for column in table.primary_key.columns]
+        if dialect in ("sqlite", "postgresql"):
+            if dialect == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+
+            from sqlalchemy import func
+
+            statement = insert(table)
+            values = {name: statement.excluded[name] for name in rows[0] if name not in keys}
+            if "updated_at" in table.c:
+                # The server default only applies on insert
+                values["updated_at"] = func.current_timestamp()
+            statement = statement.on_conflict_do_update(index_elements=keys, set_=values)
+            self.__execute_batches(connection, statement, table, rows)
+        else:
+            # No portable upsert, replace the rows inside the same transaction
+            from sqlalchemy import delete, tuple_
+
+            connection.execute(
+                delete(table).where(tuple_(*[table.c[key] for key in keys]).in_([tuple(row[key] for key in keys) for row in rows]))
+            )
+            self.__insert(connection, table, rows)
+
+    def __execute_batches(self, connection: "Connection", statement, table: "Table", rows: List[Dict[str, Any]]) -> None:
+        """
+        Execute ``statement`` for ``rows`` in batches of ``batch_size``. The statement is
+        compiled once and every batch is sent as a single executemany call, which the
+        driver turns into multi-row VALUES (insertmanyvalues) or a bulk round trip.
+        """
+        if not rows:
+            return
+        max_parameters = _MAX_PARAMETERS.get(connection.dialect.name, _DEFAULT_MAX_PARAMETERS)
+        size = max(1, min(self.batch_size, (max_parameters - 1) // len(table.columns)))
+        statement = statement.execution_options(insertmanyvalues_page_size=size)
+        for start in range(0, len(rows), size):
+            connection.execute(statement, rows[start:start + size])
@@ -0,0 +1,15 @@
+from utils.lazy_import import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "SearchIndex": "azure_ai.search.search_index",
+        "index_extraction": "azure_ai.search.search_index",
+        "IVFVectorIndex": "azure_ai.search.vector_index",
+        "AzureSearchVectorIndex": "azure_ai.search.vector_index",
+        "create_vector_index": "azure_ai.search.vector_index",
+        "EmbeddingClient": "azure_ai.search.embedding",
+        "SemanticSearch": "azure_ai.search.embedding",
+        "HybridRanker": "azure_ai.search.hybrid",
+    },
+)
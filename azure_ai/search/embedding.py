@@ -0,0 +1,183 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from settings.settings import azure_settings
+from settings.custom_logger import Logger
+from utils.rate_limiter import RateLimiter
+from azure_ai.azure_openai.usage import estimate_text_tokens
+from azure_ai.search.vector_index import VectorIndex, create_vector_index
+
+
+class EmbeddingClient:
+    """
+    Calls the Azure OpenAI embedding deployment in large batches.
+
+    Requests are sized by ``embedding_batch_size`` and go through a ``RateLimiter``
+    configured with the deployment quota, so a bulk backfill slows down instead of
+    collecting 429 responses.
+    """
+    # Hard limit of the Azure OpenAI embeddings API
+    MAX_INPUTS_PER_REQUEST = 2048
+
+    def __init__(self, rate_limiter: Optional[RateLimiter] = None, embeddings: Any = None):
+        self.logger = Logger(self.__class__.__name__)
+        settings = azure_settings.embedding
+        self.batch_size = min(settings.embedding_batch_size, self.MAX_INPUTS_PER_REQUEST)
+        self.rate_limiter = rate_limiter or RateLimiter(
+            requests_per_minute=settings.embedding_requests_per_minute,
+            tokens_per_minute=settings.embedding_tokens_per_minute,
+        )
+        self.__embeddings = embeddings or self.__create_embeddings()
+        self.requests = 0
+
+    def __create_embeddings(self):
+        from langchain_openai import AzureOpenAIEmbeddings
+
+        kwargs = {}
+        if azure_settings.embedding.embedding_dimensions:
+            kwargs["dimensions"] = azure_settings.embedding.embedding_dimensions
+        return AzureOpenAIEmbeddings(
+            azure_endpoint=azure_settings.openai_settings.azure_open_ai__endpoint,
+            api_key=azure_settings.openai_settings.azure_open_ai__api_key,
+            api_version="2024-10-01-preview",
+            azure_deployment=azure_settings.embedding.embedding_deployment_name,
+            # Batching is done here, one call of embed_documents is one request
+            chunk_size=self.MAX_INPUTS_PER_REQUEST,
+            **kwargs,
+        )
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed many texts with as few requests as the batch size allows.
+
+        Args:
+            texts (List[str]): Texts to embed
+
+        Returns:
+            np.ndarray: One row per text, in input order
+        """
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            waited = self.rate_limiter.acquire(sum(estimate_text_tokens(text) for text in batch))
+            if waited:
+                self.logger.debug(f"Waited {waited:.2f}s for embedding quota")
+            vectors.extend(self.__embeddings.embed_documents(batch))
+            self.requests += 1
+        return np.asarray(vectors, dtype=np.float32)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        self.rate_limiter.acquire(estimate_text_tokens(text))
+        self.requests += 1
+        return np.asarray(self.__embeddings.embed_query(text), dtype=np.float32)
+
+
+class SemanticSearch:
+    """
+    Chunk, embed and index extracted CV text, and answer natural language queries
+    such as "senior data scientist with insurance experience" with a nearest
+    neighbour lookup instead of a GPT call.
+    """
+    def __init__(
+        self,
+        embedding_client: Optional[EmbeddingClient] = None,
+        vector_index: Optional[VectorIndex] = None,
+        query_cache_size: int = 1024,
+    ):
+        self.logger = Logger(self.__class__.__name__)
+        self.embedding_client = embedding_client or EmbeddingClient()
+        self.vector_index = vector_index if vector_index is not None else create_vector_index()
+        self.__splitter = None
+        self.__query_cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self.__query_cache_size = query_cache_size
+        self.__lock = threading.Lock()
+
+    def chunk(self, text: str) -> List[str]:
+        if self.__splitter is None:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+            self.__splitter = RecursiveCharacterTextSplitter(
+                chunk_size=azure_settings.embedding.embedding_chunk_size,
+                chunk_overlap=azure_settings.embedding.embedding_chunk_overlap,
+            )
+        return [chunk for chunk in self.__splitter.split_text(text) if chunk.strip()]
+
+    def index_documents(self, documents: Iterable[Tuple[str, str, Optional[Dict[str, Any]]]]) -> int:
+        """
+        Chunk and embed many documents. Chunks of consecutive documents are packed into
+        full batches, so every request except the last carries ``batch_size`` inputs.
+
+        Args:
+            documents (Iterable[Tuple[str, str, Dict]]): Document id, text and metadata
+
+        Returns:
+            int: Number of chunks embedded
+        """
+        batch_size = self.embedding_client.batch_size
+        # Documents waiting for vectors: id, metadata, chunk count and vectors received so far
+        waiting: List[Tuple[str, Optional[Dict[str, Any]], int, List[np.ndarray]]] = []
+        texts: List[str] = []
+        total = 0
+        for document_id, text, metadata in documents:
+            chunks = self.chunk(text)
+            if not chunks:
+                continue
+            waiting.append((document_id, metadata, len(chunks), []))
+            texts.extend(chunks)
+            while len(texts) >= batch_size:
+                total += self.__embed_batch(texts[:batch_size], waiting)
+                texts = texts[batch_size:]
+        if texts:
+            total += self.__embed_batch(texts, waiting)
+        return total
+
+    def index_document(self, document_id: str, text: str, metadata: Optional[Dict[str, Any]] = None) -> int:
+        return self.index_documents([(document_id, text, metadata)])
+
+    def search(self, query: str, k: int = 10, document_ids: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Documents semantically closest to ``query``.
+
+        Args:
+            query (str): Natural language query
+            k (int, optional): Number of documents. Defaults to 10.
+            document_ids (Set[str], optional): Restrict the search to these documents. Defaults to None.
+
+        Returns:
+            List[Tuple[str, float]]: Document id and cosine similarity, best first
+        """
+        return self.vector_index.search(self.query_vector(query), k=k, document_ids=document_ids)
+
+    def query_vector(self, query: str) -> np.ndarray:
+        """
+        Embedding of a query. Repeated queries are answered from an LRU cache.
+        """
+        key = " ".join(query.lower().split())
+        with self.__lock:
+            vector = self.__query_cache.get(key)
+            if vector is not None:
+                self.__query_cache.move_to_end(key)
+                return vector
+
+        vector = self.embedding_client.embed_query(key)
+        with self.__lock:
+            self.__query_cache[key] = vector
+            if len(self.__query_cache) > self.__query_cache_size:
+                self.__query_cache.popitem(last=False)
+        return vector
+
+    def __embed_batch(
+        self, texts: List[str], waiting: List[Tuple[str, Optional[Dict[str, Any]], int, List[np.ndarray]]]
+    ) -> int:
+        vectors = self.embedding_client.embed(texts)
+        offset = 0
+        while offset < len(vectors):
+            document_id, metadata, count, received = waiting[0]
+            missing = count - sum(len(part) for part in received)
+            received.append(vectors[offset:offset + missing])
+            offset += len(received[-1])
+            if len(received[-1]) == missing:
+                self.vector_index.add(document_id, np.concatenate(received), metadata)
+                waiting.pop(0)
+        return len(texts)
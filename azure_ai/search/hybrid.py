@@ -0,0 +1,186 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from settings.settings import azure_settings
+from settings.custom_logger import Logger
+from settings.invalid_config_exception import InvalidConfigException
+from azure_ai.search.search_index import FacetValues, SearchHit, SearchIndex, SearchResult, tokenize
+from azure_ai.search.embedding import SemanticSearch
+
+
+class HybridRanker:
+    """
+    Ranks CVs by fusing BM25 keyword scores with vector similarity.
+
+    Structured filters over the extracted ``MainInformation`` fields (Country, FormType,
+    EntityType, Chapter4Status, role, seniority, skills) are applied first through the
+    bitmap indexes of the ``SearchIndex``, so both rankings only score documents that
+    can be returned. Each ranking contributes its best ``candidates`` documents, which
+    are then combined with reciprocal rank fusion or a weighted blend of normalized
+    scores.
+
+    Results are kept in an LRU cache keyed by the query and its filters. The cache is
+    dropped as soon as the generation of either index changes, i.e. when ingestion adds
+    or removes a document, so it never serves stale hits.
+    """
+    def __init__(
+        self,
+        search_index: SearchIndex,
+        semantic_search: Optional[SemanticSearch] = None,
+        fusion: Optional[str] = None,
+        cache_size: Optional[int] = None,
+    ):
+        self.logger = Logger(self.__class__.__name__)
+        settings = azure_settings.search
+        self.search_index = search_index
+        self.semantic_search = semantic_search
+        self.fusion = fusion or settings.search_fusion
+        if self.fusion not in ("rrf", "weighted"):
+            raise InvalidConfigException(
+                r"Invalid settings for search fusion. Please choose between 'rrf' or 'weighted' only"
+            )
+        self.rrf_k = settings.search_rrf_k
+        self.keyword_weight = settings.search_keyword_weight
+        self.candidates = settings.search_candidates
+        self.__cache_size = cache_size if cache_size is not None else settings.search_cache_size
+        self.__cache: OrderedDict[tuple, SearchResult] = OrderedDict()
+        self.__cache_generation: Optional[Tuple[int, int]] = None
+        self.__lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def search(
+        self,
+        query: str = "",
+        filters: Optional[Dict[str, FacetValues]] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> SearchResult:
+        """
+        Hybrid search with structured pre-filters.
+
+        Args:
+            query (str, optional): Text from the search box. Defaults to "".
+            filters (Dict[str, str | Iterable[str]], optional): Selected filter options. Defaults to None.
+            limit (int, optional): Maximum number of hits. Defaults to 20.
+            offset (int, optional): Number of hits to skip, for paging. Defaults to 0.
+
+        Returns:
+            SearchResult: Number of fused candidates and the requested page of hits
+        """
+        key = (" ".join(query.lower().split()), self.__filter_key(filters), limit, offset)
+        generation = self.__generation()
+        with self.__lock:
+            if generation != self.__cache_generation:
+                self.__cache.clear()
+                self.__cache_generation = generation
+            result = self.__cache.get(key)
+            if result is not None:
+                self.__cache.move_to_end(key)
+                self.cache_hits += 1
+                return result
+            self.cache_misses += 1
+
+        result = self.__rank(key[0], filters, limit, offset)
+        with self.__lock:
+            # Only cache if no document was indexed while ranking
+            if self.__cache_size and generation == self.__cache_generation == self.__generation():
+                self.__cache[key] = result
+                if len(self.__cache) > self.__cache_size:
+                    self.__cache.popitem(last=False)
+        return result
+
+    def clear_cache(self) -> None:
+        with self.__lock:
+            self.__cache.clear()
+
+    def __rank(self, query: str, filters: Optional[Dict[str, FacetValues]], limit: int, offset: int) -> SearchResult:
+        if not query or self.semantic_search is None:
+            return self.search_index.search(query, filters, limit, offset)
+
+        mask = self.search_index.filter_bitmap(filters)
+        if not mask:
+            return SearchResult(total=0)
+
+        keyword = self.__keyword_ranking(tokenize(query), mask)
+        # Without filters every live document is allowed, the vector index is searched unrestricted
+        document_ids = None
+        if filters:
+            document_ids = {self.search_index.document_id(number) for number in self.__mask_numbers(mask)}
+        vector = [
+            (document_id, score)
+            for document_id, score in self.semantic_search.search(query, k=self.candidates, document_ids=document_ids)
+            # Skip documents that have no keyword index entry (yet)
+            if self.__is_live(document_id, mask)
+        ]
+
+        if self.fusion == "rrf":
+            fused = self.__reciprocal_rank_fusion([keyword, vector])
+        else:
+            fused = self.__weighted_blend(keyword, vector)
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+        hits = [
+            SearchHit(document_id, score, self.search_index.stored(self.search_index.document_number(document_id)))
+            for document_id, score in ranked[offset:offset + limit]
+        ]
+        return SearchResult(total=len(ranked), hits=hits)
+
+    def __keyword_ranking(self, terms: List[str], mask: int) -> List[Tuple[str, float]]:
+        if not terms:
+            return []
+        # Any term may match, the vector ranking covers documents using other words
+        numbers, scores = self.search_index.score_terms(terms, mask, require_all=False)
+        if len(numbers) > self.candidates:
+            top = np.argpartition(-scores, self.candidates - 1)[:self.candidates]
+            numbers, scores = numbers[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [(self.search_index.document_id(int(numbers[i])), float(scores[i])) for i in order]
+
+    def __reciprocal_rank_fusion(self, rankings: List[List[Tuple[str, float]]]) -> Dict[str, float]:
+        fused: Dict[str, float] = {}
+        for ranking in rankings:
+            for rank, (document_id, _) in enumerate(ranking, start=1):
+                fused[document_id] = fused.get(document_id, 0.0) + 1.0 / (self.rrf_k + rank)
+        return fused
+
+    def __weighted_blend(self, keyword: List[Tuple[str, float]], vector: List[Tuple[str, float]]) -> Dict[str, float]:
+        fused: Dict[str, float] = {}
+        for ranking, weight in ((keyword, self.keyword_weight), (vector, 1.0 - self.keyword_weight)):
+            if not ranking:
+                continue
+            scores = [score for _, score in ranking]
+            low, high = min(scores), max(scores)
+            for document_id, score in ranking:
+                # Min-max normalization puts BM25 and cosine similarity on the same 0..1 scale
+                normalized = (score - low) / (high - low) if high > low else 1.0
+                fused[document_id] = fused.get(document_id, 0.0) + weight * normalized
+        return fused
+
+    def __is_live(self, document_id: str, mask: int) -> bool:
+        number = self.search_index.document_number(document_id)
+        return number is not None and bool(mask >> number & 1)
+
+    def __generation(self) -> Tuple[int, int]:
+        vector_generation = 0
+        if self.semantic_search is not None:
+            vector_generation = getattr(self.semantic_search.vector_index, "generation", 0)
+        return self.search_index.generation, vector_generation
+
+    @staticmethod
+    def __mask_numbers(mask: int) -> np.ndarray:
+        data = np.frombuffer(mask.to_bytes((mask.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+        return np.flatnonzero(np.unpackbits(data, bitorder="little"))
+
+    @staticmethod
+    def __filter_key(filters: Optional[Dict[str, FacetValues]]) -> tuple:
+        if not filters:
+            return ()
+        key = []
+        for name, values in sorted(filters.items()):
+            if values is None:
+                continue
+            if isinstance(values, str):
+                values = [values]
+            key.append((name, tuple(sorted(value.strip().lower() for value in values if value))))
+        return tuple(key)
@@ -0,0 +1,434 @@
+import math
+import re
+import threading
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import PurePath
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or that the this to was were will with".split()
+)
+
+SENIORITY_KEYWORDS = {
+    "intern": "intern",
+    "fresher": "entry",
+    "entry": "entry",
+    "junior": "junior",
+    "associate": "associate",
+    "assistant": "associate",
+    "mid": "mid",
+    "senior": "senior",
+    "lead": "lead",
+}
+
+FacetValues = str | Iterable[str] | None
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase ``text`` and split it into terms, keeping tokens like "c++" or "c#" whole.
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        List[str]: Terms in order of appearance, stop words removed
+    """
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in _STOP_WORDS]
+
+
+@dataclass
+class SearchHit:
+    document_id: str
+    score: float
+    stored: Dict[str, Any]
+
+
+@dataclass
+class SearchResult:
+    total: int
+    hits: List[SearchHit] = field(default_factory=list)
+
+
+class SearchIndex:
+    """
+    In-memory search index over extraction results.
+
+    Full-text fields go into an inverted index: one posting array of document numbers
+    (and one of term frequencies) per term, scored with BM25 through NumPy views of
+    those arrays. Categorical fields go into bitmap indexes: one bit per document for
+    every facet value, so combining filters is a handful of big-integer AND/OR
+    operations.
+
+    Documents get increasing numbers as they are added, which keeps every posting
+    array sorted with plain appends, so new CVs are indexed without a rebuild. Replaced
+    and removed documents are masked by a bitmap of live documents and no longer count
+    in the document frequencies; their posting entries are dropped once they make up
+    half of the postings (and at least ``COMPACT_MIN_DEAD_POSTINGS``).
+    """
+    BM25_K1 = 1.2
+    BM25_B = 0.75
+    COMPACT_MIN_DEAD_POSTINGS = 4096
+
+    def __init__(self):
+        self.__lock = threading.RLock()
+        self.__document_ids: List[str] = []
+        self.__stored: List[Optional[Dict[str, Any]]] = []
+        self.__document_lengths = array("I")
+        self.__numbers: Dict[str, int] = {}
+        self.__postings: Dict[str, array] = {}
+        self.__frequencies: Dict[str, array] = {}
+        # Live documents per term, the postings also hold replaced and removed documents
+        self.__document_frequencies: Dict[str, int] = {}
+        self.__terms: List[Optional[Tuple[str, ...]]] = []
+        self.__posting_count = 0
+        self.__dead_postings = 0
+        # Bitmaps are mutable bytearrays (bit n of byte n // 8) so setting a bit is O(1)
+        self.__facets: Dict[str, Dict[str, bytearray]] = {}
+        self.__live = bytearray()
+        self.__live_count = 0
+        self.__total_length = 0
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return self.__live_count
+
+    def add(
+        self,
+        document_id: str,
+        text: Dict[str, Optional[str]],
+        facets: Optional[Dict[str, FacetValues]] = None,
+        stored: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Index a document, replacing any previous version with the same id.
+
+        Args:
+            document_id (str): Unique id, e.g. the document hash
+            text (Dict[str, str]): Full-text fields
+            facets (Dict[str, str | Iterable[str]], optional): Categorical fields used as filters.
+                Multi-valued fields (e.g. skills) take an iterable. Defaults to None.
+            stored (Dict[str, Any], optional): Data returned with search hits. Defaults to None.
+        """
+        terms = Counter()
+        for value in text.values():
+            if value:
+                terms.update(tokenize(value))
+
+        with self.__lock:
+            self.remove(document_id)
+            number = len(self.__document_ids)
+            self.__document_ids.append(document_id)
+            self.__stored.append(stored or {})
+            self.__numbers[document_id] = number
+            length = sum(terms.values())
+            self.__document_lengths.append(length)
+            self.__total_length += length
+            self.__terms.append(tuple(terms))
+            self.__posting_count += len(terms)
+
+            for term, frequency in terms.items():
+                postings = self.__postings.get(term)
+                if postings is None:
+                    postings = self.__postings[term] = array("I")
+                    self.__frequencies[term] = array("H")
+                postings.append(number)
+                self.__frequencies[term].append(min(frequency, 0xFFFF))
+                self.__document_frequencies[term] = self.__document_frequencies.get(term, 0) + 1
+
+            for name, values in (facets or {}).items():
+                facet = self.__facets.setdefault(name, {})
+                for value in self.__facet_values(values):
+                    self.__set_bit(facet.setdefault(value, bytearray()), number)
+
+            self.__set_bit(self.__live, number)
+            self.__live_count += 1
+            self.generation += 1
+
+    def remove(self, document_id: str) -> bool:
+        """
+        Remove a document from search results. Returns False if it is not indexed.
+        """
+        with self.__lock:
+            number = self.__numbers.pop(document_id, None)
+            if number is None:
+                return False
+            self.__live[number >> 3] &= ~(1 << (number & 7)) & 0xFF
+            self.__live_count -= 1
+            self.__total_length -= self.__document_lengths[number]
+            self.__stored[number] = None
+            terms = self.__terms[number]
+            self.__terms[number] = None
+            for term in terms:
+                remaining = self.__document_frequencies[term] - 1
+                if remaining:
+                    self.__document_frequencies[term] = remaining
+                else:
+                    del self.__document_frequencies[term]
+            self.__dead_postings += len(terms)
+            if self.__dead_postings >= max(self.COMPACT_MIN_DEAD_POSTINGS, self.__posting_count - self.__dead_postings):
+                self.__compact()
+            self.generation += 1
+            return True
+
+    def facet_counts(self, name: str, filters: Optional[Dict[str, FacetValues]] = None) -> Dict[str, int]:
+        """
+        Number of live documents per value of a facet, e.g. to fill a select box.
+
+        Args:
+            name (str): Facet name
+            filters (Dict[str, str | Iterable[str]], optional): Restrict the counts to matching documents
+
+        Returns:
+            Dict[str, int]: Facet value to document count
+        """
+        with self.__lock:
+            mask = self.filter_bitmap(filters)
+            return {
+                value: count
+                for value, bitmap in self.__facets.get(name, {}).items()
+                if (count := (int.from_bytes(bitmap, "little") & mask).bit_count())
+            }
+
+    def filter_bitmap(self, filters: Optional[Dict[str, FacetValues]] = None) -> int:
+        """
+        Bitmap (bit n set for document number n) of live documents matching every
+        filter. Values of the same facet are ORed.
+        """
+        with self.__lock:
+            mask = int.from_bytes(self.__live, "little")
+            for name, values in (filters or {}).items():
+                facet = self.__facets.get(name, {})
+                selected = 0
+                for value in self.__facet_values(values):
+                    if value in facet:
+                        selected |= int.from_bytes(facet[value], "little")
+                mask &= selected
+                if not mask:
+                    break
+            return mask
+
+    def search(
+        self,
+        query: str = "",
+        filters: Optional[Dict[str, FacetValues]] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> SearchResult:
+        """
+        Full-text search with categorical filters.
+
+        Every query term must match. Hits are ranked by BM25, or by most recently
+        indexed first when there is no query text.
+
+        Args:
+            query (str, optional): Text from the search box. Defaults to "".
+            filters (Dict[str, str | Iterable[str]], optional): Selected filter options. Defaults to None.
+            limit (int, optional): Maximum number of hits. Defaults to 20.
+            offset (int, optional): Number of hits to skip, for paging. Defaults to 0.
+
+        Returns:
+            SearchResult: Total number of matches and the requested page of hits
+        """
+        import numpy as np
+
+        with self.__lock:
+            mask = self.filter_bitmap(filters)
+            terms = list(dict.fromkeys(tokenize(query)))
+            if not terms:
+                return self.__browse(mask, limit, offset)
+
+            numbers, scores = self.score_terms(terms, mask)
+            wanted = min(offset + limit, len(numbers))
+            if wanted == 0:
+                return SearchResult(total=len(numbers))
+            # Partial sort: only the requested page has to be ordered
+            top = np.argpartition(-scores, wanted - 1)[:wanted]
+            # argpartition keeps an arbitrary subset of the scores tied with the last one,
+            # keep all of them so that the order and the pages do not depend on it
+            top = np.flatnonzero(scores >= scores[top].min())
+            top = top[np.lexsort((-numbers[top], -scores[top]))][offset:wanted]
+            hits = [
+                SearchHit(self.__document_ids[numbers[i]], float(scores[i]), self.__stored[numbers[i]])
+                for i in top
+            ]
+            return SearchResult(total=len(numbers), hits=hits)
+
+    def score_terms(self, terms: List[str], mask: Optional[int] = None, require_all: bool = True):
+        """
+        BM25 scores of the documents matching ``terms`` within ``mask``.
+
+        Args:
+            terms (List[str]): Tokenized query terms
+            mask (int, optional): Bitmap of allowed documents. Defaults to every live document.
+            require_all (bool, optional): Only keep documents containing every term. Defaults to True.
+
+        Returns:
+            Tuple[numpy.ndarray, numpy.ndarray]: Matching document numbers and their scores
+        """
+        import numpy as np
+
+        with self.__lock:
+            count = len(self.__document_ids)
+            mask = int.from_bytes(self.__live, "little") if mask is None else mask
+            postings = [(term, self.__postings.get(term)) for term in dict.fromkeys(terms)]
+            missing = any(posting is None for _, posting in postings)
+            postings = [(term, posting) for term, posting in postings if posting is not None]
+            if not mask or not postings or (require_all and missing):
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+            allowed = np.unpackbits(
+                np.frombuffer(mask.to_bytes((count + 7) // 8, "little"), dtype=np.uint8),
+                count=count,
+                bitorder="little",
+            ).astype(bool)
+            lengths = np.frombuffer(self.__document_lengths, dtype=np.uint32)
+            average_length = self.__total_length / max(self.__live_count, 1)
+
+            scores = np.zeros(count, dtype=np.float32)
+            matched = np.zeros(count, dtype=np.uint8)
+            for term, posting in postings:
+                # Zero-copy views over the posting arrays
+                numbers = np.frombuffer(posting, dtype=np.uint32)
+                frequencies = np.frombuffer(self.__frequencies[term], dtype=np.uint16).astype(np.float32)
+                document_frequency = self.__document_frequencies.get(term, 0)
+                idf = math.log(1 + (self.__live_count - document_frequency + 0.5) / (document_frequency + 0.5))
+                norm = self.BM25_K1 * (1 - self.BM25_B + self.BM25_B * lengths[numbers] / average_length)
+                scores[numbers] += idf * frequencies * (self.BM25_K1 + 1) / (frequencies + norm)
+                matched[numbers] += 1
+                del numbers, frequencies
+
+            selected = allowed & (matched == len(postings) if require_all else matched > 0)
+            numbers = np.flatnonzero(selected)
+            result = numbers, scores[numbers]
+            # Release the buffer exports so the arrays can grow again
+            del lengths
+            return result
+
+    def document_id(self, number: int) -> str:
+        return self.__document_ids[number]
+
+    def document_number(self, document_id: str) -> Optional[int]:
+        return self.__numbers.get(document_id)
+
+    def stored(self, number: int) -> Optional[Dict[str, Any]]:
+        return self.__stored[number]
+
+    def __compact(self) -> None:
+        """
+        Drop the posting entries of replaced and removed documents. Document numbers are
+        kept, so the postings stay sorted and numbers handed out remain valid.
+        """
+        import numpy as np
+
+        count = len(self.__document_ids)
+        live = np.unpackbits(
+            np.frombuffer(bytes(self.__live), dtype=np.uint8), count=count, bitorder="little"
+        ).astype(bool)
+        for term in list(self.__postings):
+            numbers = np.frombuffer(self.__postings[term], dtype=np.uint32)
+            keep = live[numbers]
+            if keep.all():
+                continue
+            if keep.any():
+                frequencies = np.frombuffer(self.__frequencies[term], dtype=np.uint16)
+                self.__postings[term] = array("I", numbers[keep].tobytes())
+                self.__frequencies[term] = array("H", frequencies[keep].tobytes())
+            else:
+                del self.__postings[term], self.__frequencies[term]
+        self.__posting_count -= self.__dead_postings
+        self.__dead_postings = 0
+
+    def __browse(self, mask: int, limit: int, offset: int) -> SearchResult:
+        hits = []
+        for number in self.__iterate_bits_descending(mask):
+            if offset:
+                offset -= 1
+                continue
+            if len(hits) == limit:
+                break
+            hits.append(SearchHit(self.__document_ids[number], 0.0, self.__stored[number]))
+        return SearchResult(total=mask.bit_count(), hits=hits)
+
+    @staticmethod
+    def __set_bit(bitmap: bytearray, number: int) -> None:
+        index = number >> 3
+        if index >= len(bitmap):
+            bitmap.extend(bytes(index + 1 - len(bitmap)))
+        bitmap[index] |= 1 << (number & 7)
+
+    @staticmethod
+    def __iterate_bits_descending(mask: int) -> Iterator[int]:
+        data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+        for index in range(len(data) - 1, -1, -1):
+            byte = data[index]
+            while byte:
+                bit = byte.bit_length() - 1
+                yield index * 8 + bit
+                byte &= ~(1 << bit)
+
+    @staticmethod
+    def __facet_values(values: FacetValues) -> Iterable[str]:
+        if values is None:
+            return ()
+        if isinstance(values, str):
+            return (values.strip().lower(),)
+        return {value.strip().lower() for value in values if value}
+
+
+def seniority_from_file_name(file_name: str) -> Optional[str]:
+    """
+    Guess the seniority of a CV from its file name, e.g. "senior-data-scientist-resume.pdf".
+    """
+    for token in re.split(r"[^a-z]+", file_name.lower()):
+        if token in SENIORITY_KEYWORDS:
+            return SENIORITY_KEYWORDS[token]
+    return None
+
+
+def index_extraction(
+    index: SearchIndex,
+    document_id: str,
+    extraction: Dict[str, Any],
+    file_path: Optional[str] = None,
+    content: str = "",
+    skills: Iterable[str] = (),
+) -> None:
+    """
+    Index one parsed extraction result (a ``MainInformation`` dump).
+
+    Every string field and the entity list go to full-text search. Country, FormType,
+    EntityType and Chapter4Status of the main information and of the entities become
+    facets, together with the role (folder of the file), the seniority (from the file
+    name) and the given skills.
+
+    Args:
+        index (SearchIndex): Index to add the document to
+        document_id (str): Unique id of the document, e.g. its hash
+        extraction (Dict[str, Any]): Parsed extraction result
+        file_path (str, optional): Original path of the file, e.g. "CV samples/Data Analyst/x.pdf"
+        content (str, optional): Additional text, e.g. Document Intelligence content. Defaults to "".
+        skills (Iterable[str], optional): Skills found in the document. Defaults to ().
+    """
+    entities = extraction.get("EntityList") or []
+    text = {key: value for key, value in extraction.items() if isinstance(value, str)}
+    text["entities"] = " ".join(
+        str(value) for entity in entities for value in entity.values() if isinstance(value, str)
+    )
+    text["content"] = content
+
+    facets: Dict[str, FacetValues] = {"skills": list(skills)}
+    for key in ("Country", "FormType", "EntityType", "Chapter4Status"):
+        facets[key] = [value for value in [extraction.get(key)] + [entity.get(key) for entity in entities] if value]
+
+    stored = {"Name": extraction.get("Name"), "FormType": extraction.get("FormType")}
+    if file_path:
+        path = PurePath(file_path)
+        facets["role"] = path.parent.name or None
+        facets["seniority"] = seniority_from_file_name(path.name)
+        stored["file_name"] = path.name
+
+    index.add(document_id, text, facets, stored)
@@ -0,0 +1,307 @@
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+from settings.settings import azure_settings
+from settings.custom_logger import Logger
+from settings.invalid_config_exception import InvalidConfigException
+
+
+class VectorIndex(ABC):
+    """
+    Stores embedding vectors of document chunks and returns the documents closest to a query vector.
+    """
+    @abstractmethod
+    def add(self, document_id: str, vectors: np.ndarray, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Index the chunk vectors of a document, replacing any previous version.
+
+        Args:
+            document_id (str): Unique id of the document
+            vectors (np.ndarray): One row per chunk
+            metadata (Dict[str, Any], optional): Data returned with search hits. Defaults to None.
+        """
+        ...
+
+    @abstractmethod
+    def remove(self, document_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def search(
+        self, vector: np.ndarray, k: int = 10, document_ids: Optional[Set[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Documents whose best matching chunk is closest to ``vector``, by cosine similarity.
+
+        Args:
+            vector (np.ndarray): Query embedding
+            k (int, optional): Number of documents. Defaults to 10.
+            document_ids (Set[str], optional): Only return these documents. Defaults to None.
+
+        Returns:
+            List[Tuple[str, float]]: Document id and similarity, best first
+        """
+        ...
+
+
+class IVFVectorIndex(VectorIndex):
+    """
+    Local approximate nearest neighbour index (inverted file) in NumPy.
+
+    Vectors are normalized so the dot product is the cosine similarity. Until
+    ``train_threshold`` vectors have been added the search is exact (one matrix-vector
+    product). Past that, vectors are clustered with spherical k-means into ``n_lists``
+    lists and a query only scans the ``n_probe`` lists with the closest centroids.
+    New vectors are appended to the list of their closest centroid, so adding
+    documents never requires a rebuild; call ``train`` again after the corpus has
+    grown a lot to rebalance the lists.
+    """
+    def __init__(
+        self,
+        n_lists: Optional[int] = None,
+        n_probe: int = 8,
+        train_threshold: int = 20000,
+        dtype: Any = np.float32,
+    ):
+        self.logger = Logger(self.__class__.__name__)
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_threshold = train_threshold
+        self.dtype = dtype
+        self.__lock = threading.RLock()
+        self.__vectors: Optional[np.ndarray] = None
+        self.__size = 0
+        self.__row_live = np.zeros(0, dtype=bool)
+        self.__row_owner = array("I")
+        self.__document_ids: List[str] = []
+        self.__metadata: List[Optional[Dict[str, Any]]] = []
+        self.__rows: Dict[str, Tuple[int, int]] = {}
+        self.__numbers: Dict[str, int] = {}
+        self.__centroids: Optional[np.ndarray] = None
+        self.__lists: List[array] = []
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return len(self.__rows)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.__centroids is not None
+
+    def add(self, document_id: str, vectors: np.ndarray, metadata: Optional[Dict[str, Any]] = None) -> None:
+        vectors = self.__normalize(np.atleast_2d(np.asarray(vectors, dtype=self.dtype)))
+        with self.__lock:
+            self.remove(document_id)
+            self.__reserve(len(vectors), vectors.shape[1])
+            start = self.__size
+            self.__vectors[start:start + len(vectors)] = vectors
+            self.__row_live[start:start + len(vectors)] = True
+            self.__size += len(vectors)
+
+            number = len(self.__document_ids)
+            self.__document_ids.append(document_id)
+            self.__metadata.append(metadata)
+            self.__numbers[document_id] = number
+            self.__row_owner.extend([number] * len(vectors))
+            self.__rows[document_id] = (start, start + len(vectors))
+            self.generation += 1
+
+            if self.is_trained:
+                for row, list_number in enumerate(self.__assign(vectors), start=start):
+                    self.__lists[list_number].append(row)
+            elif self.__size >= self.train_threshold:
+                self.train()
+
+    def remove(self, document_id: str) -> bool:
+        with self.__lock:
+            rows = self.__rows.pop(document_id, None)
+            if rows is None:
+                return False
+            self.__row_live[rows[0]:rows[1]] = False
+            self.__metadata[self.__numbers.pop(document_id)] = None
+            self.generation += 1
+            return True
+
+    def metadata(self, document_id: str) -> Optional[Dict[str, Any]]:
+        number = self.__numbers.get(document_id)
+        return self.__metadata[number] if number is not None else None
+
+    def train(self, iterations: int = 10, sample_size: int = 100000, seed: int = 42) -> None:
+        """
+        Cluster the live vectors with spherical k-means and rebuild the inverted lists.
+
+        Args:
+            iterations (int, optional): k-means iterations. Defaults to 10.
+            sample_size (int, optional): Number of vectors used to fit the centroids. Defaults to 100000.
+            seed (int, optional): Random seed. Defaults to 42.
+        """
+        with self.__lock:
+            rows = np.flatnonzero(self.__row_live[:self.__size])
+            if len(rows) == 0:
+                return
+            n_lists = self.n_lists or max(1, int(4 * np.sqrt(len(rows))))
+            n_lists = min(n_lists, len(rows))
+            rng = np.random.default_rng(seed)
+            sample = self.__vectors[rng.choice(rows, size=min(sample_size, len(rows)), replace=False)]
+
+            centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+            for _ in range(iterations):
+                assignment = self.__nearest(sample, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, sample)
+                counts = np.bincount(assignment, minlength=n_lists)
+                empty = counts == 0
+                # Restart empty clusters from random points
+                sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+                centroids = self.__normalize(sums)
+
+            self.__centroids = centroids
+            assignment = self.__nearest(self.__vectors[rows], centroids)
+            order = np.argsort(assignment, kind="stable")
+            boundaries = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+            self.__lists = [
+                array("I", rows[order[boundaries[i]:boundaries[i + 1]]].astype(np.uint32).tobytes())
+                for i in range(n_lists)
+            ]
+            self.logger.info(f"Trained {n_lists} lists over {len(rows)} vectors")
+
+    def search(
+        self, vector: np.ndarray, k: int = 10, document_ids: Optional[Set[str]] = None
+    ) -> List[Tuple[str, float]]:
+        query = self.__normalize(np.asarray(vector, dtype=self.dtype).reshape(1, -1))[0]
+        with self.__lock:
+            if self.__size == 0:
+                return []
+            if document_ids is not None:
+                # Pre-filtered search: scan exactly the chunks of the allowed documents, so a
+                # selective filter never loses hits that fall outside the probed lists
+                ranges = [self.__rows[document_id] for document_id in document_ids if document_id in self.__rows]
+                if not ranges:
+                    return []
+                rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+            elif self.is_trained:
+                probes = np.argsort(-(self.__centroids @ query))[:self.n_probe]
+                rows = np.concatenate([np.frombuffer(self.__lists[i], dtype=np.uint32) for i in probes]).astype(np.int64)
+            else:
+                rows = np.arange(self.__size)
+
+            owners = np.frombuffer(self.__row_owner, dtype=np.uint32)[rows]
+            keep = self.__row_live[rows]
+            rows, owners = rows[keep], owners[keep]
+            if len(rows) == 0:
+                return []
+
+            scores = self.__vectors[rows] @ query
+            # Best chunk per document: sort by score, keep the first row of every owner
+            order = np.argsort(-scores, kind="stable")
+            _, first = np.unique(owners[order], return_index=True)
+            best = order[np.sort(first)][:k]
+            return [(self.__document_ids[owners[i]], float(scores[i])) for i in best]
+
+    def __reserve(self, count: int, dimensions: int) -> None:
+        if self.__vectors is None:
+            self.__vectors = np.empty((max(count, 1024), dimensions), dtype=self.dtype)
+            self.__row_live = np.zeros(len(self.__vectors), dtype=bool)
+        elif self.__vectors.shape[1] != dimensions:
+            raise ValueError(f"Expected vectors of {self.__vectors.shape[1]} dimensions, got {dimensions}")
+
+        needed = self.__size + count
+        if needed > len(self.__vectors):
+            # Grow geometrically so appends stay amortized O(1)
+            capacity = max(needed, 2 * len(self.__vectors))
+            vectors = np.empty((capacity, dimensions), dtype=self.dtype)
+            vectors[:self.__size] = self.__vectors[:self.__size]
+            live = np.zeros(capacity, dtype=bool)
+            live[:self.__size] = self.__row_live[:self.__size]
+            self.__vectors, self.__row_live = vectors, live
+
+    def __assign(self, vectors: np.ndarray) -> np.ndarray:
+        return self.__nearest(vectors, self.__centroids)
+
+    @staticmethod
+    def __nearest(vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+        # Batched so the similarity matrix stays small for large inputs
+        return np.concatenate([
+            np.argmax(vectors[i:i + batch_size] @ centroids.T, axis=1)
+            for i in range(0, len(vectors), batch_size)
+        ])
+
+    @staticmethod
+    def __normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+
+class AzureSearchVectorIndex(VectorIndex):
+    """
+    Vector index stored in Azure AI Search. Every chunk is one search document with
+    ``id``, ``document_id``, ``chunk`` and ``vector`` fields.
+    """
+    def __init__(self, index_name: Optional[str] = None):
+        from azure.core.credentials import AzureKeyCredential
+        from azure.search.documents import SearchClient
+
+        self.logger = Logger(self.__class__.__name__)
+        settings = azure_settings.embedding
+        self.__client = SearchClient(
+            endpoint=settings.azure_search_endpoint,
+            index_name=index_name or settings.azure_search_index_name,
+            credential=AzureKeyCredential(settings.azure_search_api_key),
+        )
+
+    def add(self, document_id: str, vectors: np.ndarray, metadata: Optional[Dict[str, Any]] = None) -> None:
+        self.remove(document_id)
+        documents = [
+            {
+                "id": f"{document_id}-{chunk}",
+                "document_id": document_id,
+                "chunk": chunk,
+                "vector": vector.tolist(),
+                **(metadata or {}),
+            }
+            for chunk, vector in enumerate(np.atleast_2d(vectors))
+        ]
+        self.__client.upload_documents(documents=documents)
+
+    def remove(self, document_id: str) -> bool:
+        results = self.__client.search(search_text="*", filter=f"document_id eq '{document_id}'", select=["id"])
+        keys = [{"id": result["id"]} for result in results]
+        if keys:
+            self.__client.delete_documents(documents=keys)
+        return bool(keys)
+
+    def search(
+        self, vector: np.ndarray, k: int = 10, document_ids: Optional[Set[str]] = None
+    ) -> List[Tuple[str, float]]:
+        from azure.search.documents.models import VectorizedQuery
+
+        odata_filter = None
+        if document_ids is not None:
+            odata_filter = f"search.in(document_id, '{','.join(document_ids)}', ',')"
+        results = self.__client.search(
+            search_text=None,
+            vector_queries=[VectorizedQuery(vector=np.asarray(vector).tolist(), k_nearest_neighbors=k * 4, fields="vector")],
+            filter=odata_filter,
+            select=["document_id"],
+        )
+        best: Dict[str, float] = {}
+        for result in results:
+            best.setdefault(result["document_id"], result["@search.score"])
+        return sorted(best.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def create_vector_index() -> VectorIndex:
+    """
+    Create the vector index configured by ``vector_index_backend`` in the settings.
+    """
+    backend = azure_settings.embedding.vector_index_backend
+    if backend == "local":
+        return IVFVectorIndex()
+    if backend == "azure_search":
+        return AzureSearchVectorIndex()
+    raise InvalidConfigException(
+        r"Invalid settings for vector index. Please choose between 'local' or 'azure_search' only"
+    )
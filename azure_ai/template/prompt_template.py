@@ -224,4 +224,31 @@ The tables follow contain information of entities.
 The output should follow the example format, containing only the structured Pydantic data. Avoid including Python class definitions, import statements, FieldInfo, or FieldInfoList.
 Use only English/alphabetic characters for the output, and refer to any comments in the Pydantic Object for additional context. If a field's value is not present in the image, set that field as "None" without making inferences from other fields.
 Please keep the response in the specified Pydantic Object format with all fields, not JSON format.
-'''
\ No newline at end of file
+'''
+
+    # System prompt of the GPT extraction, {{$type_prompt}} is replaced with the TemplatePromptBody of the page.
+    # Every page follows as its image, then the text Document Intelligence read from it
+    EXTRACTION_PROMPT = '''
+The user sends the image of a page of a tax form, followed by the text Document Intelligence read from it (markdown, tables included).
+Read the layout from the image and the exact values from the text.
+{{$type_prompt}}
+'''
+
+
+class TemplatePromptBody:
+    """
+    Extraction instructions of every type prompt, inserted into ``PromptTemplate.EXTRACTION_PROMPT``.
+
+    The document type specific bodies are not part of this repository, every TYPEn_PROMPT
+    uses the one tier mapping prompt and NO_TYPE_PROMPT the full prompt with the tier
+    instructions, which is what the cascade routes multi tier and unknown pages to.
+    """
+    NO_TYPE_PROMPT = PromptTemplate.FALLBACK_CASE_OTHER_TYPE
+    TYPE1_PROMPT = PromptTemplate.MAPPING_INFO_TEMPLATE
+    TYPE2_PROMPT = PromptTemplate.MAPPING_INFO_TEMPLATE
+    TYPE3_PROMPT = PromptTemplate.MAPPING_INFO_TEMPLATE
+    TYPE4_PROMPT = PromptTemplate.MAPPING_INFO_TEMPLATE
+    TYPE5_PROMPT = PromptTemplate.MAPPING_INFO_TEMPLATE
+    TYPE6_PROMPT = PromptTemplate.MAPPING_INFO_TEMPLATE
+    TYPE7_PROMPT = PromptTemplate.MAPPING_INFO_TEMPLATE
+    TYPE8_PROMPT = PromptTemplate.MAPPING_INFO_TEMPLATE
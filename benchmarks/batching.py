@@ -0,0 +1,145 @@
+"""
+Per-page GPT requests against batched requests (several pages of a document in one).
+
+Builds short CVs of ``--pages`` pages out of the pages of ``CV samples/`` and runs them
+through ``IngestionPipeline`` twice against the local Azure stand-in
+(``benchmarks.mock_azure``): once with one GPT request per page, once with
+``batch_max_pages`` set to the page count. Reports GPT requests, prompt, cached and
+completion tokens with their cost (``ledger`` prices), and the wall time of each run.
+
+The stand-in answers a request with N images with N recorded answers, estimates usage
+from the request and adds ``--chat-token-latency`` seconds per completion token, so
+batched answers take longer to generate like they would on the real service.
+
+``--clients`` picks the clients like in ``benchmarks.ingestion``: ``http`` (default)
+runs without the Azure SDKs, ``sdk`` runs the default ``IngestionPipeline`` clients so
+batches go through ``AzureOpenAIChatBackend.generate_description_batch``.
+
+Usage:
+    python -m benchmarks.batching [--documents 12] [--pages 3] [--time-scale 0.1] [--clients http]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from benchmarks.ingestion import CONTAINER_NAME, HttpBlobHandler, HttpChatBackend, HttpDocumentIntelligence, _HttpClient
+from benchmarks.mock_azure import MockAzureServer, add_arguments, state_from_arguments
+
+
+def build_documents(corpus_dir: Path, count: int, pages: int, directory: Path) -> List[Path]:
+    """Documents of ``pages`` pages, made of consecutive pages of the corpus."""
+    import fitz
+
+    sources = sorted(corpus_dir.rglob("*.pdf"))
+    paths = []
+    for number in range(count):
+        document = fitz.open()
+        for page in range(pages):
+            with fitz.open(sources[(number * pages + page) % len(sources)]) as source:
+                document.insert_pdf(source, from_page=0, to_page=0)
+        path = directory / f"cv-{number}.pdf"
+        document.save(path)
+        document.close()
+        paths.append(path)
+    return paths
+
+
+def run(args: argparse.Namespace, paths: List[Path], batch_max_pages: int, directory: Path, port: int = 0) -> Dict[str, Any]:
+    with MockAzureServer(state_from_arguments(args), port=port) as server:
+        environment = {
+            "LOGGING_LEVEL": "WARNING",
+            "LOGGING_MODE": "stream",
+            "LOGGING_FILE_PATH": str(directory / "benchmark.log"),
+            "PDF_PROCESSOR_DPI": "100",
+            "PDF_PROCESSOR_THREAD_COUNT": "1",
+            "BLOB_CONTAINER_NAME": CONTAINER_NAME,
+            "VALID_FILE_TYPE": '["application/pdf"]',
+            **server.connection_settings(),
+        }
+        for name, value in environment.items():
+            os.environ.setdefault(name, value)
+
+        from azure_ai.ledger.ledger import UsageLedger
+        from azure_ai.pipeline.pipeline import IngestionPipeline
+
+        ledger = UsageLedger(str(directory / f"usage-{batch_max_pages}.sqlite3"))
+        pages = []
+        if args.clients == "http":
+            client = _HttpClient(server.url)
+
+            class BenchmarkPipeline(IngestionPipeline):
+                def sign_blob_url(self, blob_name: str, blob_url: str) -> str:
+                    # Signing needs the Azure SDK, the stand-in does not check SAS tokens
+                    return f"{blob_url}?sig=benchmark"
+
+            pipeline = BenchmarkPipeline(
+                on_page=pages.append,
+                container_name=CONTAINER_NAME,
+                blob_handler=HttpBlobHandler(client, server.url),
+                di_handler=HttpDocumentIntelligence(client),
+                chat_backend_factory=lambda: HttpChatBackend(client),
+                usage_ledger=ledger,
+                batch_max_pages=batch_max_pages,
+            )
+        else:
+            pipeline = IngestionPipeline(
+                on_page=pages.append,
+                container_name=CONTAINER_NAME,
+                usage_ledger=ledger,
+                batch_max_pages=batch_max_pages,
+            )
+        started = time.perf_counter()
+        pipeline.run(paths)
+        elapsed = time.perf_counter() - started
+
+        totals = list(ledger.totals().values())
+        ledger.close()
+        prompt_tokens = sum(total.prompt_tokens for total in totals)
+        cached_tokens = sum(total.cached_tokens for total in totals)
+        completion_tokens = sum(total.completion_tokens for total in totals)
+        return {
+            "requests": server.summary()["chat"]["requests"],
+            "pages": sum(1 for page in pages if page.extraction),
+            "prompt": prompt_tokens,
+            "cached": cached_tokens,
+            "completion": completion_tokens,
+            "cost": ledger.cost(prompt_tokens, cached_tokens, completion_tokens),
+            "seconds": elapsed,
+            "port": server.server_address[1],
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, default=ROOT_DIR / "CV samples")
+    parser.add_argument("--documents", type=int, default=12, help="Number of documents")
+    parser.add_argument("--pages", type=int, default=3, help="Pages per document")
+    parser.add_argument("--clients", choices=["http", "sdk"], default="http")
+    add_arguments(parser)
+    parser.set_defaults(chat_token_latency=0.01, seed=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = build_documents(args.corpus, args.documents, args.pages, Path(directory))
+        results = {"per page": run(args, paths, 1, Path(directory))}
+        # The settings of the SDK clients are read once, the second stand-in listens on the same port
+        results["batched"] = run(args, paths, args.pages, Path(directory), port=results["per page"]["port"])
+
+    print(f"{args.documents} documents of {args.pages} pages")
+    print(f"{'mode':<10}{'requests':>10}{'pages':>8}{'prompt':>10}{'cached':>10}{'completion':>12}{'cost $':>10}{'wall s':>8}")
+    for mode, result in results.items():
+        print(
+            f"{mode:<10}{result['requests']:>10}{result['pages']:>8}{result['prompt']:>10,}{result['cached']:>10,}"
+            f"{result['completion']:>12,}{result['cost']:>10.4f}{result['seconds']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
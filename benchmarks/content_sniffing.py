@@ -0,0 +1,75 @@
+"""
+Throughput of upload validation: whole-file content sniffing versus header-only sniffing.
+
+Writes large PDF files (a CV sample padded to ``--size-mb``) to a temporary directory
+and validates them with both approaches, optionally from several threads:
+
+- full: read the whole file and pass it to ``magic.from_buffer``, as uploads did before
+- header: ``FileValidator.validate`` on the path, reading only ``SNIFF_BYTES``
+
+Usage:
+    python -m benchmarks.content_sniffing [--files 20] [--size-mb 50] [--threads 1 4] [--rounds 3]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from utils.file_validator import FileValidator
+
+
+def write_files(directory: Path, count: int, size_mb: int) -> List[Path]:
+    sample = next((ROOT_DIR / "CV samples").rglob("*.pdf")).read_bytes()
+    padding = b"\n%" + b"0" * (size_mb * 1024 * 1024 - len(sample))
+    paths = []
+    for number in range(count):
+        path = directory / f"large-{number}.pdf"
+        path.write_bytes(sample + padding)
+        paths.append(path)
+    return paths
+
+
+def sniff_full(path: Path) -> str:
+    import magic
+
+    return magic.from_buffer(path.read_bytes(), mime=True)
+
+
+def measure(check: Callable[[Path], str], paths: List[Path], threads: int, rounds: int) -> float:
+    best = float("inf")
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for _ in range(rounds):
+            started = time.perf_counter()
+            results = list(executor.map(check, paths))
+            best = min(best, time.perf_counter() - started)
+    assert all(results), "every file should be accepted"
+    return len(paths) / best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20, help="Number of files")
+    parser.add_argument("--size-mb", type=int, default=50, help="Size of every file in MB")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4], help="Validation threads")
+    parser.add_argument("--rounds", type=int, default=3, help="Rounds per measurement, the best one is kept")
+    args = parser.parse_args()
+
+    validator = FileValidator(valid_file_types=["pdf"])
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_files(Path(directory), args.files, args.size_mb)
+        print(f"{args.files} files of {args.size_mb} MB")
+        print(f"{'threads':>7} {'full files/s':>13} {'header files/s':>15} {'speedup':>8}")
+        for threads in args.threads:
+            full = measure(sniff_full, paths, threads, args.rounds)
+            header = measure(validator.validate, paths, threads, args.rounds)
+            print(f"{threads:>7} {full:>13.1f} {header:>15.1f} {header / full:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Import-time budget check.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter for each
+entry point, and fails (exit code 1) when an entry point exceeds its cumulative
+import budget or pulls in a module that must stay lazy.
+
+Usage:
+    python -m benchmarks.import_time [--repeat 5] [--scale 1.0]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+
+@dataclass
+class ImportBudget:
+    module: str
+    budget_ms: float
+    # Top-level packages that must not be imported by ``module``
+    forbidden: List[str] = field(default_factory=list)
+
+
+BUDGETS = [
+    ImportBudget("settings.settings", 60, ["pydantic_settings", "pydantic"]),
+    ImportBudget("utils", 60, ["azure", "magic", "pydantic_settings"]),
+    ImportBudget("azure_ai.azure_openai", 60, ["semantic_kernel", "langchain_openai", "requests"]),
+    ImportBudget("azure_ai.blob_handler", 60, ["azure"]),
+    ImportBudget(
+        "azure_ai.azure_openai.azure_openai",
+        150,
+        ["semantic_kernel", "nest_asyncio", "requests", "langchain", "unstructured", "ragas", "pandas"],
+    ),
+]
+
+
+def measure_import(module: str) -> Tuple[float, Dict[str, float], str]:
+    """Import ``module`` in a fresh interpreter with ``-X importtime``.
+
+    Args:
+        module (str): Dotted module name to import
+
+    Returns:
+        Tuple[float, Dict[str, float], str]: Cumulative import time of ``module`` in ms,
+            cumulative time (ms) for every imported module, and stderr of the child if it failed
+    """
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+    imported: Dict[str, float] = {}
+    error_lines = []
+    for line in process.stderr.splitlines():
+        # Format: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:"):
+            error_lines.append(line)
+            continue
+        if "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        imported[name.strip()] = int(cumulative) / 1000
+
+    error = "\n".join(error_lines) if process.returncode != 0 else ""
+    return imported.get(module, 0.0), imported, error
+
+
+def check_budget(budget: ImportBudget, repeat: int, scale: float) -> List[str]:
+    """Measure ``budget.module`` ``repeat`` times and return the list of violations."""
+    timings = []
+    imported: Dict[str, float] = {}
+    for _ in range(repeat):
+        elapsed_ms, imported, error = measure_import(budget.module)
+        if error:
+            return [f"{budget.module}: import failed\n{error}"]
+        if budget.module not in imported:
+            # A budget that measured nothing would pass silently
+            return [f"{budget.module}: not found in the -X importtime output"]
+        timings.append(elapsed_ms)
+
+    # The fastest run is the least noisy estimate of the real cost
+    best_ms = min(timings)
+    limit_ms = budget.budget_ms * scale
+    print(f"{budget.module:<40} {best_ms:8.1f} ms (budget {limit_ms:.0f} ms)")
+
+    violations = []
+    if best_ms > limit_ms:
+        violations.append(f"{budget.module}: {best_ms:.1f} ms exceeds budget of {limit_ms:.0f} ms")
+
+    for name in imported:
+        top_level = name.split(".")[0]
+        if top_level in budget.forbidden:
+            violations.append(f"{budget.module}: eagerly imports '{name}'")
+            break
+    return violations
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Number of fresh interpreters per module")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for every budget, e.g. for slow CI machines")
+    parser.add_argument("modules", nargs="*", help="Only check these modules")
+    args = parser.parse_args()
+
+    unknown = set(args.modules) - {budget.module for budget in BUDGETS}
+    if unknown:
+        parser.error(f"no budget for {', '.join(sorted(unknown))}")
+    budgets = [budget for budget in BUDGETS if not args.modules or budget.module in args.modules]
+    violations = []
+    for budget in budgets:
+        violations.extend(check_budget(budget, args.repeat, args.scale))
+
+    for violation in violations:
+        print(f"FAIL {violation}", file=sys.stderr)
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
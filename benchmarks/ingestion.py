@@ -0,0 +1,271 @@
+"""
+End to end ingestion benchmark against the local Azure stand-in (``benchmarks.mock_azure``).
+
+Runs every PDF of ``CV samples/`` through ``IngestionPipeline`` (validate, upload,
+split, upload pages, Document Intelligence, GPT, parse) while the three services
+answer with recorded responses, configurable latency and injected 429s. Reports
+documents/sec, pages/sec, p50/p95/p99 of every stage, the requests and 429s seen by
+every service, and the peak RSS of the process.
+
+Clients:
+
+- ``http`` (default): minimal stdlib HTTP clients with the same interface as the
+  handlers, retrying 429s after ``Retry-After``. Runs without the Azure SDKs.
+- ``sdk``: the default ``IngestionPipeline`` clients (``AzureBlobStorageHandler``,
+  ``AzureDocumentIntelligenceHandler`` and ``AzureOpenAIChatBackend``, i.e.
+  semantic_kernel's ``AzureChatCompletion``) configured from
+  ``MockAzureServer.connection_settings()``, to include the SDK overhead. Needs the
+  Azure SDKs installed. langchain's ``AzureChatOpenAI`` is not used by the pipeline
+  and is not replayed here.
+
+Usage:
+    python -m benchmarks.ingestion [--copies 4] [--time-scale 0.1] [--chat-throttle 0.05] [--clients http]
+"""
+import argparse
+import http.client
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from benchmarks.mock_azure import ACCOUNT_NAME, MockAzureServer, add_arguments, state_from_arguments
+from azure_ai.azure_openai.batching import BATCH_INSTRUCTION, PAGE_MARKER
+
+CONTAINER_NAME = "benchmark"
+# Stand-in for the extraction prompt, the real one is about this long
+SYSTEM_PROMPT = "Extract the main information and every entity of the form as Pydantic objects. " * 60
+
+
+class _HttpClient:
+    """
+    Keep-alive connection per thread, 429 answers are retried after their ``Retry-After``.
+    """
+    def __init__(self, base_url: str, max_retries: int = 5):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port
+        self.max_retries = max_retries
+        self.retries = 0
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+
+    def request(self, method: str, path: str, body: bytes = b"", headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        for attempt in range(self.max_retries + 1):
+            status, response_headers, content = self.__send(method, path, body, headers or {})
+            if status != 429 or attempt == self.max_retries:
+                return status, response_headers, content
+            with self.__lock:
+                self.retries += 1
+            time.sleep(float(response_headers.get("retry-after", "1")))
+        return status, response_headers, content
+
+    def __send(self, method: str, path: str, body: bytes, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        connection = getattr(self.__local, "connection", None)
+        if connection is None:
+            connection = self.__local.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            content = response.read()
+        except (http.client.HTTPException, ConnectionError):
+            # The server closed the kept-alive connection, reconnect once
+            connection.close()
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            content = response.read()
+        return response.status, {name.lower(): value for name, value in response.getheaders()}, content
+
+
+class HttpBlobHandler:
+    def __init__(self, client: _HttpClient, base_url: str):
+        self.client = client
+        self.base_url = base_url
+
+    def upload_blob_file(self, blob_name: str, container_name: str, content: str | bytes, extension: str = "txt", skip_if_existed: bool = False, **kwargs) -> str | None:
+        path = f"/{ACCOUNT_NAME}/{container_name}/{blob_name}.{extension}"
+        if skip_if_existed and self.client.request("HEAD", path)[0] == 200:
+            return self.base_url + path
+        data = content if isinstance(content, bytes) else str(content).encode("utf-8")
+        status, _, _ = self.client.request("PUT", path, data, {"x-ms-blob-type": "BlockBlob", "Content-Type": "application/octet-stream"})
+        return self.base_url + path if status == 201 else None
+
+    def download_blob_bytes(self, blob_name: str, container_name: str) -> bytes | None:
+        status, _, content = self.client.request("GET", f"/{ACCOUNT_NAME}/{container_name}/{blob_name}")
+        return content if status == 200 else None
+
+
+class HttpDocumentIntelligence:
+    def __init__(self, client: _HttpClient, model_id: str = "prebuilt-layout", poll_interval: float = 0.05):
+        self.client = client
+        self.model_id = model_id
+        self.poll_interval = poll_interval
+
+    def analyze_document(self, document_bytes: Optional[bytes] = None, document_url: Optional[str] = None, **kwargs) -> Any | None:
+        body = json.dumps({"urlSource": document_url} if document_url else {"base64Source": ""}).encode()
+        status, headers, _ = self.client.request(
+            "POST",
+            f"/documentintelligence/documentModels/{self.model_id}:analyze?api-version=2024-02-29-preview&outputContentFormat=markdown",
+            body,
+            {"Content-Type": "application/json"},
+        )
+        if status != 202:
+            return None
+        location = urlsplit(headers["operation-location"])
+        while True:
+            status, _, content = self.client.request("GET", f"{location.path}?{location.query}")
+            if status != 200:
+                return None
+            operation = json.loads(content)
+            if operation["status"] == "succeeded":
+                result = operation["analyzeResult"]
+                return SimpleNamespace(
+                    content=result["content"],
+                    pages=result.get("pages", []),
+                    tables=result.get("tables", []),
+                    paragraphs=result.get("paragraphs", []),
+                )
+            time.sleep(self.poll_interval)
+
+
+class ChatResult(str):
+    """Text of the answer, with the response metadata like a semantic_kernel result."""
+    metadata: Dict[str, Any]
+
+
+class HttpChatBackend:
+    def __init__(self, client: _HttpClient, deployment: str = "gpt-4o"):
+        self.client = client
+        self.deployment = deployment
+
+    def generate_description(self, encoded_image: str, file_context: str = "", type_prompt_template: str = "", is_long_output: bool = False):
+        return self.__complete([
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": [{"type": "image_url", "image_url": {"url": encoded_image}}]},
+            {"role": "user", "content": file_context or ""},
+        ])
+
+    def generate_description_batch(self, encoded_images: List[str], file_contexts: List[str], type_prompt_template: str = ""):
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        for number, (url, file_context) in enumerate(zip(encoded_images, file_contexts), start=1):
+            messages.append({"role": "user", "content": [
+                {"type": "text", "text": PAGE_MARKER.format(number=number)},
+                {"type": "image_url", "image_url": {"url": url}},
+                {"type": "text", "text": file_context or ""},
+            ]})
+        messages.append({"role": "system", "content": BATCH_INSTRUCTION.format(count=len(encoded_images))})
+        return self.__complete(messages)
+
+    def __complete(self, messages: List[Dict[str, Any]]):
+        body = json.dumps({"messages": messages, "max_tokens": 4095, "temperature": 0, "top_p": 0.95}).encode()
+        status, _, content = self.client.request(
+            "POST",
+            f"/openai/deployments/{self.deployment}/chat/completions?api-version=2024-06-01",
+            body,
+            {"Content-Type": "application/json"},
+        )
+        if status != 200:
+            return None, "NO_TYPE_PROMPT", None
+        response = json.loads(content)
+        result = ChatResult(response["choices"][0]["message"]["content"])
+        result.metadata = {"usage": response.get("usage"), "finish_reason": response["choices"][0].get("finish_reason")}
+        return result, "NO_TYPE_PROMPT", None
+
+
+def load_corpus(corpus_dir: Path, copies: int, directory: Path) -> List[Path]:
+    """Copies get a distinct trailing PDF comment, so they hash and upload as new documents."""
+    paths = []
+    for copy in range(copies):
+        for source in sorted(corpus_dir.rglob("*.pdf")):
+            target = directory / f"{copy}-{source.name}"
+            target.write_bytes(source.read_bytes() + f"\n%benchmark copy {copy}\n".encode())
+            paths.append(target)
+    return paths
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, default=ROOT_DIR / "CV samples")
+    parser.add_argument("--copies", type=int, default=1, help="Repeat the corpus to get a measurable amount of work")
+    parser.add_argument("--clients", choices=["http", "sdk"], default="http")
+    parser.add_argument("--dpi", type=int, default=100, help="Resolution of the rendered pages")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    with MockAzureServer(state_from_arguments(args)) as server, tempfile.TemporaryDirectory() as directory:
+        environment = {
+            "LOGGING_LEVEL": "WARNING",
+            "LOGGING_MODE": "stream",
+            "LOGGING_FILE_PATH": str(Path(directory) / "benchmark.log"),
+            "PDF_PROCESSOR_DPI": str(args.dpi),
+            "PDF_PROCESSOR_THREAD_COUNT": "1",
+            "BLOB_CONTAINER_NAME": CONTAINER_NAME,
+            "VALID_FILE_TYPE": '["application/pdf"]',
+            **server.connection_settings(),
+        }
+        for name, value in environment.items():
+            os.environ.setdefault(name, value)
+
+        from azure_ai.pipeline.pipeline import IngestionPipeline
+
+        pages = []
+        if args.clients == "http":
+            client = _HttpClient(server.url)
+
+            class BenchmarkPipeline(IngestionPipeline):
+                def sign_blob_url(self, blob_name: str, blob_url: str) -> str:
+                    # Signing needs the Azure SDK, the stand-in does not check SAS tokens
+                    return f"{blob_url}?sig=benchmark"
+
+            pipeline = BenchmarkPipeline(
+                on_page=pages.append,
+                container_name=CONTAINER_NAME,
+                blob_handler=HttpBlobHandler(client, server.url),
+                di_handler=HttpDocumentIntelligence(client),
+                chat_backend_factory=lambda: HttpChatBackend(client),
+            )
+        else:
+            client = None
+            pipeline = IngestionPipeline(on_page=pages.append, container_name=CONTAINER_NAME)
+
+        paths = load_corpus(args.corpus, args.copies, Path(directory))
+        started = time.perf_counter()
+        stats = pipeline.run(paths)
+        elapsed = time.perf_counter() - started
+
+        documents = len({page.document_hash for page in pages})
+        print(f"{len(paths)} documents, {len(pages)} pages extracted in {elapsed:.2f}s with {args.clients} clients")
+        print(f"{len(paths) / elapsed:.2f} docs/s, {len(pages) / elapsed:.2f} pages/s, {documents} documents with extracted pages")
+        print(f"peak RSS {peak_rss_mb():.0f} MB")
+        print()
+        print(f"{'stage':<14}{'processed':>10}{'failed':>8}{'dropped':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'util':>8}")
+        for name, stage in stats.items():
+            print(
+                f"{name:<14}{stage['processed']:>10}{stage['failed']:>8}{stage['dropped']:>8}"
+                f"{stage['p50_seconds'] * 1000:>10.1f}{stage['p95_seconds'] * 1000:>10.1f}{stage['p99_seconds'] * 1000:>10.1f}"
+                f"{stage['utilization']:>8.2f}"
+            )
+        print()
+        print(f"{'service':<14}{'requests':>10}{'429s':>8}{'MB in':>10}{'MB out':>10}")
+        for name, service in server.summary().items():
+            print(f"{name:<14}{service['requests']:>10}{service['throttled']:>8}{service['bytes_in'] / 1e6:>10.2f}{service['bytes_out'] / 1e6:>10.2f}")
+        if client is not None:
+            print(f"client retries after 429: {client.retries}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Throughput of the structured (JSON) log path.
+
+Measures events/sec of:
+
+- serializer: the previous ``custom_json_serializer`` (dict copy + ``json.dumps``) against
+  the current one with the json backend and, when installed, the orjson backend
+- JsonLogger: a full ``JsonLogger.info`` call through structlog into a stream handler
+  writing to an in-memory buffer, so only the CPU cost of the log path is measured
+
+Usage:
+    python -m benchmarks.json_logging [--events 100000]
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("LOGGING_LEVEL", "INFO")
+os.environ.setdefault("LOGGING_MODE", "stream")
+os.environ.setdefault("LOGGING_FILE_PATH", "logs/benchmark.log")
+# Measure the log path itself, not the hand off to the background thread
+os.environ.setdefault("LOGGING_ASYNC", "false")
+
+from structlog.processors import _json_fallback_handler
+import settings.custom_json_logger as custom_json_logger
+
+
+def previous_serializer(dic, **kw):
+    mod = {}
+    if "event" in dic:
+        mod["level"] = dic["level"]
+        mod["timestamp"] = dic["timestamp"]
+        mod["logger"] = dic["logger"]
+        try:
+            mod["request_id"] = dic["request_id"]
+        except:
+            mod["request_id"] = None
+
+        mod["message"] = dic["event"]
+
+        try:
+            mod["request_type"] = dic["request_type"]
+        except:
+            pass
+
+    for k in dic:
+        if k != "event":
+            mod[k] = dic[k]
+    return json.dumps(mod, **kw)
+
+
+def event(i: int) -> dict:
+    return {
+        "event": "Extracted page",
+        "level": 20,
+        "logger": "IngestionPipeline",
+        "timestamp": "2026-01-01T00:00:00.000000Z",
+        "request_type": "extraction",
+        "document_hash": "0f" * 20,
+        "page": i,
+        "prompt_tokens": 1234,
+        "completion_tokens": 567,
+    }
+
+
+def events_per_second(serialize: Callable[..., str], events: int) -> float:
+    # The serializer consumes the event dict, build them outside the measurement
+    batch = [event(i) for i in range(events)]
+    started = time.perf_counter()
+    for dic in batch:
+        serialize(dic, default=_json_fallback_handler)
+    return events / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=100000, help="Events per measurement")
+    args = parser.parse_args()
+
+    backends = {"json": custom_json_logger._json_dumps}
+    try:
+        import orjson  # noqa: F401
+        backends["orjson"] = custom_json_logger._orjson_dumps
+    except ImportError:
+        print("orjson is not installed, skipping its backend")
+
+    print(f"{'previous serializer':<24}{events_per_second(previous_serializer, args.events):>16,.0f} events/s")
+    for backend, dumps in backends.items():
+        custom_json_logger._dumps = dumps
+        rate = events_per_second(custom_json_logger.custom_json_serializer, args.events)
+        print(f"{'serializer ' + backend:<24}{rate:>16,.0f} events/s")
+
+    custom_json_logger._dumps = None
+    logger = custom_json_logger.JsonLogger("benchmark")
+    buffer = io.StringIO()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.StreamHandler):
+            handler.setStream(buffer)
+    started = time.perf_counter()
+    for i in range(args.events):
+        logger.info("Extracted page", request_type="extraction", document_hash="0f" * 20, page=i)
+    elapsed = time.perf_counter() - started
+    print(f"{'JsonLogger.info':<24}{args.events / elapsed:>16,.0f} events/s ({len(buffer.getvalue()) / args.events:.0f} bytes/event)")
+
+
+if __name__ == "__main__":
+    main()
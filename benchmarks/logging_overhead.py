@@ -0,0 +1,101 @@
+"""
+Cost of a logging call on the calling thread.
+
+Compares, per call:
+
+- sync: ``FileHandler`` attached to the logger, I/O on the calling thread
+- async: ``BoundedQueueHandler`` feeding a ``QueueListener`` that owns the ``FileHandler``
+- disabled: a DEBUG call on a logger at INFO, built with an f-string or with lazy arguments
+
+``--sink-latency-us`` adds a delay to every write, to emulate a slow disk or network share.
+
+Usage:
+    python -m benchmarks.logging_overhead [--calls 100000] [--threads 1 4] [--sink-latency-us 0]
+"""
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from settings.log_queue import BoundedQueueHandler, _Listener
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+METADATA = {"usage": {"prompt_tokens": 1234, "completion_tokens": 567}, "model": "gpt-4o", "id": "x" * 40}
+
+
+class SlowFileHandler(logging.FileHandler):
+    def __init__(self, path: Path, latency_seconds: float):
+        super().__init__(path)
+        self.latency_seconds = latency_seconds
+
+    def emit(self, record: logging.LogRecord) -> None:
+        super().emit(record)
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+
+def file_handler(path: Path, latency_seconds: float) -> logging.Handler:
+    handler = SlowFileHandler(path, latency_seconds)
+    handler.setFormatter(logging.Formatter(FORMAT))
+    return handler
+
+
+def make_logger(name: str, handler: logging.Handler, level: int = logging.DEBUG) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.setLevel(level)
+    logger.addHandler(handler)
+    return logger
+
+
+def per_call_us(log: Callable[[int], None], calls: int, threads: int) -> float:
+    per_thread = calls // threads
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda _: [log(i) for i in range(per_thread)], range(threads)))
+    return (time.perf_counter() - started) / (per_thread * threads) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100000, help="Logging calls per measurement")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4], help="Calling threads")
+    parser.add_argument("--sink-latency-us", type=float, default=0, help="Extra latency of every write")
+    args = parser.parse_args()
+
+    latency = args.sink_latency_us / 1e6
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        sync_logger = make_logger("bench.sync", file_handler(directory / "sync.log", latency))
+        queue_handler = BoundedQueueHandler(maxsize=args.calls * 2, policy="block")
+        listener = _Listener(queue_handler.queue, file_handler(directory / "async.log", latency))
+        listener.start()
+        async_logger = make_logger("bench.async", queue_handler)
+        disabled_logger = make_logger("bench.disabled", queue_handler, level=logging.INFO)
+
+        cases = {
+            "sync file": lambda i: sync_logger.debug("METADATA: %s %d", METADATA, i),
+            "async queue": lambda i: async_logger.debug("METADATA: %s %d", METADATA, i),
+            "disabled f-string": lambda i: disabled_logger.debug(f"METADATA: {METADATA} {i}"),
+            "disabled lazy args": lambda i: disabled_logger.debug("METADATA: %s %d", METADATA, i),
+        }
+        print(f"{'case':<20}" + "".join(f"{f'{threads} thread(s) us/call':>24}" for threads in args.threads))
+        for name, log in cases.items():
+            row = [per_call_us(log, args.calls, threads) for threads in args.threads]
+            print(f"{name:<20}" + "".join(f"{value:>24.2f}" for value in row))
+
+        started = time.perf_counter()
+        listener.stop()
+        print(f"listener drained the remaining records in {time.perf_counter() - started:.2f}s, dropped {queue_handler.dropped}")
+
+
+if __name__ == "__main__":
+    main()
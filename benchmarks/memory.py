@@ -0,0 +1,114 @@
+"""
+Memory held by the parsed extractions of large multi-tier documents.
+
+Builds GPT answers like those of a withholding statement with several tiers of
+partners (``--pages`` pages of ``--entities`` entities, every entity with its
+ParentName, tier ownership and a few repeated EntityType/Chapter4Status/Country
+values), parses them with ``ResponseParser`` and keeps the result of every page the
+way a document is held until it is saved:
+
+- ``pydantic``: the ``MainInformation`` objects
+- ``dict``: their ``model_dump()``, what the pipeline kept before
+- ``compact``: ``CompactExtraction``, what the pipeline keeps now
+
+Reports the memory still allocated once every page is parsed (tracemalloc), the peak
+while parsing, and the time to parse and convert.
+
+Usage:
+    python -m benchmarks.memory [--documents 2] [--pages 20] [--entities 500] [--tiers 3]
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from azure_ai.models.compact import CompactExtraction
+from azure_ai.models.response_parser import ResponseParser
+
+ENTITY_TYPES = ["Partnership", "Individual", "Corporation", "Trust", "Disregarded Entity"]
+CHAPTER4_STATUSES = ["Passive NFFE", "Active NFFE", "Participating FFI", None]
+COUNTRIES = ["US", "Cayman Islands", "Luxembourg", "United Kingdom"]
+
+
+def make_response(document: int, page: int, entities: int, tiers: int) -> str:
+    """GPT answer for one page, entities spread over ``tiers`` levels of ownership."""
+    calls = []
+    for position in range(entities):
+        tier = position % tiers + 1
+        parent = f"Fund {document}" if tier == 1 else f"Partner {document}-{page}-{position - 1}"
+        calls.append(
+            "Entity("
+            f"Name='Partner {document}-{page}-{position}', ParentName='{parent}', "
+            f"AddressLine1='{position} Side Street', City_Town='Springfield', State='DE', "
+            f"Country='{COUNTRIES[position % len(COUNTRIES)]}', ZipCode='19801', FormType='W-8IMY', "
+            f"EntityType='{ENTITY_TYPES[position % len(ENTITY_TYPES)]}', "
+            f"Chapter4Status={CHAPTER4_STATUSES[position % len(CHAPTER4_STATUSES)]!r}, "
+            f"AllocationPercentage='{100 / entities:.4f}', TierOwnershipPercentage='{100 / tiers:.2f}')"
+        )
+    return (
+        f"MainInformation(Date='2024-01-01', Name='Fund {document}', AddressLine1='1 Main Street', "
+        f"City_Town='Wilmington', State='DE', Country='US', FormType='W-8IMY', EntityType='Partnership', "
+        f"EntityList=[{', '.join(calls)}])"
+    )
+
+
+def measure(build: Callable[[str], Any], responses: List[str]) -> Dict[str, float]:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    kept = [build(response) for response in responses]
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert all(extraction is not None for extraction in kept)
+    return {"current": current, "peak": peak, "seconds": elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=2, help="Number of documents")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per document")
+    parser.add_argument("--entities", type=int, default=500, help="Entities per page")
+    parser.add_argument("--tiers", type=int, default=3, help="Levels of ownership")
+    args = parser.parse_args()
+
+    responses = [
+        make_response(document, page, args.entities, args.tiers)
+        for document in range(args.documents)
+        for page in range(args.pages)
+    ]
+    for name, value in {
+        "LOGGING_LEVEL": "WARNING",
+        "LOGGING_MODE": "stream",
+        "LOGGING_FILE_PATH": os.path.join(tempfile.gettempdir(), "benchmark.log"),
+    }.items():
+        os.environ.setdefault(name, value)
+    response_parser = ResponseParser()
+    representations = {
+        "pydantic": response_parser.parse,
+        "dict": lambda response: response_parser.parse(response).model_dump(),
+        "compact": lambda response: CompactExtraction.from_model(response_parser.parse(response)),
+    }
+    results = {name: measure(build, responses) for name, build in representations.items()}
+
+    baseline = results["dict"]["current"]
+    print(f"{len(responses)} pages x {args.entities} entities in {args.tiers} tiers")
+    print(f"{'kept as':<10}{'held MiB':>10}{'vs dict':>9}{'peak MiB':>10}{'parse s':>9}")
+    for name, result in results.items():
+        print(
+            f"{name:<10}{result['current'] / 2**20:>10.1f}{result['current'] / baseline:>8.2f}x"
+            f"{result['peak'] / 2**20:>10.1f}{result['seconds']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+"""
+Local stand-in for Azure OpenAI, Blob Storage and Document Intelligence.
+
+Replays recorded responses (``benchmarks/recordings``) over HTTP so the ingestion path
+can be measured offline. Every service has its own latency distribution and rate of
+injected 429 responses, which carry ``Retry-After`` / ``retry-after-ms`` like the real
+services so the client retry policies are exercised.
+
+Routes:
+
+- ``POST /openai/deployments/<deployment>/chat/completions``: Azure OpenAI chat
+  completions, used by ``AzureChatCompletion`` (semantic_kernel) and ``AzureChatOpenAI``
+  (langchain). The recorded answer is repeated for every image of a request with
+  several, after a ``# Page <n>`` line. Usage is estimated from the request, with the
+  system prompt reported as cached from its second use
+- ``PUT|HEAD|GET|DELETE /<account>/<container>/<blob>``: Put Blob, Get Blob Properties,
+  Get Blob (with ``x-ms-range``) and Delete Blob, blobs are kept in memory
+- ``POST /documentintelligence/documentModels/<model>:analyze`` and ``GET
+  /documentintelligence/documentModels/<model>/analyzeResults/<id>``: long running analyze
+
+Point the SDK clients at it with ``connection_settings``.
+
+Usage:
+    python -m benchmarks.mock_azure [--port 8089] [--chat-latency lognormal:0.8:0.4] [--chat-throttle 0.05]
+"""
+import argparse
+import email.utils
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+RECORDINGS_DIR = Path(__file__).resolve().parent / "recordings"
+# Prompt tokens of a page image, 768x1024 at high detail
+IMAGE_TOKENS = 765
+ACCOUNT_NAME = "devstoreaccount1"
+# Well known key of the storage emulator, only used to sign SAS tokens locally
+ACCOUNT_KEY = "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=="
+SERVICES = ("chat", "blob", "di")
+
+_CHAT_ROUTE = re.compile(r"^/openai/deployments/[^/]+/chat/completions$")
+_ANALYZE_ROUTE = re.compile(r"^/documentintelligence/documentModels/([^/:]+):analyze$")
+_RESULT_ROUTE = re.compile(r"^/documentintelligence/documentModels/([^/]+)/analyzeResults/([^/]+)$")
+
+
+class Latency:
+    """
+    Latency distribution parsed from ``constant:S``, ``uniform:LOW:HIGH`` or
+    ``lognormal:MEDIAN:SIGMA`` (seconds).
+    """
+    def __init__(self, spec: str, time_scale: float = 1.0):
+        kind, *values = spec.split(":")
+        self.kind = kind
+        self.values = [float(value) for value in values]
+        self.time_scale = time_scale
+        expected = {"constant": 1, "uniform": 2, "lognormal": 2}
+        if kind not in expected or len(self.values) != expected[kind]:
+            raise ValueError(f"Invalid latency {spec!r}, use constant:S, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "constant":
+            seconds = self.values[0]
+        elif self.kind == "uniform":
+            seconds = rng.uniform(*self.values)
+        else:
+            median, sigma = self.values
+            seconds = rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return seconds * self.time_scale
+
+
+@dataclass
+class ServiceProfile:
+    latency: Latency
+    throttle_rate: float = 0.0
+    retry_after: float = 1.0
+    # Added per completion token, generation time dominates the latency of long answers
+    token_latency: float = 0.0
+
+
+@dataclass
+class ServiceStats:
+    requests: int = 0
+    throttled: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+
+@dataclass
+class MockState:
+    profiles: Dict[str, ServiceProfile]
+    chat_response: dict
+    analyze_result: dict
+    seed: Optional[int] = None
+    blobs: Dict[str, Tuple[bytes, str, str]] = field(default_factory=dict)
+    operations: Dict[str, str] = field(default_factory=dict)
+    # Hashes of the system prompts seen, for prompt caching
+    prompts: Set[str] = field(default_factory=set)
+    stats: Dict[str, ServiceStats] = field(default_factory=lambda: {name: ServiceStats() for name in SERVICES})
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    rng: random.Random = field(default_factory=random.Random)
+
+    def __post_init__(self):
+        if self.seed is not None:
+            self.rng.seed(self.seed)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "MockAzureServer"
+
+    def log_message(self, format, *args):  # noqa: A002 - signature of BaseHTTPRequestHandler
+        pass
+
+    def do_POST(self):
+        self.__dispatch("POST")
+
+    def do_PUT(self):
+        self.__dispatch("PUT")
+
+    def do_GET(self):
+        self.__dispatch("GET")
+
+    def do_HEAD(self):
+        self.__dispatch("HEAD")
+
+    def do_DELETE(self):
+        self.__dispatch("DELETE")
+
+    def __dispatch(self, method: str) -> None:
+        path = urlsplit(self.path).path
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if _CHAT_ROUTE.match(path):
+            service = "chat"
+        elif path.startswith("/documentintelligence/"):
+            service = "di"
+        else:
+            service = "blob"
+
+        state = self.server.state
+        profile = state.profiles[service]
+        with state.lock:
+            stats = state.stats[service]
+            stats.requests += 1
+            stats.bytes_in += len(body)
+            throttled = state.rng.random() < profile.throttle_rate
+            delay = profile.latency.sample(state.rng)
+            if throttled:
+                stats.throttled += 1
+        if delay:
+            time.sleep(delay)
+        if throttled:
+            self.__send(429, json.dumps({"error": {"code": "429", "message": "Rate limit is exceeded."}}).encode(), {
+                "Content-Type": "application/json",
+                "Retry-After": f"{profile.retry_after:g}",
+                "retry-after-ms": str(int(profile.retry_after * 1000)),
+                "x-ms-error-code": "ServerBusy",
+            }, service)
+            return
+
+        if service == "chat":
+            self.__chat(method, body)
+        elif service == "di":
+            self.__document_intelligence(method, path)
+        else:
+            self.__blob(method, path, body)
+
+    def __chat(self, method: str, body: bytes) -> None:
+        if method != "POST":
+            self.__send(405, b"", {}, "chat")
+            return
+        state = self.server.state
+        images, text_chars, system_chars = 0, 0, 0
+        for message in json.loads(body or b"{}").get("messages", []):
+            content = message.get("content") or ""
+            items = [{"type": "text", "text": content}] if isinstance(content, str) else content
+            for item in items:
+                if item.get("type") == "image_url":
+                    images += 1
+                else:
+                    text_chars += len(item.get("text") or "")
+                    if message.get("role") == "system" and not system_chars:
+                        system_chars = len(item.get("text") or "")
+                        prompt_hash = hashlib.sha1((item.get("text") or "").encode()).hexdigest()
+
+        recorded = state.chat_response
+        answer = recorded["choices"][0]["message"]["content"]
+        pages = max(images, 1)
+        if pages > 1:
+            answer = "\n".join(f"# Page {number}\n{answer}" for number in range(1, pages + 1))
+        cached = 0
+        if system_chars // 4 >= 1024:
+            with state.lock:
+                if prompt_hash in state.prompts:
+                    # Cached in blocks of 128 tokens
+                    cached = system_chars // 4 // 128 * 128
+                state.prompts.add(prompt_hash)
+        prompt_tokens = text_chars // 4 + images * IMAGE_TOKENS
+        completion_tokens = recorded["usage"]["completion_tokens"] * pages
+        if state.profiles["chat"].token_latency:
+            time.sleep(completion_tokens * state.profiles["chat"].token_latency)
+
+        response = dict(
+            recorded,
+            id=f"chatcmpl-{uuid.uuid4().hex}",
+            created=int(time.time()),
+            choices=[{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": answer}}],
+            usage={
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached},
+            },
+        )
+        self.__send(200, json.dumps(response).encode(), {"Content-Type": "application/json"}, "chat")
+
+    def __document_intelligence(self, method: str, path: str) -> None:
+        state = self.server.state
+        match = _ANALYZE_ROUTE.match(path)
+        if method == "POST" and match:
+            operation_id = uuid.uuid4().hex
+            with state.lock:
+                state.operations[operation_id] = match.group(1)
+            location = f"{self.server.url}/documentintelligence/documentModels/{match.group(1)}/analyzeResults/{operation_id}?api-version=2024-02-29-preview"
+            self.__send(202, b"", {"Operation-Location": location, "apim-request-id": operation_id}, "di")
+            return
+        match = _RESULT_ROUTE.match(path)
+        if method == "GET" and match and match.group(2) in state.operations:
+            now = email.utils.formatdate(usegmt=True)
+            response = {
+                "status": "succeeded",
+                "createdDateTime": now,
+                "lastUpdatedDateTime": now,
+                "analyzeResult": state.analyze_result,
+            }
+            self.__send(200, json.dumps(response).encode(), {"Content-Type": "application/json"}, "di")
+            return
+        self.__send(404, json.dumps({"error": {"code": "NotFound", "message": path}}).encode(), {"Content-Type": "application/json"}, "di")
+
+    def __blob(self, method: str, path: str, body: bytes) -> None:
+        state = self.server.state
+        # /<account>/<container>/<blob>, the blob name may contain slashes
+        key = path.split("/", 2)[-1] if path.count("/") >= 2 else path
+        if method == "PUT":
+            if "x-ms-copy-source" in self.headers:
+                source = urlsplit(self.headers["x-ms-copy-source"]).path.split("/", 2)[-1]
+                with state.lock:
+                    blob = state.blobs.get(source)
+                    if blob is not None:
+                        state.blobs[key] = blob
+                status = 202 if blob is not None else 404
+                self.__send(status, b"", {"x-ms-copy-status": "success", "x-ms-copy-id": uuid.uuid4().hex, **self.__blob_headers(blob)}, "blob")
+                return
+            with state.lock:
+                if self.headers.get("If-None-Match") == "*" and key in state.blobs:
+                    blob = None
+                else:
+                    blob = state.blobs[key] = (body, f'"0x{hashlib.md5(body).hexdigest()[:16].upper()}"', email.utils.formatdate(usegmt=True))
+            if blob is None:
+                self.__send(409, b"", {"x-ms-error-code": "BlobAlreadyExists"}, "blob")
+                return
+            self.__send(201, b"", {"x-ms-request-server-encrypted": "true", **self.__blob_headers(blob, content=False)}, "blob")
+            return
+
+        with state.lock:
+            blob = state.blobs.pop(key, None) if method == "DELETE" else state.blobs.get(key)
+        if blob is None:
+            self.__send(404, b"", {"x-ms-error-code": "BlobNotFound"}, "blob")
+            return
+        if method == "DELETE":
+            self.__send(202, b"", {}, "blob")
+            return
+        if method == "HEAD":
+            self.__send(200, b"", self.__blob_headers(blob), "blob", content_length=len(blob[0]))
+            return
+
+        content = blob[0]
+        range_header = self.headers.get("x-ms-range") or self.headers.get("Range")
+        if range_header:
+            start, _, end = range_header.split("=", 1)[1].partition("-")
+            start, end = int(start), min(int(end) if end else len(content) - 1, len(content) - 1)
+            headers = {**self.__blob_headers(blob), "Content-Range": f"bytes {start}-{end}/{len(content)}"}
+            self.__send(206, content[start:end + 1], headers, "blob")
+            return
+        self.__send(200, content, self.__blob_headers(blob), "blob")
+
+    @staticmethod
+    def __blob_headers(blob: Optional[Tuple[bytes, str, str]], content: bool = True) -> Dict[str, str]:
+        if blob is None:
+            return {}
+        headers = {"ETag": blob[1], "Last-Modified": blob[2], "x-ms-version": "2024-08-04"}
+        if content:
+            headers.update({"x-ms-blob-type": "BlockBlob", "Content-Type": "application/octet-stream", "x-ms-creation-time": blob[2]})
+        return headers
+
+    def __send(self, status: int, body: bytes, headers: Dict[str, str], service: str, content_length: Optional[int] = None) -> None:
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("x-ms-request-id", uuid.uuid4().hex)
+        self.send_header("Date", email.utils.formatdate(usegmt=True))
+        self.send_header("Content-Length", str(content_length if content_length is not None else len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+        with self.server.state.lock:
+            self.server.state.stats[service].bytes_out += len(body)
+
+
+class MockAzureServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server hosting the three stand-in services. Use as a context manager
+    to serve from a background thread.
+    """
+    daemon_threads = True
+
+    def __init__(self, state: MockState, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.state = state
+        self.__thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "MockAzureServer":
+        self.__thread = threading.Thread(target=self.serve_forever, name="mock-azure", daemon=True)
+        self.__thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def connection_settings(self) -> Dict[str, str]:
+        """Environment variables pointing the settings of the real SDK clients at this server."""
+        return {
+            "BLOB_CONNECTION_STRING": (
+                f"DefaultEndpointsProtocol=http;AccountName={ACCOUNT_NAME};AccountKey={ACCOUNT_KEY};"
+                f"BlobEndpoint={self.url}/{ACCOUNT_NAME};"
+            ),
+            "BLOB_ACCOUNT_NAME": ACCOUNT_NAME,
+            "BLOB_ACCOUNT_KEY": ACCOUNT_KEY,
+            "DOCUMENT_INTELLIGENCE_DOMAIN_URL": self.url,
+            "DOCUMENT_INTELLIGENCE_API_KEY": "benchmark",
+            "CLASSIFICATION_MODEL": "benchmark-classifier",
+            "ANALYZE_MODEL": "prebuilt-layout",
+            "AZURE_OPEN_AI__ENDPOINT": self.url,
+            # semantic_kernel rejects http endpoints, it reaches the stand-in through the base url
+            "AZURE_OPEN_AI__BASE_URL": f"{self.url}/openai/deployments/gpt-4o",
+            "AZURE_OPEN_AI__API_KEY": "benchmark",
+            "AZURE_OPEN_AI__CHAT_COMPLETION_DEPLOYMENT_NAME": "gpt-4o",
+            "NUMBER_OF_TRIES_GPT": "3",
+        }
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        with self.state.lock:
+            return {name: vars(stats).copy() for name, stats in self.state.stats.items()}
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = {"chat": "lognormal:0.8:0.4", "blob": "lognormal:0.02:0.3", "di": "lognormal:0.4:0.3"}
+    for service in SERVICES:
+        parser.add_argument(f"--{service}-latency", default=defaults[service], help=f"Latency of {service} responses")
+        parser.add_argument(f"--{service}-throttle", type=float, default=0.0, help=f"Fraction of {service} requests answered with 429")
+    parser.add_argument("--chat-token-latency", type=float, default=0.0, help="Seconds added per completion token of chat responses")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After of the 429 responses, in seconds")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply every latency, e.g. 0.1 for a quick run")
+    parser.add_argument("--recordings", type=Path, default=RECORDINGS_DIR, help="Directory of the recorded responses")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the latency and 429 draws")
+
+
+def state_from_arguments(args: argparse.Namespace) -> MockState:
+    profiles = {
+        service: ServiceProfile(
+            latency=Latency(getattr(args, f"{service}_latency"), args.time_scale),
+            throttle_rate=getattr(args, f"{service}_throttle"),
+            retry_after=args.retry_after * args.time_scale,
+            token_latency=args.chat_token_latency * args.time_scale if service == "chat" else 0.0,
+        )
+        for service in SERVICES
+    }
+    return MockState(
+        profiles=profiles,
+        chat_response=json.loads((args.recordings / "chat_completion.json").read_text()),
+        analyze_result=json.loads((args.recordings / "analyze_result.json").read_text()),
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockAzureServer(state_from_arguments(args), port=args.port)
+    print(f"Serving on {server.url}, environment for the SDK clients:")
+    for name, value in server.connection_settings().items():
+        print(f"  {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.summary(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Write throughput of ``ExtractionRepository`` for different INSERT batch sizes.
+
+Saves synthetic extraction results (one ``MainInformation`` with a large ``EntityList``
+per CV, like a partnership with many partners) into a fresh SQLite database and
+reports rows/sec for every batch size.
+
+Usage:
+    python -m benchmarks.persistence [--documents 20] [--entities 1000] [--batch-sizes 1 100 1000] [--url sqlite:///...]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from azure_ai.models.extraction import Entity, MainInformation
+from azure_ai.repository.repository import ExtractionRepository, create_database_engine
+
+
+def make_extraction(number: int, entities: int) -> MainInformation:
+    return MainInformation(
+        Date="2024-01-01",
+        Name=f"Partnership {number}",
+        AddressLine1=f"{number} Main Street",
+        City_Town="Springfield",
+        Country="US",
+        FormType="W-8IMY",
+        EntityType="Partnership",
+        EntityList=[
+            Entity(
+                Name=f"Partner {number}-{position}",
+                AddressLine1=f"{position} Side Street",
+                Country="US",
+                FormType="W-9",
+                EntityType="Individual",
+                AllocationPercentage=f"{100 / entities:.4f}",
+            )
+            for position in range(entities)
+        ],
+    )
+
+
+def run(url: str, batch_size: int, documents: List[MainInformation]) -> float:
+    engine = create_database_engine(url)
+    repository = ExtractionRepository(engine, batch_size=batch_size)
+    repository.create_tables()
+    started = time.perf_counter()
+    rows = repository.save_many((f"{batch_size}-{number}", extraction, None) for number, extraction in enumerate(documents))
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+    return rows / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=20, help="Number of CVs to save")
+    parser.add_argument("--entities", type=int, default=1000, help="Entities per CV")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 1000], help="Rows per INSERT statement")
+    parser.add_argument("--url", help="Database url. Defaults to a temporary SQLite file per batch size")
+    args = parser.parse_args()
+
+    documents = [make_extraction(number, args.entities) for number in range(args.documents)]
+    print(f"{args.documents} CVs x {args.entities + 1} rows")
+    print(f"{'batch size':>10} {'rows/sec':>12} {'speedup':>8}")
+    baseline = None
+    with tempfile.TemporaryDirectory() as directory:
+        for batch_size in args.batch_sizes:
+            url = args.url or f"sqlite:///{os.path.join(directory, f'batch-{batch_size}.sqlite3')}"
+            rows_per_second = run(url, batch_size, documents)
+            baseline = baseline or rows_per_second
+            print(f"{batch_size:>10} {rows_per_second:>12.0f} {rows_per_second / baseline:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
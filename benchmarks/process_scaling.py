@@ -0,0 +1,86 @@
+"""
+Scaling of the CPU bound ingestion stages with the number of processes.
+
+Rasterizes every page of the ``CV samples/`` corpus through ``ProcessWorkerRuntime``
+with 1, 2, 4, ... up to N processes and reports pages/sec and speedup over one process.
+
+Usage:
+    python -m benchmarks.process_scaling [--max-processes N] [--dpi 200] [--copies 4]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from azure_ai.pipeline.process_runtime import ProcessWorkerRuntime
+
+
+def load_corpus(corpus_dir: Path, copies: int) -> List[bytes]:
+    documents = [path.read_bytes() for path in sorted(corpus_dir.rglob("*.pdf"))]
+    return documents * copies
+
+
+async def render_corpus(runtime: ProcessWorkerRuntime, documents: List[bytes]) -> int:
+    shared = [runtime.share(document) for document in documents]
+    try:
+        page_counts = await asyncio.gather(*[runtime.count_pages(pdf) for pdf in shared])
+        renders = [
+            runtime.render_page(pdf, page_number)
+            for pdf, page_count in zip(shared, page_counts)
+            for page_number in range(page_count)
+        ]
+        images = await asyncio.gather(*renders)
+        return len(images)
+    finally:
+        for pdf in shared:
+            pdf.unlink()
+
+
+def process_counts(max_processes: int) -> List[int]:
+    counts = []
+    count = 1
+    while count < max_processes:
+        counts.append(count)
+        count *= 2
+    counts.append(max_processes)
+    return counts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, default=ROOT_DIR / "CV samples")
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--copies", type=int, default=4, help="Repeat the corpus to get a measurable amount of work")
+    args = parser.parse_args()
+
+    documents = load_corpus(args.corpus, args.copies)
+    if not documents:
+        print(f"No PDF found in {args.corpus}", file=sys.stderr)
+        return 1
+
+    print(f"{len(documents)} documents, dpi {args.dpi}")
+    print(f"{'processes':>9} {'pages':>6} {'seconds':>8} {'pages/s':>8} {'speedup':>8}")
+    baseline = None
+    for processes in process_counts(args.max_processes):
+        with ProcessWorkerRuntime(processes=processes, dpi=args.dpi) as runtime:
+            # Warm up the pool so process start-up is not measured
+            asyncio.run(render_corpus(runtime, documents[:processes]))
+            started = time.perf_counter()
+            pages = asyncio.run(render_corpus(runtime, documents))
+            elapsed = time.perf_counter() - started
+
+        rate = pages / elapsed
+        baseline = baseline or rate
+        print(f"{processes:>9} {pages:>6} {elapsed:>8.2f} {rate:>8.1f} {rate / baseline:>7.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
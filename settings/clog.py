@@ -3,6 +3,8 @@ from pathlib import Path
 import os
 from types import TracebackType
 from typing import List, Literal, Mapping
+from settings.log_control import get_logging_level
+from settings.log_queue import get_handler
 
 
 class CustomerLogger:
@@ -15,7 +17,7 @@ class CustomerLogger:
         self.log_name = log_name
         self.log_mode = log_mode
         self.logger = logging.getLogger(log_name)
-        self.logger.setLevel(logging.DEBUG)
+        self.logger.setLevel(get_logging_level())
 
         if not allow_add_handler and self.logger.hasHandlers():
             return
@@ -35,17 +37,23 @@ class CustomerLogger:
         logfile = os.path.join("./log/", f"{log_name}.log")
         Path(logfile).resolve().parent.mkdir(parents=True, exist_ok=True)
 
-        file_handler = logging.FileHandler(filename=logfile)
-        file_handler.setLevel(logging.DEBUG)
-        file_handler.setFormatter(self.__create_formatter())
-        self.logger.addHandler(file_handler)
+        def create_handler():
+            file_handler = logging.FileHandler(filename=logfile)
+            file_handler.setLevel(logging.DEBUG)
+            file_handler.setFormatter(self.__create_formatter())
+            return file_handler
+
+        self.logger.addHandler(get_handler(("clog-file", logfile), create_handler))
         pass
 
     def __add_stream_handler(self):
-        stream_handler = logging.StreamHandler()
-        stream_handler.setLevel(logging.DEBUG)
-        stream_handler.setFormatter(self.__create_formatter())
-        self.logger.addHandler(stream_handler)
+        def create_handler():
+            stream_handler = logging.StreamHandler()
+            stream_handler.setLevel(logging.DEBUG)
+            stream_handler.setFormatter(self.__create_formatter())
+            return stream_handler
+
+        self.logger.addHandler(get_handler(("clog-stream",), create_handler))
         pass
 
     def __create_formatter(self):
@@ -0,0 +1,10 @@
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+class ApiSettings(BaseSettings):
+    api_host: str = Field(default="0.0.0.0", env='API_HOST', description="Interface the HTTP API listens on", frozen=True)
+    api_port: int = Field(default=8000, env='API_PORT', description="Port the HTTP API listens on", frozen=True)
+    api_max_upload_size: int = Field(default=50 * 1024 * 1024, env='API_MAX_UPLOAD_SIZE', description="Largest accepted upload, in bytes", frozen=True)
+    api_stream_buffer: int = Field(default=16, env='API_STREAM_BUFFER', description="Number of received chunks of an upload buffered ahead of the blob upload", frozen=True)
+    api_ingestion_workers: int = Field(default=4, env='API_INGESTION_WORKERS', description="Number of pages processed at the same time by background ingestion", frozen=True)
+    api_max_jobs: int = Field(default=1000, env='API_MAX_JOBS', description="Number of finished jobs kept for status queries", frozen=True)
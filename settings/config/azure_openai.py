@@ -22,6 +22,12 @@ class AzureOpenAISettings(BaseSettings):
         description="Deployment name of the API",
         frozen=True,
     )
+    azure_open_ai__base_url: Optional[str] = Field(
+        default=None,
+        env="AZURE_OPEN_AI__BASE_URL",
+        description="Base url of the deployment (<endpoint>/openai/deployments/<deployment>), used instead of the endpoint when set, e.g. for a local stand-in over http",
+        frozen=True,
+    )
     # azure_open_ai__chat_completion_deployment_name_long: Optional[str] = Field(
     #     ...,
     #     env="AZURE_OPEN_AI__CHAT_COMPLETION_DEPLOYMENT_NAME_LONG",
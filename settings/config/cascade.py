@@ -0,0 +1,10 @@
+from typing import Dict, List
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+class CascadeSettings(BaseSettings):
+    cascade_mode: str = Field(default="off", env='CASCADE_MODE', description="Classifier choosing the type prompt of a page before extraction: 'off', 'rules' (keywords in the Document Intelligence text) or 'document_intelligence' (classification_model)", frozen=True)
+    cascade_type_rules: Dict[str, List[str]] = Field(default={}, env='CASCADE_TYPE_RULES', description="Type prompt (e.g. TYPE3_PROMPT) to the regular expressions identifying its documents in the page text, used by the 'rules' mode", frozen=True)
+    cascade_doc_types: Dict[str, str] = Field(default={}, env='CASCADE_DOC_TYPES', description="Document type of the classification_model to its type prompt, used by the 'document_intelligence' mode", frozen=True)
+    cascade_min_confidence: float = Field(default=0.6, env='CASCADE_MIN_CONFIDENCE', description="Pages classified below this confidence are extracted with the full prompt", frozen=True)
+    cascade_audit_rate: float = Field(default=0.05, env='CASCADE_AUDIT_RATE', description="Fraction of routed pages also extracted with the full prompt to measure the agreement of the cascade", frozen=True)
@@ -0,0 +1,9 @@
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+class DatabaseSettings(BaseSettings):
+    database_url: str = Field(default="sqlite:///./data/extraction.sqlite3", env='DATABASE_URL', description="SQLAlchemy url of the extraction database, e.g. mssql+pyodbc://... or postgresql+psycopg2://...", frozen=True)
+    database_pool_size: int = Field(default=5, env='DATABASE_POOL_SIZE', description="Number of connections kept open in the pool", frozen=True)
+    database_max_overflow: int = Field(default=10, env='DATABASE_MAX_OVERFLOW', description="Connections opened on top of the pool under load", frozen=True)
+    database_pool_recycle: int = Field(default=1800, env='DATABASE_POOL_RECYCLE', description="Seconds after which a pooled connection is replaced. Keep below the server idle timeout", frozen=True)
+    database_batch_size: int = Field(default=500, env='DATABASE_BATCH_SIZE', description="Rows per multi-row INSERT statement", frozen=True)
@@ -0,0 +1,7 @@
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+class DedupSettings(BaseSettings):
+    dedup_sqlite_path: str = Field(default="./data/dedup.sqlite3", env='DEDUP_SQLITE_PATH', description="Database file storing document fingerprints", frozen=True)
+    dedup_page_distance: int = Field(default=4, env='DEDUP_PAGE_DISTANCE', description="Maximum Hamming distance between the perceptual hashes (64 bits) of two pages considered identical. Pages without text layer must match exactly", frozen=True)
+    dedup_similarity_threshold: float = Field(default=0.5, env='DEDUP_SIMILARITY_THRESHOLD', description="Minimum estimated Jaccard similarity (MinHash) for a document to be considered a near duplicate", frozen=True)
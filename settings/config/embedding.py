@@ -0,0 +1,16 @@
+from typing import Literal, Optional
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+class EmbeddingSettings(BaseSettings):
+    embedding_deployment_name: Optional[str] = Field(default=None, env='EMBEDDING_DEPLOYMENT_NAME', description="Deployment name of the Azure OpenAI embedding model", frozen=True)
+    embedding_dimensions: Optional[int] = Field(default=None, env='EMBEDDING_DIMENSIONS', description="Output dimensions for text-embedding-3 models. Smaller vectors are faster to search", frozen=True)
+    embedding_batch_size: int = Field(default=256, env='EMBEDDING_BATCH_SIZE', description="Maximum number of chunks sent in one embedding request", frozen=True)
+    embedding_requests_per_minute: Optional[int] = Field(default=None, env='EMBEDDING_REQUESTS_PER_MINUTE', description="Request quota of the embedding deployment. Unlimited if not set", frozen=True)
+    embedding_tokens_per_minute: Optional[int] = Field(default=None, env='EMBEDDING_TOKENS_PER_MINUTE', description="Token quota of the embedding deployment. Unlimited if not set", frozen=True)
+    embedding_chunk_size: int = Field(default=1000, env='EMBEDDING_CHUNK_SIZE', description="Maximum number of characters per chunk of CV text", frozen=True)
+    embedding_chunk_overlap: int = Field(default=100, env='EMBEDDING_CHUNK_OVERLAP', description="Number of characters shared by consecutive chunks", frozen=True)
+    vector_index_backend: Literal["local", "azure_search"] = Field(default="local", env='VECTOR_INDEX_BACKEND', description="Where vectors are stored. Valid value: local or azure_search", frozen=True)
+    azure_search_endpoint: Optional[str] = Field(default=None, env='AZURE_SEARCH_ENDPOINT', description="Endpoint of the Azure AI Search service", frozen=True)
+    azure_search_api_key: Optional[str] = Field(default=None, env='AZURE_SEARCH_API_KEY', description="Admin key of the Azure AI Search service", frozen=True)
+    azure_search_index_name: Optional[str] = Field(default=None, env='AZURE_SEARCH_INDEX_NAME', description="Azure AI Search index holding the CV chunks", frozen=True)
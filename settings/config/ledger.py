@@ -0,0 +1,10 @@
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+class LedgerSettings(BaseSettings):
+    ledger_sqlite_path: str = Field(default="./data/usage.sqlite3", env='LEDGER_SQLITE_PATH', description="Database file storing the token usage of every GPT request", frozen=True)
+    ledger_flush_size: int = Field(default=200, env='LEDGER_FLUSH_SIZE', description="Number of buffered usage records written in one transaction", frozen=True)
+    ledger_flush_interval: float = Field(default=10, env='LEDGER_FLUSH_INTERVAL', description="Maximum number of seconds a usage record stays buffered before it is written", frozen=True)
+    ledger_prompt_price: float = Field(default=2.5, env='LEDGER_PROMPT_PRICE', description="Price in USD per million uncached prompt tokens", frozen=True)
+    ledger_cached_price: float = Field(default=1.25, env='LEDGER_CACHED_PRICE', description="Price in USD per million cached prompt tokens", frozen=True)
+    ledger_completion_price: float = Field(default=10.0, env='LEDGER_COMPLETION_PRICE', description="Price in USD per million completion tokens", frozen=True)
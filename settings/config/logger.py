@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
@@ -6,4 +6,11 @@ class LoggerSettings(BaseSettings):
     logging_level: Optional[str] = Field(..., env='LOGGING_LEVEL'
                                          , description="Settings to control logging level. Valid value: DEBUG, INFO, WARNING, ERROR, CRITICAL", frozen=True)
     logging_mode: Optional[str] = Field(..., env='LOGGING_MODE', description="Log to stream or to file. Valid value: stream or file", frozen=True)
-    logging_file_path: Optional[str] = Field(..., env='LOGGING_FILE_PATH', description="Path to log file. Only use with logging_mode = file", frozen=True)
\ No newline at end of file
+    logging_file_path: Optional[str] = Field(..., env='LOGGING_FILE_PATH', description="Path to log file. Only use with logging_mode = file", frozen=True)
+    logging_async: bool = Field(default=True, env='LOGGING_ASYNC', description="Write log records from a background thread instead of the calling thread", frozen=True)
+    logging_queue_size: int = Field(default=10000, env='LOGGING_QUEUE_SIZE', description="Maximum number of log records waiting for the background thread", frozen=True)
+    logging_queue_policy: Literal["drop", "block"] = Field(default="drop", env='LOGGING_QUEUE_POLICY', description="What to do when the log queue is full. Valid value: drop (count and discard the record) or block (wait for room)", frozen=True)
+    logging_sample_every: int = Field(default=100, env='LOGGING_SAMPLE_EVERY', description="Sampled hot path events are logged once every N occurrences per event key", frozen=True)
+    logging_error_burst: int = Field(default=10, env='LOGGING_ERROR_BURST', description="Maximum number of rate limited errors logged per error key in every period", frozen=True)
+    logging_error_period: float = Field(default=60, env='LOGGING_ERROR_PERIOD', description="Length in seconds of the rate limiting period of error logs", frozen=True)
+    logging_json_backend: Literal["auto", "orjson", "json"] = Field(default="auto", env='LOGGING_JSON_BACKEND', description="Serializer of JsonLogger records. Valid value: auto (orjson when installed), orjson or json. orjson writes compact JSON with UTF-8 text, json keeps the stdlib format (', ' and ': ' separators, \\u escapes)", frozen=True)
@@ -0,0 +1,13 @@
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+class PipelineSettings(BaseSettings):
+    pipeline_queue_size: int = Field(default=8, env='PIPELINE_QUEUE_SIZE', description="Maximum number of items buffered between two pipeline stages", frozen=True)
+    pipeline_upload_workers: int = Field(default=4, env='PIPELINE_UPLOAD_WORKERS', description="Number of concurrent workers for the blob upload stages", frozen=True)
+    pipeline_split_workers: int = Field(default=2, env='PIPELINE_SPLIT_WORKERS', description="Number of concurrent workers for the PDF split stage", frozen=True)
+    pipeline_di_workers: int = Field(default=4, env='PIPELINE_DI_WORKERS', description="Number of concurrent workers for the Document Intelligence stage", frozen=True)
+    pipeline_gpt_workers: int = Field(default=4, env='PIPELINE_GPT_WORKERS', description="Number of concurrent workers for the GPT extraction stage", frozen=True)
+    pipeline_batch_max_pages: int = Field(default=1, env='PIPELINE_BATCH_MAX_PAGES', description="Documents with up to this many pages send their pages to GPT in shared requests. 1 sends every page on its own", frozen=True)
+    pipeline_batch_token_budget: int = Field(default=12000, env='PIPELINE_BATCH_TOKEN_BUDGET', description="Maximum estimated prompt tokens of a request with several pages, system prompt included", frozen=True)
+    pipeline_batch_prompt_tokens: int = Field(default=2500, env='PIPELINE_BATCH_PROMPT_TOKENS', description="Estimated tokens of the system prompt, counted once per request with several pages", frozen=True)
+    pipeline_max_continuations: int = Field(default=3, env='PIPELINE_MAX_CONTINUATIONS', description="Maximum follow-up GPT requests completing an answer cut off by the output limit, 0 keeps cut off answers as they are", frozen=True)
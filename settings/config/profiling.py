@@ -0,0 +1,8 @@
+from typing import Literal
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+class ProfilingSettings(BaseSettings):
+    profiling_mode: Literal["off", "cprofile", "pyinstrument"] = Field(default="off", env='PROFILING_MODE', description="Profiler used for sampled or requested documents. Valid value: off, cprofile or pyinstrument", frozen=True)
+    profiling_sample_rate: float = Field(default=0.0, env='PROFILING_SAMPLE_RATE', description="Fraction of documents profiled without being requested, between 0 and 1", frozen=True)
+    profiling_output_dir: str = Field(default="./data/profiles", env='PROFILING_OUTPUT_DIR', description="Directory of the saved profiles, one file per document", frozen=True)
@@ -0,0 +1,12 @@
+from typing import Literal
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+class QueueSettings(BaseSettings):
+    queue_backend: Literal["azure", "sqlite"] = Field(default="sqlite", env='QUEUE_BACKEND', description="Backend of the ingestion job queue. Valid value: azure or sqlite", frozen=True)
+    queue_name: str = Field(default="cv-ingestion", env='QUEUE_NAME', description="Name of the ingestion job queue", frozen=True)
+    queue_connection_string: str | None = Field(default=None, env='QUEUE_CONNECTION_STRING', description="Connection string to Azure Storage Queue. Defaults to the blob connection string", frozen=True)
+    queue_sqlite_path: str = Field(default="./data/queue.sqlite3", env='QUEUE_SQLITE_PATH', description="Database file of the sqlite queue backend", frozen=True)
+    queue_visibility_timeout: int = Field(default=300, env='QUEUE_VISIBILITY_TIMEOUT', description="Seconds a received job stays invisible to other workers before it is delivered again", frozen=True)
+    queue_max_dequeue_count: int = Field(default=5, env='QUEUE_MAX_DEQUEUE_COUNT', description="Number of deliveries after which a job is considered poisoned and discarded", frozen=True)
+    checkpoint_sqlite_path: str = Field(default="./data/checkpoint.sqlite3", env='CHECKPOINT_SQLITE_PATH', description="Database file storing page level checkpoints", frozen=True)
@@ -0,0 +1,10 @@
+from typing import Literal
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+class SearchSettings(BaseSettings):
+    search_fusion: Literal["rrf", "weighted"] = Field(default="rrf", env='SEARCH_FUSION', description="How keyword and vector rankings are combined. Valid value: rrf or weighted", frozen=True)
+    search_rrf_k: int = Field(default=60, env='SEARCH_RRF_K', description="Rank constant of reciprocal rank fusion. Higher values flatten the contribution of top ranks", frozen=True)
+    search_keyword_weight: float = Field(default=0.5, env='SEARCH_KEYWORD_WEIGHT', description="Weight of the normalized BM25 score in the weighted blend, the vector score gets the rest", frozen=True)
+    search_candidates: int = Field(default=200, env='SEARCH_CANDIDATES', description="Number of candidates taken from each ranking before fusion", frozen=True)
+    search_cache_size: int = Field(default=1024, env='SEARCH_CACHE_SIZE', description="Number of query results kept in the LRU cache", frozen=True)
@@ -0,0 +1,9 @@
+from typing import Literal, Optional
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+class TelemetrySettings(BaseSettings):
+    telemetry_exporter: Literal["none", "console", "memory", "azure_monitor"] = Field(default="none", env='TELEMETRY_EXPORTER', description="Where spans and metrics are exported. Valid value: none, console, memory (kept in process, for tests and benchmarks) or azure_monitor", frozen=True)
+    telemetry_service_name: str = Field(default="cv-extraction", env='TELEMETRY_SERVICE_NAME', description="Service name attached to every span and metric", frozen=True)
+    telemetry_connection_string: Optional[str] = Field(default=None, env='APPLICATIONINSIGHTS_CONNECTION_STRING', description="Application Insights connection string. Only use with telemetry_exporter = azure_monitor", frozen=True)
+    telemetry_export_interval: float = Field(default=60, env='TELEMETRY_EXPORT_INTERVAL', description="Seconds between two metric exports of the console and azure_monitor exporters", frozen=True)
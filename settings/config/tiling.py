@@ -0,0 +1,10 @@
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+class TilingSettings(BaseSettings):
+    tiling_enabled: bool = Field(default=False, env='TILING_ENABLED', description="Extract pages with several tables one region at a time instead of sending the whole page", frozen=True)
+    tiling_min_tables: int = Field(default=2, env='TILING_MIN_TABLES', description="Minimum number of tables Document Intelligence finds on a page for it to be tiled", frozen=True)
+    tiling_max_tiles: int = Field(default=6, env='TILING_MAX_TILES', description="Maximum number of tiles of a page, consecutive tables are joined above it", frozen=True)
+    tiling_line_height: int = Field(default=24, env='TILING_LINE_HEIGHT', description="Height in pixels of a text line in the tiles, tiles are scaled down to it and never up", frozen=True)
+    tiling_margin: float = Field(default=0.01, env='TILING_MARGIN', description="Margin added around every tile, as a fraction of the page size", frozen=True)
+    tiling_workers: int = Field(default=4, env='TILING_WORKERS', description="Number of tiles of a page extracted in parallel", frozen=True)
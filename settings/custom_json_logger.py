@@ -1,103 +1,157 @@
-from collections import OrderedDict
+import functools
 import json
+import threading
+from typing import Any, Callable, Dict, Optional
 import structlog
 from settings.settings import azure_settings
 from settings.invalid_config_exception import InvalidConfigException
 import os
 import logging
 from logging.handlers import RotatingFileHandler
+from settings.log_control import get_logging_level
+from settings.log_queue import get_handler
 
 
-def custom_json_serializer(dic, **kw):
-    mod = {}
-    if "event" in dic:
-        mod["level"] = dic["level"]
-        mod["timestamp"] = dic["timestamp"]
-        mod["logger"] = dic["logger"]
-        try:
-            mod["request_id"] = dic["request_id"]
-        except:
-            mod["request_id"] = None
+_MISSING = object()
+_configure_lock = threading.Lock()
+_configured = False
 
-        mod["message"] = dic["event"]
 
-        try:
-            mod["request_type"] = dic["request_type"]
-        except:
-            pass
+@functools.lru_cache(maxsize=8)
+def _json_encoder(default: Optional[Callable[[Any], Any]]) -> json.JSONEncoder:
+    # json.dumps builds a new encoder whenever ``default`` is given, reuse one instead
+    return json.JSONEncoder(default=default)
 
-    for k in dic:
-        if k != "event":
-            mod[k] = dic[k]
-    return json.dumps(mod, **kw)
 
+def _json_dumps(obj: Dict[str, Any], default: Optional[Callable[[Any], Any]] = None, **kw) -> str:
+    if kw:
+        return json.dumps(obj, default=default, **kw)
+    return _json_encoder(default).encode(obj)
 
-class JsonLogger:
-    def __init__(self, name: str):
-        if azure_settings.logger_setting.logging_mode == "file":
-            log_dir = os.path.dirname(azure_settings.logger_setting.logging_file_path)
-            if not os.path.exists(log_dir):
-                os.makedirs(log_dir)
 
-            handler = RotatingFileHandler(azure_settings.logger_setting.logging_file_path)
-            handler.setFormatter(logging.Formatter("%(message)s"))
+def _orjson_dumps(obj: Dict[str, Any], default: Optional[Callable[[Any], Any]] = None, **kw) -> str:
+    import orjson
 
-            logging.basicConfig(
-                handlers=[handler], level=logging.INFO, format="%(message)s"
-            )
+    if kw:
+        return json.dumps(obj, default=default, **kw)
+    # orjson has no separators or ensure_ascii options: the keys and their order are the
+    # same as with the json backend, but the output is compact and non-ASCII text is
+    # written as UTF-8 instead of \u escapes.
+    # orjson returns bytes, the stdlib formatter expects a str message
+    return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS).decode()
 
-            structlog.configure(
-                processors=[
-                    structlog.contextvars.merge_contextvars,
-                    structlog.stdlib.add_logger_name,
-                    structlog.stdlib.filter_by_level,
-                    structlog.processors.TimeStamper(fmt="iso"),
-                    structlog.stdlib.PositionalArgumentsFormatter(),
-                    structlog.processors.StackInfoRenderer(),
-                    structlog.processors.format_exc_info,
-                    structlog.processors.UnicodeDecoder(),
-                    structlog.processors.JSONRenderer(
-                        serializer=custom_json_serializer
-                    ),
-                    structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
-                ],
-                context_class=OrderedDict,
-                logger_factory=structlog.stdlib.LoggerFactory(),
-                wrapper_class=structlog.stdlib.BoundLogger,
-                cache_logger_on_first_use=True,
-            )
-        elif azure_settings.logger_setting.logging_mode == "stream":
-            handler = logging.StreamHandler()
-            handler.setFormatter(logging.Formatter("%(message)s"))
 
-            logging.basicConfig(
-                handlers=[handler], level=logging.INFO, format="%(message)s"
-            )
-
-            structlog.configure(
-                processors=[
-                    structlog.contextvars.merge_contextvars,
-                    structlog.stdlib.add_logger_name,
-                    structlog.stdlib.filter_by_level,
-                    structlog.processors.TimeStamper(fmt="iso"),
-                    structlog.stdlib.PositionalArgumentsFormatter(),
-                    structlog.processors.StackInfoRenderer(),
-                    structlog.processors.format_exc_info,
-                    structlog.processors.UnicodeDecoder(),
-                    structlog.processors.JSONRenderer(
-                        serializer=custom_json_serializer
-                    ),
-                    structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
-                ],
-                context_class=OrderedDict,
-                logger_factory=structlog.stdlib.LoggerFactory(),
-                wrapper_class=structlog.stdlib.BoundLogger,
-                cache_logger_on_first_use=True,
-            )
-        else:
+def _get_dumps() -> Callable[..., str]:
+    backend = azure_settings.logger_setting.logging_json_backend
+    if backend == "json":
+        return _json_dumps
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        if backend == "orjson":
             raise InvalidConfigException(
-                r"Invalid settings for log. Please choose between 'file' or 'stream' only"
+                r"Invalid settings for log json backend. orjson is not installed, please choose 'json' or 'auto'"
             )
+        return _json_dumps
+    return _orjson_dumps
+
+
+_dumps = None
+
+
+def custom_json_serializer(dic, **kw):
+    """
+    Render a structlog event as JSON with ``level``, ``timestamp``, ``logger``,
+    ``request_id``, ``message`` and ``request_type`` first, followed by the other keys
+    in insertion order.
+
+    The event dict is consumed: ``event`` is popped from it instead of copying every
+    other key one by one.
+    """
+    global _dumps
+    if _dumps is None:
+        _dumps = _get_dumps()
+    message = dic.pop("event", _MISSING)
+    if message is not _MISSING:
+        ordered = {
+            "level": dic.get("level"),
+            "timestamp": dic.get("timestamp"),
+            "logger": dic.get("logger"),
+            "request_id": dic.get("request_id"),
+            "message": message,
+        }
+        if "request_type" in dic:
+            ordered["request_type"] = dic["request_type"]
+        # Keys already set keep their position
+        ordered.update(dic)
+        dic = ordered
+    return _dumps(dic, **kw)
+
+
+def _configure(handler: logging.Handler) -> None:
+    """
+    Configure the root handler and structlog once per process. Configuring again on
+    every ``JsonLogger`` would reset the structlog logger cache each time.
+    """
+    global _configured
+    if _configured:
+        return
+    with _configure_lock:
+        if _configured:
+            return
+        logging.basicConfig(
+            handlers=[handler], level=get_logging_level(), format="%(message)s"
+        )
+
+        structlog.configure(
+            processors=[
+                structlog.contextvars.merge_contextvars,
+                structlog.stdlib.add_logger_name,
+                structlog.stdlib.filter_by_level,
+                structlog.processors.TimeStamper(fmt="iso"),
+                structlog.stdlib.PositionalArgumentsFormatter(),
+                structlog.processors.StackInfoRenderer(),
+                structlog.processors.format_exc_info,
+                structlog.processors.UnicodeDecoder(),
+                structlog.processors.JSONRenderer(
+                    serializer=custom_json_serializer
+                ),
+                structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+            ],
+            context_class=dict,
+            logger_factory=structlog.stdlib.LoggerFactory(),
+            wrapper_class=structlog.stdlib.BoundLogger,
+            cache_logger_on_first_use=True,
+        )
+        _configured = True
+
+
+class JsonLogger:
+    def __init__(self, name: str):
+        if not _configured:
+            if azure_settings.logger_setting.logging_mode == "file":
+                log_dir = os.path.dirname(azure_settings.logger_setting.logging_file_path)
+                if not os.path.exists(log_dir):
+                    os.makedirs(log_dir)
+
+                def create_handler():
+                    file_handler = RotatingFileHandler(azure_settings.logger_setting.logging_file_path, encoding="utf-8")
+                    file_handler.setFormatter(logging.Formatter("%(message)s"))
+                    return file_handler
+
+                handler = get_handler(("json-file", azure_settings.logger_setting.logging_file_path), create_handler)
+            elif azure_settings.logger_setting.logging_mode == "stream":
+                def create_handler():
+                    stream_handler = logging.StreamHandler()
+                    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+                    return stream_handler
+
+                handler = get_handler(("json-stream",), create_handler)
+            else:
+                raise InvalidConfigException(
+                    r"Invalid settings for log. Please choose between 'file' or 'stream' only"
+                )
+            _configure(handler)
 
         self.logger = structlog.get_logger(name).bind()
 
@@ -1,49 +1,92 @@
 import logging
 from settings.settings import azure_settings
 from settings.invalid_config_exception import InvalidConfigException
+from settings.log_control import get_error_limiter, get_logging_level, sampler
+from settings.log_queue import get_handler
 
 class Logger:
+    """
+    Logger writing to the stream or file configured in ``logger_setting``.
+
+    Messages accept %-style arguments, formatted only if the record is emitted, e.g.
+    ``logger.debug("Metadata: %s", metadata)``. Use ``is_enabled_for`` to skip building
+    expensive messages altogether.
+
+    The level comes from ``logging_level``. High volume events can be logged with
+    ``debug_sampled`` (1 in ``logging_sample_every`` per key) and repeated failures with
+    ``error_limited`` (at most ``logging_error_burst`` per key and ``logging_error_period``).
+    """
     def __init__(self, name):
         self.logger = logging.getLogger(name)
-        self.logger.setLevel(logging.DEBUG)
+        self.logger.setLevel(get_logging_level())
 
         if not self.logger.hasHandlers():
             if azure_settings.logger_setting.logging_mode == "file":
-                import os
-
-                log_dir = os.path.dirname(azure_settings.logger_setting.logging_file_path)
-                if not os.path.exists(log_dir):
-                    os.makedirs(log_dir)
-                console_handler = logging.FileHandler(
-                    azure_settings.logger_setting.logging_file_path
-                )
+                key = ("file", azure_settings.logger_setting.logging_file_path)
             elif azure_settings.logger_setting.logging_mode == "stream":
-                console_handler = logging.StreamHandler()
+                key = ("stream",)
             else:
                 raise InvalidConfigException(
                     r"Invalid settings for log. Please choose between 'file' or 'stream' only"
                 )
 
-            console_handler.setLevel(logging.DEBUG)
+            self.logger.addHandler(get_handler(key, self.__create_handler))
+
+    @staticmethod
+    def __create_handler() -> logging.Handler:
+        if azure_settings.logger_setting.logging_mode == "file":
+            import os
 
-            formatter = logging.Formatter(
-                "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+            log_dir = os.path.dirname(azure_settings.logger_setting.logging_file_path)
+            if not os.path.exists(log_dir):
+                os.makedirs(log_dir)
+            console_handler = logging.FileHandler(
+                azure_settings.logger_setting.logging_file_path
             )
-            console_handler.setFormatter(formatter)
+        else:
+            console_handler = logging.StreamHandler()
+
+        console_handler.setLevel(logging.DEBUG)
+
+        formatter = logging.Formatter(
+            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+        )
+        console_handler.setFormatter(formatter)
+        return console_handler
+
+    def is_enabled_for(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
+
+    def debug(self, message, *args):
+        self.logger.debug(message, *args)
 
-            self.logger.addHandler(console_handler)
+    def info(self, message, *args):
+        self.logger.info(message, *args)
 
-    def debug(self, message):
-        self.logger.debug(message)
+    def warning(self, message, *args):
+        self.logger.warning(message, *args)
 
-    def info(self, message):
-        self.logger.info(message)
+    def error(self, message, *args):
+        self.logger.error(message, *args)
 
-    def warning(self, message):
-        self.logger.warning(message)
+    def critical(self, message, *args):
+        self.logger.critical(message, *args)
 
-    def error(self, message):
-        self.logger.error(message)
+    def debug_sampled(self, key: str, message, *args):
+        """Log only 1 in ``logging_sample_every`` occurrences of the event ``key``."""
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        every = azure_settings.logger_setting.logging_sample_every
+        if sampler.sample(f"{self.logger.name}:{key}", every):
+            self.logger.debug(f"{message} [sampled 1/{every}]" if every > 1 else message, *args)
 
-    def critical(self, message):
-        self.logger.critical(message)
+    def error_limited(self, key: str, message, *args):
+        """Log an error unless the error ``key`` already hit its rate limit."""
+        if not self.logger.isEnabledFor(logging.ERROR):
+            return
+        allowed, suppressed = get_error_limiter().acquire(f"{self.logger.name}:{key}")
+        if not allowed:
+            return
+        if suppressed:
+            message = f"{message} [{suppressed} similar errors suppressed]"
+        self.logger.error(message, *args)
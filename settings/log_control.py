@@ -0,0 +1,108 @@
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, Tuple
+from urllib.parse import urlsplit, urlunsplit
+from settings.settings import azure_settings
+from settings.invalid_config_exception import InvalidConfigException
+
+_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+    "CRITICAL": logging.CRITICAL,
+}
+
+
+def get_logging_level() -> int:
+    """
+    Level configured by ``logging_level``, INFO when it is not set.
+    """
+    level = (azure_settings.logger_setting.logging_level or "INFO").strip().upper()
+    if level not in _LEVELS:
+        raise InvalidConfigException(
+            r"Invalid settings for log level. Please choose between 'DEBUG', 'INFO', 'WARNING', 'ERROR' or 'CRITICAL' only"
+        )
+    return _LEVELS[level]
+
+
+class LogSampler:
+    """
+    Let through 1 in N occurrences of every event key: the 1st, the N+1th, ...
+    """
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__counters: Dict[str, itertools.count] = {}
+
+    def sample(self, key: str, every: int) -> bool:
+        counter = self.__counters.get(key)
+        if counter is None:
+            with self.__lock:
+                counter = self.__counters.setdefault(key, itertools.count())
+        # next() on itertools.count is atomic under the GIL
+        return next(counter) % max(every, 1) == 0
+
+
+class LogRateLimiter:
+    """
+    Allow at most ``burst`` events per key in every fixed window of ``period`` seconds,
+    and count the ones suppressed so the next allowed event can report them.
+    """
+    def __init__(self, burst: int, period: float):
+        self.burst = burst
+        self.period = period
+        self.__lock = threading.Lock()
+        # Key: start of the current window, events in it, suppressed events not reported yet
+        self.__windows: Dict[str, list] = {}
+
+    def acquire(self, key: str) -> Tuple[bool, int]:
+        """
+        Returns:
+            Tuple[bool, int]: Whether the event may be logged, and the number of events
+                suppressed since the last one that was
+        """
+        now = time.monotonic()
+        with self.__lock:
+            window = self.__windows.get(key)
+            if window is None or now - window[0] >= self.period:
+                suppressed = window[2] if window is not None else 0
+                self.__windows[key] = [now, 1, 0]
+                return True, suppressed
+            if window[1] < self.burst:
+                window[1] += 1
+                suppressed, window[2] = window[2], 0
+                return True, suppressed
+            window[2] += 1
+            return False, 0
+
+
+class RedactedUrl:
+    """
+    Log argument printing a URL without its query string, e.g. without a SAS token.
+    The URL is only parsed if the record is actually formatted.
+    """
+    __slots__ = ("url",)
+
+    def __init__(self, url: str):
+        self.url = url
+
+    def __str__(self) -> str:
+        parts = urlsplit(str(self.url))
+        return urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+
+
+sampler = LogSampler()
+_error_limiter = None
+_error_limiter_lock = threading.Lock()
+
+
+def get_error_limiter() -> LogRateLimiter:
+    global _error_limiter
+    if _error_limiter is None:
+        with _error_limiter_lock:
+            if _error_limiter is None:
+                settings = azure_settings.logger_setting
+                _error_limiter = LogRateLimiter(settings.logging_error_burst, settings.logging_error_period)
+    return _error_limiter
@@ -0,0 +1,91 @@
+import atexit
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Dict, Hashable, Tuple
+from settings.settings import azure_settings
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Hand log records to a background ``QueueListener`` through a bounded queue.
+
+    The calling thread only merges the message arguments and enqueues the record;
+    formatting and disk or console I/O happen on the listener thread. When the queue is
+    full the record is dropped and counted (``drop``) or the caller waits for room
+    (``block``), so memory stays bounded during log storms.
+    """
+    def __init__(self, maxsize: int, policy: str = "drop"):
+        super().__init__(queue.Queue(maxsize))
+        self.policy = policy
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The arguments may be mutated once the call returns, merge them now.
+        # Timestamps and exception text are formatted by the listener.
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self.policy == "block":
+                self.queue.put(record)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # The queue is bounded, wait for room instead of failing on stop
+        self.queue.put(self._sentinel)
+
+
+_lock = threading.Lock()
+_listeners: Dict[Hashable, Tuple[BoundedQueueHandler, QueueListener]] = {}
+
+
+def get_handler(key: Hashable, create_handler: Callable[[], logging.Handler]) -> logging.Handler:
+    """
+    Handler to attach to a logger, shared by every logger writing to the same destination.
+
+    With ``logging_async`` the handler returned by ``create_handler`` runs behind one
+    ``QueueListener`` thread per ``key``, e.g. per log file. Otherwise it is returned as is.
+
+    Args:
+        key (Hashable): Identifies the destination, e.g. ("file", path)
+        create_handler (Callable[[], logging.Handler]): Creates the handler doing the actual I/O
+
+    Returns:
+        logging.Handler: Handler for the logger
+    """
+    settings = azure_settings.logger_setting
+    if not settings.logging_async:
+        return create_handler()
+
+    with _lock:
+        if key not in _listeners:
+            queue_handler = BoundedQueueHandler(settings.logging_queue_size, settings.logging_queue_policy)
+            listener = _Listener(queue_handler.queue, create_handler(), respect_handler_level=True)
+            listener.start()
+            _listeners[key] = (queue_handler, listener)
+        return _listeners[key][0]
+
+
+def dropped_records() -> int:
+    """Number of records dropped because a log queue was full."""
+    with _lock:
+        return sum(queue_handler.dropped for queue_handler, _ in _listeners.values())
+
+
+@atexit.register
+def stop_listeners() -> None:
+    """Flush the queued records and stop the listener threads."""
+    with _lock:
+        for _, listener in _listeners.values():
+            listener.stop()
+        _listeners.clear()
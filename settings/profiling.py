@@ -0,0 +1,171 @@
+import cProfile
+import os
+import pstats
+import random
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from settings.settings import azure_settings
+from settings.invalid_config_exception import InvalidConfigException
+
+
+class Profiler:
+    """
+    Opt-in profiling of the Python side of document processing: prompt assembly,
+    base64, pydantic validation, logging, ...
+
+    A document is profiled when requested or picked at ``profiling_sample_rate``. Every
+    piece of work done for it runs inside ``capture``, which profiles the calling thread
+    and merges the result into the profile of the document. ``save`` writes it to
+    ``profiling_output_dir`` as ``<key>.prof`` (cProfile, open with pstats or snakeviz)
+    or ``<key>.html`` (pyinstrument flame view). cProfile captures also add up into
+    process wide totals per function, see ``hot_functions``.
+
+    When the mode is off, or for documents that are not profiled, ``capture`` is a plain
+    context manager doing nothing.
+    """
+    def __init__(self, mode: Optional[str] = None, sample_rate: Optional[float] = None, output_dir: Optional[str] = None):
+        settings = azure_settings.profiling
+        self.mode = mode or settings.profiling_mode
+        if self.mode not in ("off", "cprofile", "pyinstrument"):
+            raise InvalidConfigException(
+                r"Invalid settings for profiling mode. Please choose between 'off', 'cprofile' or 'pyinstrument' only"
+            )
+        if self.mode == "pyinstrument":
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                raise InvalidConfigException(
+                    r"Invalid settings for profiling mode. pyinstrument is not installed, please choose 'cprofile' or 'off'"
+                )
+        self.sample_rate = sample_rate if sample_rate is not None else settings.profiling_sample_rate
+        self.output_dir = Path(output_dir or settings.profiling_output_dir)
+        self.__lock = threading.Lock()
+        # Key: merged pstats.Stats (cprofile) or pyinstrument Session
+        self.__profiles: Dict[str, Any] = {}
+        # (file, line, function): [calls, own seconds, cumulative seconds]
+        self.__totals: Dict[tuple, list] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def should_profile(self, requested: bool = False) -> bool:
+        """Whether to profile a new document, always when ``requested`` and the mode is on."""
+        if not self.enabled:
+            return False
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    @contextmanager
+    def capture(self, key: str) -> Iterator[None]:
+        """
+        Profile the calling thread inside the block and merge the result into the profile of ``key``.
+        """
+        if not self.enabled:
+            yield
+            return
+        if self.mode == "cprofile":
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ allows one active profiler per interpreter, skip this capture
+                yield
+                return
+            try:
+                yield
+            finally:
+                profile.disable()
+                self.__add_cprofile(key, profile)
+        else:
+            from pyinstrument import Profiler as Sampler
+
+            sampler = Sampler(interval=0.0005, async_mode="disabled")
+            sampler.start()
+            try:
+                yield
+            finally:
+                self.__add_session(key, sampler.stop())
+
+    def path(self, key: str) -> Path:
+        """File ``save`` writes the profile of ``key`` to."""
+        return self.output_dir / f"{key}.{'html' if self.mode == 'pyinstrument' else 'prof'}"
+
+    def save(self, key: str) -> Optional[Path]:
+        """
+        Write the profile of ``key`` and forget it.
+
+        Returns:
+            Path | None: The written file, None if nothing was captured for ``key``
+        """
+        with self.__lock:
+            profile = self.__profiles.pop(key, None)
+        if profile is None:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = self.path(key)
+        if self.mode == "cprofile":
+            profile.dump_stats(path)
+        else:
+            from pyinstrument.renderers import HTMLRenderer
+
+            path.write_text(HTMLRenderer().render(profile), encoding="utf-8")
+        return path
+
+    def save_all(self) -> List[Path]:
+        with self.__lock:
+            keys = list(self.__profiles)
+        return [path for path in (self.save(key) for key in keys) if path is not None]
+
+    def hot_functions(self, top: int = 20, sort: str = "own") -> List[Dict[str, Any]]:
+        """
+        Functions with the most time over every cProfile capture so far.
+
+        Args:
+            top (int, optional): Number of functions. Defaults to 20.
+            sort (str, optional): "own" (time in the function itself) or "cumulative". Defaults to "own".
+
+        Returns:
+            List[Dict[str, Any]]: Function, calls, own and cumulative seconds
+        """
+        column = 1 if sort == "own" else 2
+        with self.__lock:
+            ranked = sorted(self.__totals.items(), key=lambda item: item[1][column], reverse=True)[:top]
+        return [
+            {
+                "function": f"{file}:{line}({name})",
+                "calls": calls,
+                "own_seconds": own,
+                "cumulative_seconds": cumulative,
+            }
+            for (file, line, name), (calls, own, cumulative) in ranked
+        ]
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__profiles.clear()
+            self.__totals.clear()
+
+    def __add_cprofile(self, key: str, profile: cProfile.Profile) -> None:
+        stats = pstats.Stats(profile)
+        with self.__lock:
+            merged = self.__profiles.get(key)
+            if merged is None:
+                self.__profiles[key] = stats
+            else:
+                merged.add(stats)
+            for function, (_, calls, own, cumulative, _) in stats.stats.items():
+                totals = self.__totals.get(function)
+                if totals is None:
+                    totals = self.__totals[function] = [0, 0.0, 0.0]
+                totals[0] += calls
+                totals[1] += own
+                totals[2] += cumulative
+
+    def __add_session(self, key: str, session: Any) -> None:
+        from pyinstrument.session import Session
+
+        with self.__lock:
+            merged = self.__profiles.get(key)
+            self.__profiles[key] = session if merged is None else Session.combine(merged, session)
@@ -1,8 +1,6 @@
-from settings.config.azure_blob import AzureBlobStorageSettings
-from settings.config.logger import LoggerSettings
-from settings.config.azure_openai import AzureOpenAISettings
-from settings.config.pdf_processor import PDFProcessorSettings
-from settings.config.azure_document_intel import AzureDocumentIntelligenceSettings
+import importlib
+import threading
+
 
 class SingletonMeta(type):
     _instances = {}
@@ -13,11 +11,54 @@ class SingletonMeta(type):
         return cls._instances[cls]
 
 class Settings(metaclass=SingletonMeta):
+    """
+    Application settings grouped by section.
+
+    Sections are imported and validated on first access instead of at import
+    time, so a worker that only needs the logger does not pay for (or fail on)
+    the blob or OpenAI configuration.
+    """
+    _sections = {
+        "blob": ("settings.config.azure_blob", "AzureBlobStorageSettings"),
+        "logger_setting": ("settings.config.logger", "LoggerSettings"),
+        "openai_settings": ("settings.config.azure_openai", "AzureOpenAISettings"),
+        "pdf_processor": ("settings.config.pdf_processor", "PDFProcessorSettings"),
+        "di_settings": ("settings.config.azure_document_intel", "AzureDocumentIntelligenceSettings"),
+        "pipeline": ("settings.config.pipeline", "PipelineSettings"),
+        "queue": ("settings.config.queue", "QueueSettings"),
+        "embedding": ("settings.config.embedding", "EmbeddingSettings"),
+        "search": ("settings.config.search", "SearchSettings"),
+        "database": ("settings.config.database", "DatabaseSettings"),
+        "dedup": ("settings.config.dedup", "DedupSettings"),
+        "telemetry": ("settings.config.telemetry", "TelemetrySettings"),
+        "ledger": ("settings.config.ledger", "LedgerSettings"),
+        "profiling": ("settings.config.profiling", "ProfilingSettings"),
+        "api": ("settings.config.api", "ApiSettings"),
+        "cascade": ("settings.config.cascade", "CascadeSettings"),
+        "tiling": ("settings.config.tiling", "TilingSettings"),
+    }
+
     def __init__(self):
-        self.blob = AzureBlobStorageSettings()
-        self.logger_setting = LoggerSettings()
-        self.openai_settings = AzureOpenAISettings()
-        self.pdf_processor = PDFProcessorSettings()
-        self.di_settings = AzureDocumentIntelligenceSettings()
-        
-azure_settings = Settings()
\ No newline at end of file
+        self.__lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        # Only called when the section has not been built yet
+        try:
+            module_name, class_name = Settings._sections[name]
+        except KeyError:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'") from None
+
+        with self.__lock:
+            if name not in self.__dict__:
+                settings_class = getattr(importlib.import_module(module_name), class_name)
+                self.__dict__[name] = settings_class()
+        return self.__dict__[name]
+
+    def load_all(self) -> None:
+        """
+        Eagerly build every section, e.g. to fail fast on a misconfigured deployment.
+        """
+        for name in Settings._sections:
+            getattr(self, name)
+
+azure_settings = Settings()
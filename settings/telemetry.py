@@ -0,0 +1,222 @@
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from settings.settings import azure_settings
+from settings.invalid_config_exception import InvalidConfigException
+
+# Span attributes
+DOCUMENT_HASH = "cv.document_hash"
+PAGE = "cv.page"
+PROMPT_TYPE = "cv.prompt_type"
+IMAGE_BYTES = "cv.image_bytes"
+RETRY_COUNT = "cv.retry_count"
+PROFILE = "cv.profile"
+BATCH_PAGES = "cv.batch_pages"
+CONTINUATIONS = "cv.continuations"
+TILES = "cv.tiles"
+PROMPT_TOKENS = "gen_ai.usage.input_tokens"
+COMPLETION_TOKENS = "gen_ai.usage.output_tokens"
+CACHED_TOKENS = "gen_ai.usage.cached_input_tokens"
+
+# Span attributes also attached to the metrics, they must have few distinct values
+_METRIC_ATTRIBUTES = (PROMPT_TYPE,)
+_TOKEN_TYPES = {PROMPT_TOKENS: "input", COMPLETION_TOKENS: "output", CACHED_TOKENS: "cached_input"}
+# Status codes retried by the azure-core RetryPolicy
+_RETRY_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class SpanRecorder:
+    """
+    Handle of the current operation. Attributes are set on its span and the ones in
+    ``_METRIC_ATTRIBUTES`` and the token counts also feed the histograms.
+
+    When telemetry is disabled a shared recorder without span is returned, all its
+    methods do nothing.
+    """
+    __slots__ = ("span", "attributes", "retries", "failed")
+
+    def __init__(self, span: Any = None):
+        self.span = span
+        self.attributes: Dict[str, Any] = {}
+        self.retries = 0
+        self.failed = False
+
+    def set(self, key: str, value: Any) -> None:
+        if self.span is None or value is None:
+            return
+        self.attributes[key] = value
+        self.span.set_attribute(key, value)
+
+    def fail(self, description: str) -> None:
+        """Mark an operation that returned without raising as failed."""
+        if self.span is None:
+            return
+        from opentelemetry.trace import Status, StatusCode
+
+        self.failed = True
+        self.span.set_status(Status(StatusCode.ERROR, description))
+
+    def count_retries(self, pipeline_response: Any) -> None:
+        """
+        ``raw_response_hook`` of the azure SDK clients, called for every HTTP response
+        including the retried ones. Counts the responses the RetryPolicy retries;
+        connection errors are retried without response and are not counted.
+        """
+        if self.span is None:
+            return
+        if pipeline_response.http_response.status_code in _RETRY_STATUS_CODES:
+            self.retries += 1
+            self.set(RETRY_COUNT, self.retries)
+
+
+_DISABLED = SpanRecorder()
+
+
+class _Telemetry:
+    def __init__(self, tracer: Any, meter: Any, span_exporter: Any = None, metric_reader: Any = None):
+        self.tracer = tracer
+        self.span_exporter = span_exporter
+        self.metric_reader = metric_reader
+        self.duration = meter.create_histogram(
+            "cv.operation.duration", unit="s", description="Duration of blob, Document Intelligence, GPT and parsing operations"
+        )
+        self.tokens = meter.create_histogram(
+            "cv.gen_ai.tokens", unit="{token}", description="Tokens used by a GPT request, by token type"
+        )
+        self.image_size = meter.create_histogram(
+            "cv.image.size", unit="By", description="Size of the page images uploaded or sent to GPT"
+        )
+
+    def record(self, name: str, recorder: SpanRecorder, status: str, seconds: float) -> None:
+        attributes = {"operation": name, "status": status}
+        for key in _METRIC_ATTRIBUTES:
+            if key in recorder.attributes:
+                attributes[key] = recorder.attributes[key]
+        self.duration.record(seconds, attributes)
+        for key, token_type in _TOKEN_TYPES.items():
+            if key in recorder.attributes:
+                self.tokens.record(recorder.attributes[key], {**attributes, "token_type": token_type})
+        if IMAGE_BYTES in recorder.attributes:
+            self.image_size.record(recorder.attributes[IMAGE_BYTES], attributes)
+
+
+_UNSET = object()
+_telemetry: Any = _UNSET
+_lock = threading.Lock()
+
+
+def _create_telemetry() -> Optional[_Telemetry]:
+    settings = azure_settings.telemetry
+    if settings.telemetry_exporter == "none":
+        return None
+    try:
+        from opentelemetry import metrics, trace
+        from opentelemetry.sdk.resources import Resource
+    except ImportError:
+        raise InvalidConfigException(
+            r"Invalid settings for telemetry exporter. opentelemetry-sdk is not installed, please choose 'none'"
+        )
+
+    resource = Resource.create({"service.name": settings.telemetry_service_name})
+    if settings.telemetry_exporter == "azure_monitor":
+        from azure.monitor.opentelemetry import configure_azure_monitor
+
+        configure_azure_monitor(connection_string=settings.telemetry_connection_string, resource=resource)
+        return _Telemetry(trace.get_tracer(__name__), metrics.get_meter(__name__))
+
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.trace import TracerProvider
+
+    span_exporter = None
+    if settings.telemetry_exporter == "console":
+        from opentelemetry.sdk.metrics.export import ConsoleMetricExporter, PeriodicExportingMetricReader
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+        span_processor = BatchSpanProcessor(ConsoleSpanExporter())
+        metric_reader = PeriodicExportingMetricReader(
+            ConsoleMetricExporter(), export_interval_millis=settings.telemetry_export_interval * 1000
+        )
+    else:
+        from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+        from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+        span_exporter = InMemorySpanExporter()
+        span_processor = SimpleSpanProcessor(span_exporter)
+        metric_reader = InMemoryMetricReader()
+
+    tracer_provider = TracerProvider(resource=resource)
+    tracer_provider.add_span_processor(span_processor)
+    meter_provider = MeterProvider(resource=resource, metric_readers=[metric_reader])
+    # Global providers, so spans of the azure SDK and semantic_kernel nest under ours
+    trace.set_tracer_provider(tracer_provider)
+    metrics.set_meter_provider(meter_provider)
+    atexit.register(tracer_provider.shutdown)
+    atexit.register(meter_provider.shutdown)
+    return _Telemetry(
+        tracer_provider.get_tracer(__name__), meter_provider.get_meter(__name__), span_exporter, metric_reader
+    )
+
+
+def _get_telemetry() -> Optional[_Telemetry]:
+    global _telemetry
+    if _telemetry is _UNSET:
+        with _lock:
+            if _telemetry is _UNSET:
+                _telemetry = _create_telemetry()
+    return _telemetry
+
+
+@contextmanager
+def span(name: str, attributes: Optional[Dict[str, Any]] = None) -> Iterator[SpanRecorder]:
+    """
+    Trace an operation and record its duration in the ``cv.operation.duration`` histogram.
+
+    Spans opened inside the block, also in called functions of the same thread, become
+    its children, e.g. the DI request under the ``pipeline.analyze`` span of its page.
+
+    Args:
+        name (str): Operation name, e.g. "blob.upload"
+        attributes (Dict[str, Any], optional): Initial attributes, None values are skipped. Defaults to None.
+
+    Yields:
+        SpanRecorder: Handle to add attributes and retries, or mark the operation as failed
+    """
+    telemetry = _get_telemetry()
+    if telemetry is None:
+        yield _DISABLED
+        return
+
+    started = time.perf_counter()
+    with telemetry.tracer.start_as_current_span(name) as current:
+        recorder = SpanRecorder(current)
+        for key, value in (attributes or {}).items():
+            recorder.set(key, value)
+        status = "ok"
+        try:
+            yield recorder
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            if recorder.failed:
+                status = "error"
+            telemetry.record(name, recorder, status, time.perf_counter() - started)
+
+
+def get_finished_spans() -> List[Any]:
+    """Spans kept by the ``memory`` exporter, empty for the other exporters."""
+    telemetry = _get_telemetry()
+    if telemetry is None or telemetry.span_exporter is None:
+        return []
+    return list(telemetry.span_exporter.get_finished_spans())
+
+
+def get_metrics() -> Any:
+    """Current metrics of the ``memory`` exporter, None for the other exporters."""
+    telemetry = _get_telemetry()
+    if telemetry is None or telemetry.span_exporter is None:
+        return None
+    return telemetry.metric_reader.get_metrics_data()
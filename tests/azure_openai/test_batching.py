@@ -0,0 +1,31 @@
+from azure_ai.azure_openai.batching import plan_batches, split_batch_response
+
+
+def test_plan_batches_respects_page_count_and_token_budget():
+    assert plan_batches([100] * 5, token_budget=1000, max_pages=2) == [[0, 1], [2, 3], [4]]
+    assert plan_batches([400, 400, 400], token_budget=1000, max_pages=10, fixed_tokens=200) == [[0, 1], [2]]
+
+
+def test_plan_batches_sends_an_oversized_page_alone():
+    assert plan_batches([100, 5000, 100], token_budget=1000, max_pages=10) == [[0], [1], [2]]
+    assert plan_batches([], token_budget=1000, max_pages=10) == []
+
+
+def test_split_batch_response_orders_pages_by_marker():
+    response = (
+        "```python\n# Page 2\nMainInformation(Name='B')\n"
+        "## Page 1 of 2\nMainInformation(Name='A')\n```"
+    )
+
+    assert split_batch_response(response, 2) == ["MainInformation(Name='A')", "MainInformation(Name='B')"]
+
+
+def test_split_batch_response_drops_missing_and_cut_off_pages():
+    response = "# Page 1\nMainInformation(Name='A')\n# Page 3\nMainInformation(Name='C', EntityList=[Entity("
+
+    assert split_batch_response(response, 3) == ["MainInformation(Name='A')", None, None]
+
+
+def test_single_page_answer_without_marker_is_kept():
+    assert split_batch_response("MainInformation(Name='A')", 1) == ["MainInformation(Name='A')"]
+    assert split_batch_response("MainInformation(Name='A')", 2) == [None, None]
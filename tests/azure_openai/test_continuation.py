@@ -0,0 +1,54 @@
+from azure_ai.azure_openai.continuation import entity_calls, is_truncated, merge_answers, merge_entities, split_answer
+
+CUT_OFF = (
+    "```python\n"
+    "MainInformation(Name='Fund', EntityList=[Entity(Name='A', Country='US'), "
+    "Entity(Name='B (Cayman)', Country='KY'), Entity(Name='C', Cou"
+)
+
+
+def test_entity_calls_skip_the_call_cut_off_at_the_end():
+    assert entity_calls(CUT_OFF) == ["Entity(Name='A', Country='US')", "Entity(Name='B (Cayman)', Country='KY')"]
+
+
+def test_entity_calls_ignore_parentheses_in_strings_and_comments():
+    text = "Entity(Name=')(', City_Town=\"a)\"), # Entity(Name='x')\nEntity(Name='y')"
+
+    assert entity_calls(text) == ["Entity(Name=')(', City_Town=\"a)\")", "Entity(Name='y')"]
+
+
+def test_split_answer_keeps_the_complete_entities():
+    answer = split_answer(CUT_OFF)
+
+    assert is_truncated(CUT_OFF)
+    assert answer.text() == (
+        "MainInformation(Name='Fund', EntityList=[Entity(Name='A', Country='US'), "
+        "Entity(Name='B (Cayman)', Country='KY')])"
+    )
+    assert not is_truncated(answer.text())
+    assert split_answer("MainInformation(Name='Fund')") is None
+
+
+def test_placeholder_comment_is_a_truncated_answer():
+    answer = "MainInformation(EntityList=[Entity(Name='A'),\n# Additional entities would be listed here\n])"
+
+    assert is_truncated(answer)
+    assert is_truncated("MainInformation(Name='Fund')", "length")
+
+
+def test_merge_entities_drops_repeated_entities():
+    first = ["Entity(Name='A', Country='US')", "Entity(Name='B')"]
+    second = ["Entity(Country='us', Name=' A ')", "Entity(Name='C')"]
+
+    assert merge_entities(first, second) == first + ["Entity(Name='C')"]
+
+
+def test_merge_answers_keeps_the_fields_of_the_first_answer():
+    merged = merge_answers([
+        "MainInformation(Name='Fund', EntityList=[Entity(Name='A')])",
+        "no entity list here",
+        "MainInformation(Name='Other', EntityList=[Entity(Name='A'), Entity(Name='B')])",
+    ])
+
+    assert merged == "MainInformation(Name='Fund', EntityList=[Entity(Name='A'), Entity(Name='B')])"
+    assert merge_answers(["nothing"]) is None
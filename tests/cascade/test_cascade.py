@@ -0,0 +1,42 @@
+import pytest
+
+from azure_ai.cascade.cascade import BY_LOCATION, MULTI_TIER, NOT_BY_LOCATION, ONE_TIER, compare_extractions, detect_tier, tier_of
+
+
+@pytest.mark.parametrize(
+    "text, entity_class, method",
+    [
+        ("## Tier 1\n| Name |\n| Fund A |\nTier 2: Holding LP\n| Name |", MULTI_TIER, NOT_BY_LOCATION),
+        ("| Name | Tier 1 | Tier 2 |\n| --- | --- | --- |", MULTI_TIER, BY_LOCATION),
+        ("<table><th>Tier 1</th><th>Tier 2</th></table>", MULTI_TIER, BY_LOCATION),
+        ("Structure chart with 3 tiers", MULTI_TIER, BY_LOCATION),
+        ("| Name | Country |\n| Fund A | US |", ONE_TIER, BY_LOCATION),
+        ("Form W-8IMY, Part I", ONE_TIER, BY_LOCATION),
+    ],
+)
+def test_detect_tier(text, entity_class, method):
+    tier, confidence = detect_tier(text)
+
+    assert (tier.EntityClass, tier.Method) == (entity_class, method)
+    assert 0 < confidence <= 1
+
+
+def test_table_without_tier_marker_is_less_confident_than_plain_text():
+    assert detect_tier("| Name |\n| Fund A |")[1] < detect_tier("Fund A")[1]
+
+
+def test_tier_of_uses_the_parents_of_the_entities():
+    one_tier = {"Name": "Fund", "EntityList": [{"Name": "A", "ParentName": " fund "}, {"Name": "B"}]}
+    multi_tier = {"Name": "Fund", "EntityList": [{"Name": "A", "ParentName": "Fund"}, {"Name": "B", "ParentName": "A"}]}
+
+    assert tier_of(one_tier) == ONE_TIER
+    assert tier_of(multi_tier) == MULTI_TIER
+
+
+def test_compare_extractions_matches_entities_by_name():
+    full = {"Name": "Fund", "Country": "US", "EntityList": [{"Name": "A", "Country": "US"}, {"Name": "B", "Country": "KY"}]}
+    routed = {"Name": "fund", "Country": "US", "EntityList": [{"Name": "B", "Country": "KY"}, {"Name": "A", "Country": "GB"}]}
+
+    assert compare_extractions(full, full) == 1.0
+    assert compare_extractions(routed, full) == pytest.approx(5 / 6)
+    assert compare_extractions({}, {}) == 1.0
@@ -0,0 +1,23 @@
+import pytest
+
+from azure_ai.checkpoint.checkpoint import PageCheckpointStore, PageStage
+
+
+def test_saving_a_stage_twice_keeps_the_last_checkpoint(tmp_path):
+    store = PageCheckpointStore(str(tmp_path / "checkpoint.sqlite3"))
+    stage = PageStage.GPT
+
+    store.save_stage("hash", 0, stage, "first", 1.0)
+    store.save_stage("hash", 0, stage, "second", 2.0)
+
+    checkpoint = store.get_stage("hash", 0, stage)
+    assert (checkpoint.payload, checkpoint.duration_seconds) == ("second", 2.0)
+    assert list(store.get_page("hash", 0)) == [stage]
+    assert store.get_stage("hash", 1, stage) is None
+
+
+def test_unknown_stage_is_rejected(tmp_path):
+    store = PageCheckpointStore(str(tmp_path / "checkpoint.sqlite3"))
+
+    with pytest.raises(ValueError):
+        store.save_stage("hash", 0, "unknown")
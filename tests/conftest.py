@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+# Settings are read from the environment on first access, keep the logs quiet and local
+for name, value in {
+    "LOGGING_LEVEL": "WARNING",
+    "LOGGING_MODE": "stream",
+    "LOGGING_FILE_PATH": os.path.join(tempfile.gettempdir(), "tests.log"),
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,40 @@
+import sqlite3
+import time
+
+from azure_ai.azure_openai.usage import TokenUsage
+from azure_ai.ledger.ledger import UsageLedger, UsageRecord
+
+
+def stored_rows(path) -> int:
+    with sqlite3.connect(path) as connection:
+        return connection.execute("SELECT COUNT(*) FROM gpt_usage").fetchone()[0]
+
+
+def make_record(page_number: int = 1) -> UsageRecord:
+    return UsageRecord("hash", page_number, "TYPE1", TokenUsage(prompt_tokens=100, completion_tokens=10), 0.5)
+
+
+def test_buffer_is_flushed_after_the_interval_without_new_records(tmp_path):
+    path = tmp_path / "usage.sqlite3"
+    ledger = UsageLedger(str(path), flush_size=100, flush_interval=0.05)
+    ledger.record(make_record())
+    assert stored_rows(path) == 0
+
+    deadline = time.monotonic() + 5
+    while stored_rows(path) == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert stored_rows(path) == 1
+    ledger.close()
+
+
+def test_buffer_is_flushed_once_full(tmp_path):
+    path = tmp_path / "usage.sqlite3"
+    ledger = UsageLedger(str(path), flush_size=3, flush_interval=60)
+    for page_number in range(4):
+        ledger.record(make_record(page_number))
+
+    assert stored_rows(path) == 3
+    assert ledger.totals()["TYPE1"].requests == 4
+    ledger.close()
+    assert stored_rows(path) == 4
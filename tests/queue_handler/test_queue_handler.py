@@ -0,0 +1,69 @@
+import pytest
+
+from azure_ai.queue_handler.queue_handler import SQLiteJobQueue
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    return SQLiteJobQueue(str(tmp_path / "queue.sqlite3"), queue_name="jobs")
+
+
+def test_received_message_is_invisible_until_its_timeout(job_queue):
+    job_queue.send({"document": "a"})
+
+    [message] = job_queue.receive(visibility_timeout=60)
+
+    assert message.content == {"document": "a"}
+    assert message.dequeue_count == 1
+    assert job_queue.receive() == []
+    assert job_queue.approximate_count() == 1
+
+
+def test_message_is_delivered_again_when_not_deleted(job_queue):
+    job_queue.send({"document": "a"})
+    [first] = job_queue.receive(visibility_timeout=0)
+
+    [second] = job_queue.receive(visibility_timeout=60)
+
+    assert second.id == first.id
+    assert second.dequeue_count == 2
+    assert second.pop_receipt != first.pop_receipt
+
+
+def test_delete_with_a_stale_receipt_keeps_the_message(job_queue):
+    job_queue.send({"document": "a"})
+    [stale] = job_queue.receive(visibility_timeout=0)
+    [current] = job_queue.receive(visibility_timeout=60)
+
+    job_queue.delete(stale)
+    assert job_queue.approximate_count() == 1
+
+    job_queue.delete(current)
+    assert job_queue.approximate_count() == 0
+
+
+def test_update_visibility_renews_the_receipt(job_queue):
+    job_queue.send({"document": "a"})
+    [message] = job_queue.receive(visibility_timeout=60)
+
+    renewed = job_queue.update_visibility(message, 0)
+
+    with pytest.raises(LookupError):
+        job_queue.update_visibility(message, 60)
+    [redelivered] = job_queue.receive(visibility_timeout=60)
+    assert redelivered.id == renewed.id
+
+
+def test_delayed_message_is_not_received_before_its_delay(job_queue):
+    job_queue.send({"document": "a"}, visibility_timeout=60)
+
+    assert job_queue.receive() == []
+
+
+def test_queues_sharing_a_database_are_separate(tmp_path, job_queue):
+    other = SQLiteJobQueue(str(tmp_path / "queue.sqlite3"), queue_name="other")
+    job_queue.send({"document": "a"})
+
+    assert other.receive() == []
+    assert other.approximate_count() == 0
+    assert len(job_queue.receive(max_messages=10)) == 1
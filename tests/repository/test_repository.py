@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy import text
+
+from azure_ai.models.compact import CompactExtraction
+from azure_ai.models.extraction import Entity, MainInformation
+from azure_ai.repository.repository import ExtractionRepository, create_database_engine
+
+
+def make_extraction(entities: int = 5) -> MainInformation:
+    return MainInformation(
+        Name="Fund",
+        Country="US",
+        FormType="W-8IMY",
+        EntityList=[
+            Entity(Name=f"Partner {position}", ParentName="Fund", AllocationPercentage="20")
+            for position in range(entities)
+        ],
+    )
+
+
+@pytest.fixture
+def repository(tmp_path):
+    # Batches of two rows so that saving five entities takes several executemany calls
+    repository = ExtractionRepository(create_database_engine(f"sqlite:///{tmp_path / 'extraction.sqlite3'}"), batch_size=2)
+    repository.create_tables()
+    return repository
+
+
+def test_saved_extraction_is_read_back(repository):
+    extraction = make_extraction()
+
+    assert repository.save("hash", extraction, "cv.pdf") == 6
+    assert repository.get("hash") == extraction
+    assert repository.get("missing") is None
+
+
+def test_compact_extraction_is_saved_like_the_model(repository):
+    extraction = make_extraction()
+
+    repository.save("hash", CompactExtraction.from_model(extraction))
+
+    assert repository.get("hash") == extraction
+
+
+def test_saving_again_replaces_the_entities(repository):
+    repository.save("hash", make_extraction(5))
+    repository.save("hash", make_extraction(2).model_dump())
+
+    assert repository.get("hash") == make_extraction(2)
+
+
+def test_saving_again_refreshes_updated_at(repository):
+    repository.save("hash", make_extraction())
+    with repository.engine.begin() as connection:
+        connection.execute(text("UPDATE main_information SET updated_at = '2000-01-01 00:00:00'"))
+
+    repository.save("hash", make_extraction())
+
+    with repository.engine.connect() as connection:
+        updated_at = connection.execute(text("SELECT updated_at FROM main_information")).scalar_one()
+    assert not str(updated_at).startswith("2000")
+
+
+def test_save_many_keeps_going_after_a_bad_result(repository):
+    written = repository.save_many([
+        ("first", make_extraction(1), None),
+        ("bad", {"EntityList": "not a list"}, None),
+        ("second", make_extraction(2), None),
+    ])
+
+    assert written == 5
+    assert repository.get("bad") is None
+    assert repository.get("second") == make_extraction(2)
+
+
+def test_delete_removes_the_entities(repository):
+    repository.save("hash", make_extraction())
+
+    assert repository.delete("hash")
+    assert repository.get("hash") is None
+    assert not repository.delete("hash")
+    with repository.engine.connect() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM entity")).scalar_one() == 0
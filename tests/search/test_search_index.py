@@ -0,0 +1,69 @@
+import pytest
+
+from azure_ai.search.search_index import SearchIndex
+
+CVS = {
+    "a": "python developer with sql",
+    "b": "java developer",
+    "c": "data analyst with excel",
+}
+
+
+def build_index() -> SearchIndex:
+    index = SearchIndex()
+    for document_id, body in CVS.items():
+        index.add(document_id, {"body": body})
+    return index
+
+
+def scores(index: SearchIndex, query: str) -> dict:
+    return {hit.document_id: hit.score for hit in index.search(query).hits}
+
+
+def test_replacing_a_document_keeps_its_scores():
+    index = build_index()
+    expected = scores(index, "python")
+
+    for _ in range(5):
+        index.add("a", {"body": CVS["a"]})
+
+    assert len(index) == 3
+    assert scores(index, "python") == pytest.approx(expected)
+    assert expected["a"] > 0
+
+
+def test_removed_documents_do_not_count_in_document_frequencies():
+    index = build_index()
+    index.add("d", {"body": "python engineer"})
+    index.remove("d")
+
+    assert scores(index, "python") == pytest.approx(scores(build_index(), "python"))
+
+
+def test_compaction_keeps_scores_and_document_numbers():
+    index = build_index()
+    index.COMPACT_MIN_DEAD_POSTINGS = 1
+    number = index.document_number("b")
+
+    for _ in range(10):
+        index.add("a", {"body": CVS["a"]})
+    index.remove("c")
+    expected = SearchIndex()
+    for document_id in ("a", "b"):
+        expected.add(document_id, {"body": CVS[document_id]})
+
+    assert index.document_number("b") == number
+    assert index.document_id(number) == "b"
+    assert scores(index, "developer") == pytest.approx(scores(expected, "developer"))
+    assert index.search("excel").total == 0
+
+
+def test_pages_of_tied_scores_do_not_overlap():
+    index = SearchIndex()
+    for number in range(200):
+        index.add(f"d{number}", {"body": "python developer"})
+
+    pages = [hit.document_id for offset in range(0, 200, 10) for hit in index.search("python", limit=10, offset=offset).hits]
+
+    assert len(set(pages)) == 200
+    assert pages == [hit.document_id for hit in index.search("python", limit=200).hits]
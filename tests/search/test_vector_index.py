@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from azure_ai.search.vector_index import IVFVectorIndex
+
+
+def unit(*values) -> np.ndarray:
+    return np.array(values, dtype=np.float32)
+
+
+@pytest.fixture
+def index() -> IVFVectorIndex:
+    index = IVFVectorIndex()
+    index.add("a", np.stack([unit(1, 0, 0), unit(0, 1, 0)]), {"name": "A"})
+    index.add("b", np.stack([unit(0, 0, 1)]))
+    return index
+
+
+def test_document_is_ranked_by_its_best_chunk(index):
+    hits = index.search(unit(0, 1, 0.1), k=2)
+
+    assert [document_id for document_id, _ in hits] == ["a", "b"]
+    assert hits[0][1] == pytest.approx(1 / np.sqrt(1.01))
+
+
+def test_replace_drops_the_previous_vectors(index):
+    index.add("a", unit(0, 0, 1), {"name": "A2"})
+
+    assert len(index) == 2
+    assert index.metadata("a") == {"name": "A2"}
+    assert index.search(unit(1, 0, 0), k=1)[0][1] == pytest.approx(0)
+
+
+def test_removed_document_is_not_returned(index):
+    assert index.remove("a")
+    assert not index.remove("a")
+
+    assert [document_id for document_id, _ in index.search(unit(1, 0, 0))] == ["b"]
+    assert index.metadata("a") is None
+    assert index.search(unit(1, 0, 0), document_ids={"a"}) == []
+
+
+def test_search_can_be_restricted_to_documents(index):
+    assert [document_id for document_id, _ in index.search(unit(1, 0, 0), document_ids={"b"})] == ["b"]
+
+
+def test_trained_index_probing_every_list_matches_exact_search():
+    vectors = np.random.default_rng(0).normal(size=(300, 8)).astype(np.float32)
+    exact = IVFVectorIndex(train_threshold=10**6)
+    trained = IVFVectorIndex(n_lists=4, n_probe=4, train_threshold=200)
+    for number, vector in enumerate(vectors):
+        exact.add(f"d{number}", vector)
+        trained.add(f"d{number}", vector)
+    # Replaced after training: the new vector goes to the list of its closest centroid
+    exact.add("d0", vectors[1])
+    trained.add("d0", vectors[1])
+
+    assert trained.is_trained and not exact.is_trained
+    query = vectors[1]
+    assert dict(trained.search(query, k=10)) == pytest.approx(dict(exact.search(query, k=10)))
+
+
+def test_vectors_of_another_dimension_are_rejected(index):
+    with pytest.raises(ValueError):
+        index.add("c", unit(1, 0))
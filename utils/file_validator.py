@@ -0,0 +1,66 @@
+import mimetypes
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional, Set
+from settings.settings import azure_settings
+from settings.custom_logger import Logger
+from utils.utils import SNIFF_BYTES, Utilities
+
+
+class FileValidator:
+    """
+    Check uploaded files against ``valid_file_type`` before anything is uploaded or analyzed.
+
+    Only the first ``SNIFF_BYTES`` of a file are read, whether it comes as bytes, a file
+    object or a path on disk, so rejecting a large file costs the same as a small one.
+    Entries of ``valid_file_type`` can be MIME types ("application/pdf") or
+    extensions ("pdf", ".pdf").
+    """
+    def __init__(self, valid_file_types: Optional[Iterable[str]] = None):
+        self.logger = Logger(self.__class__.__name__)
+        if valid_file_types is None:
+            valid_file_types = azure_settings.blob.valid_file_type
+        self.valid_mime_types = self.__to_mime_types(valid_file_types)
+
+    def validate(self, content: bytes | memoryview | BinaryIO | str | Path, file_name: str = "") -> str | None:
+        """
+        Sniff the content type of a file and check that it is allowed.
+
+        Args:
+            content (bytes | memoryview | BinaryIO | str | Path): Content, readable file object or path of the file
+            file_name (str, optional): Name used in log messages. Defaults to "".
+
+        Returns:
+            str | None: The content type, or None if the file is empty or not allowed
+        """
+        if isinstance(content, (str, Path)):
+            file_name = file_name or Path(content).name
+            with open(content, "rb") as f:
+                header = f.read(SNIFF_BYTES)
+        elif hasattr(content, "read"):
+            position = content.tell()
+            header = content.read(SNIFF_BYTES)
+            content.seek(position)
+        else:
+            header = content[:SNIFF_BYTES]
+
+        if not header:
+            self.logger.error(f"Reject {file_name}: file is empty")
+            return None
+        content_type = Utilities.get_content_type(header)
+        if content_type not in self.valid_mime_types:
+            self.logger.error(f"Reject {file_name}: content type {content_type} is not allowed")
+            return None
+        return content_type
+
+    @staticmethod
+    def __to_mime_types(valid_file_types: Iterable[str]) -> Set[str]:
+        mime_types = set()
+        for file_type in valid_file_types:
+            file_type = file_type.strip().lower()
+            if "/" in file_type:
+                mime_types.add(file_type)
+                continue
+            mime_type, _ = mimetypes.guess_type(f"file.{file_type.lstrip('.')}")
+            if mime_type is not None:
+                mime_types.add(mime_type)
+        return mime_types
@@ -0,0 +1,31 @@
+import importlib
+from typing import Callable, Dict, List, Tuple
+
+
+def lazy_attributes(
+    package_name: str, attributes: Dict[str, str]
+) -> Tuple[Callable[[str], object], Callable[[], List[str]]]:
+    """Build module level ``__getattr__``/``__dir__`` hooks (PEP 562) that import
+    the module owning an attribute only when the attribute is first accessed.
+
+    Args:
+        package_name (str): ``__name__`` of the package exposing the attributes
+        attributes (Dict[str, str]): Mapping of attribute name to the module that defines it
+
+    Returns:
+        Tuple[Callable, Callable]: The ``__getattr__`` and ``__dir__`` functions for the package
+    """
+    package = importlib.import_module(package_name)
+
+    def __getattr__(name: str) -> object:
+        if name not in attributes:
+            raise AttributeError(f"module {package_name!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(attributes[name]), name)
+        # Cache on the package so later lookups skip this hook entirely
+        setattr(package, name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(package)) | set(attributes))
+
+    return __getattr__, __dir__
@@ -0,0 +1,66 @@
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """Token bucket limiting both requests and tokens per minute, as Azure OpenAI quotas do.
+
+    ``acquire`` blocks the calling thread until the request fits in both budgets.
+    Thread safe, so one limiter can be shared by every worker using a deployment.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.__lock = threading.Lock()
+        self.__request_allowance = float(requests_per_minute or 0)
+        self.__token_allowance = float(tokens_per_minute or 0)
+        self.__last_refill = time.monotonic()
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Wait until one request of ``tokens`` tokens is allowed.
+
+        Args:
+            tokens (int, optional): Estimated tokens of the request. Defaults to 0.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self.__lock:
+                self.__refill()
+                request_wait = self.__wait_time(self.__request_allowance, 1, self.requests_per_minute)
+                # A request larger than the whole budget would wait forever, let it through alone
+                token_wait = self.__wait_time(
+                    self.__token_allowance, min(tokens, self.tokens_per_minute or 0), self.tokens_per_minute
+                )
+                wait = max(request_wait, token_wait)
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self.__request_allowance -= 1
+                    if self.tokens_per_minute:
+                        self.__token_allowance -= tokens
+                    return waited
+            time.sleep(wait)
+            waited += wait
+
+    def __refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self.__last_refill
+        self.__last_refill = now
+        if self.requests_per_minute:
+            self.__request_allowance = min(
+                float(self.requests_per_minute), self.__request_allowance + elapsed * self.requests_per_minute / 60
+            )
+        if self.tokens_per_minute:
+            self.__token_allowance = min(
+                float(self.tokens_per_minute), self.__token_allowance + elapsed * self.tokens_per_minute / 60
+            )
+
+    @staticmethod
+    def __wait_time(allowance: float, needed: float, per_minute: Optional[int]) -> float:
+        if not per_minute or allowance >= needed:
+            return 0.0
+        return (needed - allowance) * 60 / per_minute
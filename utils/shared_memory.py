@@ -0,0 +1,50 @@
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+
+
+@dataclass(frozen=True)
+class SharedBytes:
+    """Handle to a byte buffer stored in a named shared memory segment.
+
+    Only the handle (name and size) is pickled when it is passed to another
+    process, the buffer itself is never copied through a pipe. The process
+    that consumes the buffer last is responsible for calling ``unlink``.
+    """
+    name: str
+    size: int
+
+    @classmethod
+    def create(cls, data: bytes | bytearray | memoryview) -> "SharedBytes":
+        """Copy ``data`` into a new shared memory segment.
+
+        Args:
+            data (bytes | bytearray | memoryview): Buffer to share
+
+        Returns:
+            SharedBytes: Handle to the segment
+        """
+        size = len(data)
+        # Zero sized segments are not allowed
+        shm = SharedMemory(create=True, size=max(size, 1))
+        try:
+            shm.buf[:size] = data
+        finally:
+            shm.close()
+        return cls(shm.name, size)
+
+    def read(self) -> bytes:
+        """Copy the content of the segment into a ``bytes`` object of this process."""
+        shm = SharedMemory(name=self.name)
+        try:
+            return bytes(shm.buf[: self.size])
+        finally:
+            shm.close()
+
+    def unlink(self) -> None:
+        """Release the segment. The handle must not be used afterwards."""
+        try:
+            shm = SharedMemory(name=self.name)
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
@@ -1,21 +1,113 @@
 import datetime
 import hashlib
+import threading
+from typing import Any, BinaryIO, Iterable
 from urllib.parse import unquote
-from azure.storage.blob import BlobClient, BlobSasPermissions, generate_blob_sas
 from settings.settings import azure_settings
 from settings.invalid_config_exception import InvalidConfigException
-import magic
+
+# libmagic identifies every supported document type from its first bytes
+SNIFF_BYTES = 2048
+HASH_CHUNK_SIZE = 1024 * 1024
+_magic_local = threading.local()
+
+
+class HashingReader:
+    """
+    Read-only file object that hashes everything read through it.
+
+    Hand it to a consumer such as an upload instead of the original stream, then read
+    ``hexdigest()``: the file is read once for both.
+    """
+    def __init__(self, stream: BinaryIO, algorithm: str = "sha1"):
+        self.__stream = stream
+        self.__hasher = Utilities.new_hasher(algorithm)
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.__stream.read(size)
+        self.__hasher.update(chunk)
+        self.bytes_read += len(chunk)
+        return chunk
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        # Seeking back would hash the same bytes twice
+        return False
+
+    def hexdigest(self) -> str:
+        return self.__hasher.hexdigest()
 
 
 class Utilities:
     @staticmethod
-    def get_hash(data_bytes: bytes, suffix: str = "", extension: str = "") -> str:
-        sha1 = hashlib.sha1(usedforsecurity=False)
-        sha1.update(data_bytes)
-        return sha1.hexdigest() + suffix + extension
+    def get_hash(
+        data: bytes | bytearray | memoryview | BinaryIO | Iterable[bytes],
+        suffix: str = "",
+        extension: str = "",
+        algorithm: str = "sha1",
+    ) -> str:
+        """Hash the content of a file without holding it in memory
+
+        Buffers are hashed in place, file objects are read in chunks of HASH_CHUNK_SIZE
+        into a reused buffer and iterables are hashed chunk by chunk.
+
+        Args:
+            data (bytes | bytearray | memoryview | BinaryIO | Iterable[bytes]): Content, readable file object or chunks
+            suffix (str, optional): Appended to the digest. Defaults to "".
+            extension (str, optional): Appended after the suffix. Defaults to "".
+            algorithm (str, optional): "sha1", "blake2b", "xxh3_128" (needs xxhash) or any
+                hashlib algorithm. Changing it changes every document hash. Defaults to "sha1".
+
+        Returns:
+            str: Hex digest followed by suffix and extension
+        """
+        hasher = Utilities.new_hasher(algorithm)
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            hasher.update(data)
+        elif hasattr(data, "readinto"):
+            buffer = bytearray(HASH_CHUNK_SIZE)
+            view = memoryview(buffer)
+            while size := data.readinto(buffer):
+                hasher.update(view[:size])
+        elif hasattr(data, "read"):
+            while chunk := data.read(HASH_CHUNK_SIZE):
+                hasher.update(chunk)
+        else:
+            for chunk in data:
+                hasher.update(chunk)
+        return hasher.hexdigest() + suffix + extension
+
+    @staticmethod
+    def new_hasher(algorithm: str = "sha1") -> Any:
+        """Create an incremental hasher with ``update`` and ``hexdigest``
+
+        Args:
+            algorithm (str, optional): See ``get_hash``. Defaults to "sha1".
+
+        Returns:
+            Any: The hasher
+        """
+        if algorithm.startswith("xxh"):
+            try:
+                import xxhash
+            except ImportError:
+                raise InvalidConfigException(
+                    r"Invalid settings for hash algorithm. Please install xxhash to use 'xxh3_64' or 'xxh3_128'"
+                ) from None
+            return getattr(xxhash, algorithm)()
+        if algorithm == "blake2b":
+            # Same length as a SHA-1 digest, so blob names keep their shape
+            return hashlib.blake2b(digest_size=20, usedforsecurity=False)
+        return hashlib.new(algorithm, usedforsecurity=False)
 
     @staticmethod
     def generate_sas_token(url: str, container_name: str, blob_name: str) -> str:
+        # Imported here so that importing Utilities does not pull in the Azure SDK
+        from azure.storage.blob import BlobClient, BlobSasPermissions, generate_blob_sas
+
         # Create a SAS token that's valid for a certain time and for particular blob only
         blob_client = BlobClient.from_connection_string(
             conn_str=azure_settings.blob.blob_connection_string,
@@ -48,16 +140,34 @@ class Utilities:
         return sas_token
 
     @staticmethod
-    def get_content_type(file_bytes: bytes) -> str:
-        """Use libmagic wrapper to guess the MimeType/FileType of the bytes stream
+    def get_content_type(content: bytes | memoryview | BinaryIO, sniff_bytes: int = SNIFF_BYTES) -> str:
+        """Use libmagic wrapper to guess the MimeType/FileType from the first bytes of a file
+
+        Only the first ``sniff_bytes`` are passed to libmagic. A file object is read
+        from its current position and rewound, so it can still be uploaded afterwards.
 
         Args:
-            file_bytes (bytes): Bytes stream of a file
+            content (bytes | memoryview | BinaryIO): Content of a file or a readable file object
+            sniff_bytes (int, optional): Number of bytes to inspect. Defaults to SNIFF_BYTES.
 
         Returns:
             str: MimeType, i.e. content type
         """
-        return magic.from_buffer(
-            file_bytes,
-            mime=True,
-        )
+        if hasattr(content, "read"):
+            position = content.tell()
+            header = content.read(sniff_bytes)
+            content.seek(position)
+        else:
+            header = bytes(content[:sniff_bytes])
+        return Utilities.__get_magic().from_buffer(header)
+
+    @staticmethod
+    def __get_magic():
+        # A libmagic handle is not thread safe, python-magic shares one behind a lock.
+        # One handle per thread lets upload workers sniff in parallel.
+        handle = getattr(_magic_local, "handle", None)
+        if handle is None:
+            import magic
+
+            handle = _magic_local.handle = magic.Magic(mime=True)
+        return handle